@@ -0,0 +1,244 @@
+"""Headless batch question answering for precomputing FAQ answers.
+
+Reads questions from CSV or JSONL (``question`` plus optional ``id`` and
+``tour`` columns), answers them with the same retrieval and completion code
+as the chat, and streams one JSON line per answer to the output file.
+Questions that share a ``tour`` share a single retrieval: the tour's
+brochure is searched once for a candidate pool and each question takes its
+best chunks from that pool. Re-running with the same output file skips
+questions that already have an answer.
+
+    python batch_qa.py faq.csv answers.jsonl --workers 8
+    python batch_qa.py faq.jsonl answers.jsonl --fake   # dry run, no Snowflake
+"""
+
+import argparse
+import csv
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import citations
+import ingest
+import pipeline
+import resilience
+import retrieval
+import routing
+import scheduler
+import shared_cache
+import singleflight
+import tracing
+
+PDF_DIR = "pdfs"
+SECRETS_FILE = ".streamlit/secrets.toml"
+DEFAULT_SERVICE = "apt_pdf"
+TOUR_POOL_SIZE = 60
+
+
+def read_questions(path):
+    with open(path, newline="", encoding="utf-8") as f:
+        if path.lower().endswith(".csv"):
+            rows = list(csv.DictReader(f))
+        else:
+            rows = [json.loads(line) for line in f if line.strip()]
+    for row in rows:
+        row["question"] = row["question"].strip()
+        row["tour"] = (row.get("tour") or "").strip()
+        row["id"] = str(row.get("id") or hashlib.sha1(f"{row['tour']}|{row['question']}".encode()).hexdigest()[:12])
+    return [row for row in rows if row["question"]]
+
+
+def answered_ids(path):
+    """Ids already written to ``path`` by a previous (possibly interrupted) run."""
+    if not os.path.exists(path):
+        return set()
+    done = set()
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # partial line from an interrupted run
+            if not record.get("error"):
+                done.add(record["id"])
+    return done
+
+
+def brochure_for(tour, pdf_dir=PDF_DIR):
+    """Staged file name of the brochure for a trip code or title, if there is one."""
+    if not tour or not os.path.isdir(pdf_dir):
+        return None
+    key = tour.lower()
+    names = sorted(f for f in os.listdir(pdf_dir) if f.lower().endswith(".pdf"))
+    match = next((f for f in names if f.lower().split(" ", 1)[0] == key), None) \
+        or next((f for f in names if key in f.lower()), None)
+    return ingest.staged_file_name(match) if match else None
+
+
+class TourPools:
+    """One retrieval per tour, shared by every question about that tour."""
+
+    def __init__(self, backend, settings, pool_size=TOUR_POOL_SIZE, file_filter=False):
+        self.backend = backend
+        self.settings = settings
+        self.pool_size = pool_size
+        self.file_filter = file_filter  # the service has the brochure file as a search attribute
+        self._pools = {}
+        self._lock = threading.Lock()
+
+    def get(self, tour):
+        with self._lock:
+            entry = self._pools.get(tour)
+            if entry is None:
+                entry = self._pools[tour] = {"ready": threading.Event(), "results": None}
+                leader = True
+            else:
+                leader = False
+        if leader:
+            brochure = brochure_for(tour) if self.file_filter else None
+            search_filter = {"@eq": {ingest.PATH_ATTRIBUTE: brochure}} if brochure else {}
+            pool_settings = pipeline.ChatSettings(**{**vars(self.settings), "num_retrieved_chunks": self.pool_size,
+                                                     "adaptive_retrieval": False})
+            try:
+                _, entry["results"] = pipeline.query_cortex(self.backend, pool_settings, tour, filter=search_filter)
+                if search_filter and not entry["results"]:
+                    # The brochure may not be in this service; search for the tour across all of them.
+                    _, entry["results"] = pipeline.query_cortex(self.backend, pool_settings, tour)
+            except Exception as e:
+                # Waiting questions fail with the leader (and are retried by --resume) rather than
+                # being answered without context; later questions about the tour retry the search.
+                entry["error"] = e
+                with self._lock:
+                    self._pools.pop(tour, None)
+                raise
+            finally:
+                entry["ready"].set()
+        entry["ready"].wait()
+        if entry.get("error") is not None:
+            raise entry["error"]
+        return entry["results"]
+
+
+def answer_row(row, backend, settings, pools):
+    question, tour = row["question"], row["tour"]
+    with tracing.trace("batch_question", export=False, id=row["id"]):
+        if tour:
+            if settings.adaptive_retrieval:
+                results, _ = retrieval.select(pools.get(tour), question, settings.search_column,
+                                              settings.num_retrieved_chunks)
+            else:
+                results = retrieval.rerank(pools.get(tour), question, settings.search_column,
+                                           limit=settings.num_retrieved_chunks)
+            context = pipeline.make_context(results, settings.search_column)
+            prompt = pipeline.answer_prompt("", context, f"{question} ({tour})")
+        else:
+            prompt, context, results = pipeline.build_prompt(backend, settings, question)
+        reply, model = routing.routed_complete(backend, settings.model_name, question, prompt)
+    record = {
+        "answer": reply,
+        "model": model,
+        "sources": sorted({r.get("relative_path", "unknown") for r in results}),
+    }
+    if settings.page_sources:
+        record["citations"] = [citation(file, page) for file, page in citations.cited_pages(results)]
+    return record
+
+
+def citation(file, page):
+    """A cited page with a text excerpt from the local copy of the brochure, when there is one."""
+    path = citations.local_pdf(file) if page else None
+    excerpt = citations.page_text(path, page) if path else None
+    return {"file": file, "page": page, "excerpt": excerpt}
+
+
+def filters_by_file(session, service):
+    """Whether ``service`` can be filtered on the brochure file; older services lack the attribute."""
+    desc = session.sql(f"DESC CORTEX SEARCH SERVICE {service};").collect()[0].as_dict()
+    return ingest.PATH_ATTRIBUTE in [c.strip().lower() for c in (desc.get("attribute_columns") or "").split(",")]
+
+
+def cortex_backend(secrets_path):
+    import tomllib
+    from snowflake.core import Root
+    from snowflake.snowpark.session import Session
+
+    with open(secrets_path, "rb") as f:
+        secrets = tomllib.load(f)
+    session = Session.builder.configs(pipeline.connection_parameters(secrets["snowflake"])).create()
+    return pipeline.CortexBackend(session, Root(session))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("input", help="questions as .csv or .jsonl")
+    parser.add_argument("output", help="answers as .jsonl (appended to; existing answers are skipped)")
+    parser.add_argument("--workers", type=int, default=4, help="questions answered in parallel")
+    parser.add_argument("--model", default=routing.AUTO_MODEL)
+    parser.add_argument("--service", default=DEFAULT_SERVICE, help="Cortex Search service name")
+    parser.add_argument("--search-column", default=pipeline.DEFAULT_SEARCH_COLUMN)
+    parser.add_argument("--chunks", type=int, default=18, help="chunks per answer")
+    parser.add_argument("--adaptive", action="store_true", help="send only as many chunks as each question needs")
+    parser.add_argument("--citations", action="store_true",
+                        help="record cited pages with excerpts (needs a service with a sources column)")
+    parser.add_argument("--secrets", default=SECRETS_FILE)
+    parser.add_argument("--fake", action="store_true", help="use the local benchmark fakes instead of Snowflake")
+    args = parser.parse_args(argv)
+
+    rows = read_questions(args.input)
+    done = answered_ids(args.output)
+    todo = [row for row in rows if row["id"] not in done]
+    print(f"{len(rows)} questions, {len(rows) - len(todo)} already answered, {len(todo)} to go")
+    if not todo:
+        return 0
+
+    if args.fake:
+        from benchmarks.fakes import FakeBackend
+        remote = FakeBackend()
+    else:
+        remote = cortex_backend(args.secrets)
+    # No model fallback: each answer records the model that wrote it.
+    backend = singleflight.SingleFlightBackend(shared_cache.CachedBackend(
+        resilience.ResilientBackend(scheduler.ScheduledBackend(remote, "batch_qa"), fallback_model=None)))
+    settings = pipeline.ChatSettings(
+        model_name=args.model,
+        service=args.service,
+        search_column=args.search_column,
+        num_retrieved_chunks=args.chunks,
+        use_chat_history=False,
+        adaptive_retrieval=args.adaptive,
+        page_sources=args.citations,
+    )
+    pools = TourPools(backend, settings, file_filter=args.fake or filters_by_file(remote.session, args.service))
+
+    write_lock = threading.Lock()
+    failures = 0
+    with open(args.output, "a", encoding="utf-8") as out, ThreadPoolExecutor(max_workers=args.workers) as pool:
+        def run(row):
+            start = time.perf_counter()
+            try:
+                record = answer_row(row, backend, settings, pools)
+            except Exception as e:
+                record = {"error": f"{type(e).__name__}: {e}"}
+            record = {"id": row["id"], "question": row["question"], "tour": row["tour"], **record,
+                      "latency_ms": round((time.perf_counter() - start) * 1000, 1)}
+            with write_lock:
+                out.write(json.dumps(record) + "\n")
+                out.flush()
+            return record
+
+        futures = [pool.submit(run, row) for row in todo]
+        for i, future in enumerate(as_completed(futures), 1):
+            record = future.result()
+            failures += bool(record.get("error"))
+            print(f"[{i}/{len(todo)}] {'❌' if record.get('error') else '✅'} {record['question'][:70]}")
+
+    print(f"✅ Wrote {len(todo) - failures} answers to {args.output} ({failures} failed; re-run to retry)")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,112 @@
+"""Measure adaptive retrieval depth against a fixed number of chunks.
+
+Runs the golden questions through ``pipeline.query_cortex`` twice, once with
+the fixed ``num_retrieved_chunks`` and once with ``adaptive_retrieval``,
+against a local BM25 index of the brochures' layout chunks (a stand-in for
+Cortex Search). For each mode it reports how many chunks reach the prompt,
+the prompt size, how often the expected answer survives, the CPU time spent
+selecting chunks, and the completion latency those prompts imply.
+
+Completion latency is modelled, not measured: a fixed per-call cost plus
+``--prefill-ms-per-ktok`` for every thousand prompt tokens the model has to
+read before it starts answering. Set it from a Cortex trace
+(``traces.jsonl``) to get numbers for a particular model.
+
+Run from the repository root::
+
+    python -m benchmarks.adaptive_retrieval
+    python -m benchmarks.adaptive_retrieval --chunks 12 --prefill-ms-per-ktok 400
+"""
+
+import argparse
+import statistics
+import time
+
+import chunker
+import dedupe
+import pipeline
+import retrieval
+import tracing
+from benchmarks.chunking_bench import BM25, GOLDEN_FILE, PDF_DIR, chunk_corpus, load_golden
+
+BASE_MS = 900
+PREFILL_MS_PER_KTOK = 250
+
+
+class BM25Backend:
+    """Search backend over a ``BM25`` index, returning rows shaped like Cortex Search results."""
+
+    def __init__(self, index):
+        self.index = index
+
+    def search(self, service, query, columns, filter, limit):
+        return [{"relative_path": file, "file_url": f"file://{file}", "chunk": f"{file}: {c.text}"}
+                for file, c, _ in self.index.search(query, limit)]
+
+    def complete(self, model, prompt):
+        raise NotImplementedError
+
+
+def run(backend, settings, golden, base_ms, prefill_ms):
+    chunks, tokens, latency, hits, select_ms = [], [], [], 0, []
+    for item in golden:
+        with tracing.trace("adaptive_bench", export=False):
+            context, results = pipeline.query_cortex(backend, settings, item["question"])
+        if settings.adaptive_retrieval:
+            # Time the selection on its own, without the search.
+            candidates = backend.search(settings.service, item["question"], [], {},
+                                        settings.num_retrieved_chunks * retrieval.OVERFETCH)
+            start = time.perf_counter()
+            retrieval.select(candidates, item["question"], settings.search_column, settings.num_retrieved_chunks)
+            select_ms.append((time.perf_counter() - start) * 1000)
+        prompt_tokens = tracing.estimate_tokens(pipeline.answer_prompt("", context, item["question"]))
+        answer = item["answer"].lower()
+        hits += any(r["relative_path"] == item["file"] and answer in r["chunk"].lower() for r in results)
+        chunks.append(len(results))
+        tokens.append(prompt_tokens)
+        latency.append(base_ms + prefill_ms * prompt_tokens / 1000)
+    n = len(golden)
+    return {
+        "chunks": statistics.mean(chunks),
+        "min_chunks": min(chunks),
+        "prompt_tokens": statistics.mean(tokens),
+        "answer_hit_rate": hits / n,
+        "select_ms": statistics.mean(select_ms) if select_ms else 0.0,
+        "complete_ms": statistics.mean(latency),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--golden", default=GOLDEN_FILE)
+    parser.add_argument("--pdf-dir", default=PDF_DIR)
+    parser.add_argument("--strategy", default="layout")
+    parser.add_argument("--chunks", type=int, default=18, help="num_retrieved_chunks (the adaptive cap)")
+    parser.add_argument("--base-ms", type=float, default=BASE_MS, help="completion latency independent of prompt size")
+    parser.add_argument("--prefill-ms-per-ktok", type=float, default=PREFILL_MS_PER_KTOK,
+                        help="completion latency added per 1000 prompt tokens")
+    args = parser.parse_args(argv)
+
+    golden = load_golden(args.golden)
+    docs, _ = chunk_corpus(dedupe.read_corpus(args.pdf_dir), args.strategy,
+                           chunker.DEFAULT_MAX_TOKENS, chunker.DEFAULT_OVERLAP)
+    backend = BM25Backend(BM25(docs))
+    fixed = pipeline.ChatSettings(model_name="mistral-large2", service="bench", num_retrieved_chunks=args.chunks)
+    adaptive = pipeline.ChatSettings(**{**vars(fixed), "adaptive_retrieval": True})
+
+    print(f"{len(golden)} questions, {len(docs)} {args.strategy} chunks, "
+          f"completion = {args.base_ms:.0f} ms + {args.prefill_ms_per_ktok:.0f} ms/1k prompt tokens\n")
+    print(f"{'mode':>9} {'chunks':>7} {'min':>4} {'prompt tok':>10} {'answer hit':>10} "
+          f"{'select ms':>9} {'complete ms':>11}")
+    rows = {}
+    for name, settings in (("fixed", fixed), ("adaptive", adaptive)):
+        r = rows[name] = run(backend, settings, golden, args.base_ms, args.prefill_ms_per_ktok)
+        print(f"{name:>9} {r['chunks']:>7.1f} {r['min_chunks']:>4} {r['prompt_tokens']:>10.0f} "
+              f"{r['answer_hit_rate']:>10.3f} {r['select_ms']:>9.2f} {r['complete_ms']:>11.0f}")
+    saved = rows["fixed"]["complete_ms"] - rows["adaptive"]["complete_ms"] - rows["adaptive"]["select_ms"]
+    print(f"\nSaved per answer: {saved:.0f} ms "
+          f"({saved / rows['fixed']['complete_ms']:.0%} of the modelled completion latency)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""Speed and field accuracy of brochure metadata extraction.
+
+Compares ``brochure_info.extract`` with the PDF Viewer's previous extractor
+(PyPDF2 on the first three pages, one regex per field, a substring test per
+tag) on the hand-checked labels in ``benchmarks/data/brochure_labels.jsonl``.
+Speed is measured over every brochure in ``pdfs/``.
+
+Run from the repository root::
+
+    python -m benchmarks.brochure_info_bench
+    python -m benchmarks.brochure_info_bench --repeat 3
+"""
+
+import argparse
+import json
+import os
+import re
+import time
+
+import brochure_info
+
+LABELS_FILE = os.path.join(os.path.dirname(__file__), "data", "brochure_labels.jsonl")
+PDF_DIR = "pdfs"
+FIELDS = ("title", "code", "days", "nights", "tour_type", "route", "regions")
+LEGACY_TAGS = ["Ocean Cruise", "River Cruise", "Land Tour", "4WD", "Europe", "Asia", "Australia",
+               "New Zealand", "Africa", "South America"]
+
+
+def legacy_extract(path):
+    """The PDF Viewer's extractor before ``brochure_info``, mapped onto the labelled fields."""
+    import PyPDF2
+
+    with open(path, "rb") as f:
+        reader = PyPDF2.PdfReader(f)
+        text = "".join(page.extract_text() or "" for page in reader.pages[:3])
+    text = re.sub(r"[^\x00-\x7F]+", " ", text)
+    code = re.search(r"\b[A-Z]{3,}\d{2,}\b", text)
+    days = re.search(r"\b(\d+)\s+days?\s*/\s*(\d+)\s+nights?\b", text, re.IGNORECASE)
+    route = re.search(r"(\b\w+ to \w+\b)", text)
+    tags = [tag for tag in LEGACY_TAGS if tag.lower() in text.lower()]
+    return {
+        "title": text.strip().split("\n")[0][:80],
+        "code": code.group(0) if code else "",
+        "days": int(days.group(1)) if days else 0,
+        "nights": int(days.group(2)) if days else 0,
+        "tour_type": next((t.replace("4WD", "4WD Tour") for t in tags if t not in LEGACY_TAGS[4:]), ""),
+        "route": route.group(0) if route else "",
+        "regions": [t for t in tags if t in LEGACY_TAGS[4:]],
+    }
+
+
+def new_extract(path):
+    info = brochure_info.extract(path)
+    return {f: getattr(info, f) for f in FIELDS}
+
+
+def load_labels(path=LABELS_FILE):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def _same(field, got, want):
+    if field == "regions":
+        return sorted(got) == sorted(want)
+    if isinstance(want, str):
+        return " ".join(str(got).split()).lower() == " ".join(want.split()).lower()
+    return got == want
+
+
+def accuracy(extract, labels, pdf_dir):
+    correct = dict.fromkeys(FIELDS, 0)
+    misses = []
+    for label in labels:
+        got = extract(os.path.join(pdf_dir, label["file"]))
+        for field in FIELDS:
+            if _same(field, got[field], label[field]):
+                correct[field] += 1
+            else:
+                misses.append((label["file"], field, got[field], label[field]))
+    return {f: correct[f] / len(labels) for f in FIELDS}, misses
+
+
+def files_per_second(extract, paths, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for path in paths:
+            extract(path)
+    return len(paths) * repeat / (time.perf_counter() - start)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--labels", default=LABELS_FILE)
+    parser.add_argument("--pdf-dir", default=PDF_DIR)
+    parser.add_argument("--repeat", type=int, default=1, help="passes over pdfs/ for the speed figure")
+    parser.add_argument("--show-misses", action="store_true")
+    args = parser.parse_args(argv)
+
+    labels = load_labels(args.labels)
+    paths = [os.path.join(args.pdf_dir, f) for f in sorted(os.listdir(args.pdf_dir)) if f.lower().endswith(".pdf")]
+    print(f"{len(labels)} labelled brochures, speed over {len(paths)} brochures\n")
+    print(f"{'extractor':>10} {'files/s':>8} " + " ".join(f"{f:>9}" for f in FIELDS))
+    for name, extract in (("legacy", legacy_extract), ("new", new_extract)):
+        rate = files_per_second(extract, paths, args.repeat)
+        scores, misses = accuracy(extract, labels, args.pdf_dir)
+        print(f"{name:>10} {rate:>8.1f} " + " ".join(f"{scores[f]:>9.2f}" for f in FIELDS))
+        if args.show_misses:
+            for file, field, got, want in misses:
+                print(f"    {file[:40]:<40} {field:<9} got {got!r}, want {want!r}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""Trip catalog: build and refresh cost, and lookups against re-discovering by scan.
+
+Copies ``pdfs/`` and the fleet (``Fleet_snapshots/`` or ``Fleet_pdfs/``) to a scratch directory and times a
+cold ``catalog.TripCatalog`` build, loading the saved catalog in a new
+process-like instance, a no-op ``refresh``, and a refresh after one brochure
+changes. It then times looking up ``--lookups`` trip codes (brochure, ships
+and region) with ``TripCatalog.get`` against what the pages did before:
+list ``pdfs/`` for the code's brochure, read the tour records, and search
+every brochure's text for the fleet's ship names.
+
+Run from the repository root::
+
+    python -m benchmarks.catalog_bench
+    python -m benchmarks.catalog_bench --lookups 20
+"""
+
+import argparse
+import os
+import random
+import shutil
+import tempfile
+import time
+
+import brochure_info
+import catalog
+import shared_cache
+import tour_facts
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return (time.perf_counter() - start) * 1000, result
+
+
+def scan_lookup(code, pdf_dir, fleet_dirs, tour_info):
+    """A trip's brochures, ships and region found the way the pages found them, by scanning."""
+    brochures = [f for f in sorted(os.listdir(pdf_dir)) if f.upper().startswith(code + " ")]
+    tour = next((t for t in tour_facts._load_tour_info(tour_info) if t.get("trip_code", "").upper() == code), None)
+    patterns = catalog.ship_patterns(catalog.fleet_ships(*fleet_dirs))
+    ships = set()
+    for f in brochures:
+        ships.update(catalog.ships_named(brochure_info.read_text(os.path.join(pdf_dir, f)), patterns))
+    return brochures, sorted(ships), tour["region"] if tour else None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pdf-dir", default=catalog.PDF_DIR)
+    parser.add_argument("--fleet-dir", default=catalog.FLEET_DIR)
+    parser.add_argument("--fleet-pdf-dir", default=catalog.FLEET_PDF_DIR)
+    parser.add_argument("--lookups", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf_dir = shutil.copytree(args.pdf_dir, os.path.join(tmp, "pdfs"))
+        fleet_dirs = [shutil.copytree(d, os.path.join(tmp, name)) if os.path.isdir(d) else os.path.join(tmp, name)
+                      for d, name in ((args.fleet_dir, "fleet"), (args.fleet_pdf_dir, "fleet_pdfs"))]
+        path = os.path.join(tmp, "trip_catalog.json")
+        # A private cache file so the cold build pays for brochure parsing like a fresh host.
+        shared_cache.CACHE = shared_cache.SharedCache(os.path.join(tmp, "cache.db"))
+
+        def fresh():
+            return catalog.TripCatalog(path, pdf_dir, fleet_dirs[0], fleet_pdf_dir=fleet_dirs[1])
+
+        cold_ms, _ = timed(fresh().refresh)
+        cat = fresh()
+        load_ms, _ = timed(cat.refresh)
+        noop_ms, _ = timed(cat.refresh)
+        touched = sorted(os.listdir(pdf_dir))[0]
+        os.utime(os.path.join(pdf_dir, touched), (time.time() + 10, time.time() + 10))
+        one_ms, _ = timed(cat.refresh)
+
+        codes = random.Random(args.seed).sample(sorted(cat.trips), min(args.lookups, len(cat.trips)))
+        start = time.perf_counter()
+        for _ in range(1000):
+            for code in codes:
+                cat.get(code)
+        get_us = (time.perf_counter() - start) / (1000 * len(codes)) * 1e6
+        scan_ms = sum(timed(lambda: scan_lookup(code, pdf_dir, fleet_dirs, cat.tour_info))[0]
+                      for code in codes) / len(codes)
+        size_kb = os.path.getsize(path) / 1024
+
+    trips = cat.trips.values()
+    print(f"{len(cat.trips)} trips: {sum(bool(t.brochures) for t in trips)} with brochures, "
+          f"{sum(bool(t.tour) for t in trips)} with tour records, {sum(bool(t.ships) for t in trips)} with ships; "
+          f"catalog file {size_kb:.0f} KB\n")
+    print(f"{'step':>24} {'ms':>10}")
+    for name, ms in (("cold build", cold_ms), ("load saved catalog", load_ms), ("no-op refresh", noop_ms),
+                     ("one brochure changed", one_ms), ("lookup by scan", scan_ms), ("TripCatalog.get", get_us / 1000)):
+        print(f"{name:>24} {ms:>10.4f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""Compare chunking strategies on retrieval hit rate and prompt size.
+
+Chunks every brochure in ``pdfs/`` with each ``chunker`` strategy, indexes
+the chunks in a local BM25 index (a stand-in for Cortex Search) and runs the
+questions in ``benchmarks/data/golden_set.jsonl``. For each strategy it
+reports how often the expected brochure and the answer text make it into the
+top ``k`` chunks, the rank of the first chunk holding the answer, and how
+many tokens those ``k`` chunks add to the prompt.
+
+Run from the repository root::
+
+    python -m benchmarks.chunking_bench
+    python -m benchmarks.chunking_bench --k 6 --max-tokens 384 --overlap 48
+"""
+
+import argparse
+import json
+import math
+import os
+import time
+from collections import Counter
+
+import chunker
+import dedupe
+import retrieval
+
+GOLDEN_FILE = os.path.join(os.path.dirname(__file__), "data", "golden_set.jsonl")
+PDF_DIR = "pdfs"
+
+
+def load_golden(path=GOLDEN_FILE):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+class BM25:
+    """Okapi BM25 over ``(file, chunk, sources)`` triples."""
+
+    def __init__(self, docs, k1=1.2, b=0.75):
+        self.docs = docs
+        self.k1, self.b = k1, b
+        self.tfs = [Counter(retrieval.terms(f"{file}: {c.text}")) for file, c, _ in docs]
+        self.lengths = [sum(tf.values()) for tf in self.tfs]
+        self.avg_length = sum(self.lengths) / max(len(self.lengths), 1)
+        df = Counter(t for tf in self.tfs for t in tf)
+        n = len(docs)
+        self.idf = {t: math.log(1 + (n - d + 0.5) / (d + 0.5)) for t, d in df.items()}
+
+    def search(self, query, k):
+        query_terms = set(retrieval.terms(query))
+        scores = []
+        for i, (tf, length) in enumerate(zip(self.tfs, self.lengths)):
+            norm = self.k1 * (1 - self.b + self.b * length / self.avg_length)
+            score = sum(self.idf[t] * tf[t] * (self.k1 + 1) / (tf[t] + norm) for t in query_terms if t in tf)
+            if score:
+                scores.append((score, i))
+        return [self.docs[i] for _, i in sorted(scores, reverse=True)[:k]]
+
+
+def chunk_corpus(corpus, strategy, max_tokens, overlap, index=None):
+    start = time.perf_counter()
+    if index is not None:
+        docs, _ = dedupe.dedupe_corpus(corpus, index, strategy, max_tokens, overlap)
+    else:
+        docs = [(file, c, [[file, c.page]]) for file, pages in corpus.items()
+                for c in chunker.chunk_pages(pages, strategy, max_tokens, overlap)]
+    return docs, time.perf_counter() - start
+
+
+def evaluate(index, golden, k):
+    file_hits = answer_hits = 0
+    reciprocal_ranks, prompt_tokens = [], []
+    for item in golden:
+        top = index.search(item["question"], k)
+        answer = item["answer"].lower()
+        from_file = [any(f == item["file"] for f, _ in sources) for _, _, sources in top]
+        file_hits += any(from_file)
+        rank = next((n for n, ((_, c, _), ok) in enumerate(zip(top, from_file), 1)
+                     if ok and answer in c.text.lower()), None)
+        answer_hits += rank is not None
+        reciprocal_ranks.append(1 / rank if rank else 0.0)
+        prompt_tokens.append(sum(chunker.estimate_tokens(f"{file}: {c.text}") for file, c, _ in top))
+    n = len(golden)
+    return {
+        "file_hit_rate": round(file_hits / n, 3),
+        "answer_hit_rate": round(answer_hits / n, 3),
+        "mrr": round(sum(reciprocal_ranks) / n, 3),
+        "prompt_tokens": round(sum(prompt_tokens) / n),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--golden", default=GOLDEN_FILE, help="JSONL with question, file and answer")
+    parser.add_argument("--pdf-dir", default=PDF_DIR)
+    parser.add_argument("--strategies", default=",".join(chunker.STRATEGIES))
+    parser.add_argument("--k", type=int, default=8, help="chunks retrieved per question")
+    parser.add_argument("--max-tokens", type=int, default=chunker.DEFAULT_MAX_TOKENS)
+    parser.add_argument("--overlap", type=int, default=chunker.DEFAULT_OVERLAP)
+    parser.add_argument("--dedupe", action="store_true", help="also run each strategy with shared boilerplate collapsed")
+    args = parser.parse_args(argv)
+
+    golden = load_golden(args.golden)
+    corpus = dedupe.read_corpus(args.pdf_dir)
+    variants = [(s, None) for s in args.strategies.split(",")]
+    if args.dedupe:
+        index = dedupe.PassageIndex(path=None)
+        index.rebuild(corpus)
+        variants += [(f"{s}+dd", index) for s in args.strategies.split(",")]
+    print(f"{len(golden)} questions, top {args.k} chunks\n")
+    print(f"{'strategy':>8} {'chunks':>7} {'mean tok':>8} {'chunk s':>8} "
+          f"{'file hit':>8} {'answer hit':>10} {'mrr':>6} {'prompt tok':>10}")
+    for name, index in variants:
+        strategy = name.split("+")[0]
+        docs, seconds = chunk_corpus(corpus, strategy, args.max_tokens, args.overlap, index)
+        mean_tokens = sum(c.tokens for _, c, _ in docs) / max(len(docs), 1)
+        r = evaluate(BM25(docs), golden, args.k)
+        print(f"{name:>8} {len(docs):>7} {mean_tokens:>8.0f} {seconds:>8.1f} "
+              f"{r['file_hit_rate']:>8} {r['answer_hit_rate']:>10} {r['mrr']:>6} {r['prompt_tokens']:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""Cost of checking a citation: the whole brochure versus just the cited page.
+
+For ``--pages`` random (brochure, page) citations over ``pdfs/`` it times
+reading the whole file (what downloading from the PDF Viewer costs) against
+``citations.page_image`` and ``citations.page_text``, cold and then served
+from ``shared_cache``, and reports the bytes each hands to the browser.
+
+Run from the repository root::
+
+    python -m benchmarks.citations_bench
+    python -m benchmarks.citations_bench --pages 50 --zoom 1.0
+"""
+
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+import fitz
+
+import citations
+import shared_cache
+
+PDF_DIR = "pdfs"
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return (time.perf_counter() - start) * 1000, len(result)
+
+
+def read_file(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pdf-dir", default=PDF_DIR)
+    parser.add_argument("--pages", type=int, default=30, help="citations to check")
+    parser.add_argument("--zoom", type=float, default=citations.ZOOM)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    paths = [os.path.join(args.pdf_dir, f) for f in sorted(os.listdir(args.pdf_dir)) if f.lower().endswith(".pdf")]
+    cited = []
+    for path in rng.sample(paths, min(args.pages, len(paths))):
+        with fitz.open(path) as doc:
+            cited.append((path, rng.randint(1, len(doc))))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # A private cache file so earlier runs and the app's cache do not make the cold numbers warm.
+        shared_cache.CACHE = shared_cache.SharedCache(os.path.join(tmp, "cache.db"))
+        modes = {
+            "whole file": lambda p, n: read_file(p),
+            "page png": lambda p, n: citations.page_image(p, n, args.zoom),
+            "png cached": lambda p, n: citations.page_image(p, n, args.zoom),
+            "page text": lambda p, n: citations.page_text(p, n),
+            "text cached": lambda p, n: citations.page_text(p, n),
+        }
+        print(f"{len(cited)} citations over {len(paths)} brochures\n")
+        print(f"{'mode':>12} {'mean ms':>8} {'p95 ms':>8} {'mean KB':>8}")
+        for name, fn in modes.items():
+            ms, size = zip(*(timed(lambda: fn(p, n)) for p, n in cited))
+            p95 = sorted(ms)[min(len(ms) - 1, int(len(ms) * 0.95))]
+            print(f"{name:>12} {statistics.mean(ms):>8.2f} {p95:>8.2f} {statistics.mean(size) / 1024:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
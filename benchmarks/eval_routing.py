@@ -0,0 +1,142 @@
+"""Offline evaluation of model routing.
+
+Replays recorded chat prompts through ``routing.routed_complete`` with the
+``auto`` model and through the large model alone, using ``FakeModel`` for
+answers and latency. Reports latency and credit savings against how often
+the routed answer agrees with the large-model answer.
+
+Run from the repository root::
+
+    python -m benchmarks.eval_routing
+    python -m benchmarks.eval_routing --small-quality 0.7:0.4 --prompts my_prompts.jsonl
+"""
+
+import argparse
+import json
+import os
+import re
+
+import pipeline
+import routing
+from benchmarks.fakes import FakeModel, Latency
+
+PROMPTS_FILE = os.path.join(os.path.dirname(__file__), "data", "routing_prompts.jsonl")
+AGREEMENT_F1 = 0.8
+
+
+def load_prompts(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def token_f1(a, b):
+    ta, tb = re.findall(r"\w+", a.lower()), re.findall(r"\w+", b.lower())
+    if not ta or not tb:
+        return float(ta == tb)
+    common = sum(min(ta.count(t), tb.count(t)) for t in set(ta))
+    if not common:
+        return 0.0
+    precision, recall = common / len(ta), common / len(tb)
+    return 2 * precision * recall / (precision + recall)
+
+
+def parse_quality(spec):
+    lookup, synthesis = (float(v) for v in spec.split(":"))
+    return {"lookup": lookup, "synthesis": synthesis}
+
+
+def run_calls(model, fn):
+    """Run ``fn`` and return its result with the ``(model, ms, prompt)`` calls it made."""
+    start = len(model.calls)
+    result = fn()
+    return result, model.calls[start:]
+
+
+def latency_of(calls):
+    return sum(ms for _, ms, _ in calls)
+
+
+def credits_of(calls):
+    return sum(routing.estimate_credits(m, prompt) for m, _, prompt in calls)
+
+
+def evaluate(prompts, model):
+    rows = []
+    for record in prompts:
+        question = record["question"]
+        prompt = pipeline.answer_prompt("", record.get("context", ""), question)
+        reference, base_calls = run_calls(
+            model, lambda: pipeline.complete(model, routing.LARGE_MODEL, prompt))
+        (reply, used), routed_calls = run_calls(
+            model, lambda: routing.routed_complete(model, routing.AUTO_MODEL, question, prompt))
+        predicted, _ = routing.classify(question)
+        rows.append({
+            "question": question,
+            "kind": record.get("kind"),
+            "predicted": predicted,
+            "model": used,
+            "escalated": len(routed_calls) > 1,
+            "f1": token_f1(reply, reference),
+            "base_ms": latency_of(base_calls),
+            "routed_ms": latency_of(routed_calls),
+            "base_credits": credits_of(base_calls),
+            "routed_credits": credits_of(routed_calls),
+        })
+    return rows
+
+
+def summarize(rows):
+    n = len(rows)
+    base_ms = sum(r["base_ms"] for r in rows)
+    routed_ms = sum(r["routed_ms"] for r in rows)
+    base_credits = sum(r["base_credits"] for r in rows)
+    routed_credits = sum(r["routed_credits"] for r in rows)
+    labelled = [r for r in rows if r["kind"]]
+    return {
+        "prompts": n,
+        "routed_to_small": sum(1 for r in rows if r["model"] == routing.SMALL_MODEL),
+        "escalated": sum(1 for r in rows if r["escalated"]),
+        "classifier_accuracy": round(sum(r["kind"] == r["predicted"] for r in labelled) / len(labelled), 3)
+        if labelled else None,
+        "agreement_rate": round(sum(r["f1"] >= AGREEMENT_F1 for r in rows) / n, 3),
+        "mean_f1": round(sum(r["f1"] for r in rows) / n, 3),
+        "mean_latency_ms_large": round(base_ms / n, 1),
+        "mean_latency_ms_routed": round(routed_ms / n, 1),
+        "latency_saved_pct": round(100 * (1 - routed_ms / base_ms), 1) if base_ms else 0.0,
+        "credits_large": round(base_credits, 6),
+        "credits_routed": round(routed_credits, 6),
+        "cost_saved_pct": round(100 * (1 - routed_credits / base_credits), 1) if base_credits else 0.0,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--prompts", default=PROMPTS_FILE, help="JSONL with question, optional kind and context")
+    parser.add_argument("--small-quality", default="0.9:0.55", help="small model agreement for lookup:synthesis")
+    parser.add_argument("--large-quality", default="1.0:1.0")
+    parser.add_argument("--small-latency", default="lognormal:450:1200")
+    parser.add_argument("--large-latency", default="lognormal:2500:7000")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--verbose", action="store_true", help="print one line per prompt")
+    args = parser.parse_args(argv)
+
+    prompts = load_prompts(args.prompts)
+    model = FakeModel(
+        quality={routing.SMALL_MODEL: parse_quality(args.small_quality),
+                 routing.LARGE_MODEL: parse_quality(args.large_quality)},
+        latency={routing.SMALL_MODEL: Latency.parse(args.small_latency),
+                 routing.LARGE_MODEL: Latency.parse(args.large_latency)},
+        kinds={p["question"]: p.get("kind", "synthesis") for p in prompts},
+        seed=args.seed,
+    )
+    rows = evaluate(prompts, model)
+    if args.verbose:
+        for r in rows:
+            print(f"{r['model']:>15} {'esc' if r['escalated'] else '   '} f1={r['f1']:.2f} "
+                  f"{r['routed_ms']:7.0f}ms vs {r['base_ms']:7.0f}ms  {r['question']}")
+    for key, value in summarize(rows).items():
+        print(f"{key:>24}: {value}")
+
+
+if __name__ == "__main__":
+    main()
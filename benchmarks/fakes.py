@@ -0,0 +1,245 @@
+"""Local stand-ins for Cortex ``Complete``, Cortex Search and the connector.
+
+Each fake sleeps for a latency drawn from a configurable distribution so the
+benchmarks exercise the real pipeline code without touching Snowflake.
+"""
+
+import json
+import math
+import random
+import re
+import threading
+import time
+
+
+class Latency:
+    """Latency distribution in milliseconds.
+
+    ``kind`` is ``"fixed"`` (``ms``), ``"uniform"`` (``low``/``high``) or
+    ``"lognormal"`` (``p50``/``p95``), the last being the usual shape of
+    remote call latencies with a long tail.
+    """
+
+    def __init__(self, kind="lognormal", **params):
+        self.kind = kind
+        self.params = params
+
+    @classmethod
+    def parse(cls, spec):
+        """Build from ``"fixed:20"``, ``"uniform:10:40"`` or ``"lognormal:200:900"``."""
+        kind, *values = spec.split(":")
+        values = [float(v) for v in values]
+        if kind == "fixed":
+            return cls("fixed", ms=values[0])
+        if kind == "uniform":
+            return cls("uniform", low=values[0], high=values[1])
+        if kind == "lognormal":
+            return cls("lognormal", p50=values[0], p95=values[1])
+        raise ValueError(f"Unknown latency kind: {kind}")
+
+    def sample(self, rng=random):
+        if self.kind == "fixed":
+            return self.params["ms"]
+        if self.kind == "uniform":
+            return rng.uniform(self.params["low"], self.params["high"])
+        p50, p95 = self.params["p50"], self.params["p95"]
+        sigma = math.log(p95 / p50) / 1.645
+        return rng.lognormvariate(math.log(p50), sigma)
+
+    def sleep(self, rng=random):
+        ms = self.sample(rng)
+        time.sleep(ms / 1000)
+        return ms
+
+
+def _terms(text):
+    return set(re.findall(r"[a-z0-9]+", text.lower()))
+
+
+def synthetic_corpus(num_docs=20, chunks_per_doc=12, seed=7):
+    """Brochure-like chunks keyed by ``relative_path`` for the fake search service."""
+    rng = random.Random(seed)
+    places = ["Tokyo", "Kyoto", "Hanoi", "Siem Reap", "Prague", "Vienna", "Budapest", "Broome",
+              "Darwin", "Dubrovnik", "Lisbon", "Porto", "Reykjavik", "Cape Town", "Nairobi"]
+    topics = ["Signature Experience", "Freedom of Choice", "itinerary", "cabin", "meals",
+              "transfers", "highlights", "river cruise", "guided walking tour", "scenic flight"]
+    corpus = []
+    for d in range(num_docs):
+        path = f"BENCH{d:02d} Sample Tour 2026.pdf"
+        for c in range(chunks_per_doc):
+            words = [rng.choice(places), rng.choice(topics), rng.choice(places), rng.choice(topics)]
+            body = f"Day {c + 1}: " + " ".join(words) + ". " + " ".join(
+                rng.choice(topics) for _ in range(60))
+            corpus.append({"relative_path": path, "file_url": f"file://{path}", "chunk": body,
+                           "sources": json.dumps([[path, c // 3 + 1]])})
+    return corpus
+
+
+class FakeBackend:
+    """Drop-in replacement for ``pipeline.CortexBackend``.
+
+    Completion latency is drawn per model so routing and fallback experiments
+    can give small models a different profile from large ones.
+    """
+
+    def __init__(self, corpus=None, complete_latency=None, search_latency=None, model_latency=None, seed=None):
+        self.corpus = corpus if corpus is not None else synthetic_corpus()
+        self._corpus_terms = [_terms(r["chunk"]) for r in self.corpus]
+        self.complete_latency = complete_latency or Latency("lognormal", p50=1200, p95=4000)
+        self.search_latency = search_latency or Latency("lognormal", p50=150, p95=600)
+        self.model_latency = model_latency or {}
+        self.rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = {"complete": 0, "search": 0}
+
+    def _count(self, name):
+        with self._lock:
+            self.calls[name] += 1
+
+    def complete(self, model, prompt):
+        self._count("complete")
+        self.model_latency.get(model, self.complete_latency).sleep(self.rng)
+        question = re.search(r"<question>(.*?)</question>", prompt, re.S)
+        return f"[{model}] answer to: {question.group(1).strip() if question else prompt[:80]}"
+
+    def search(self, service, query, columns, filter, limit):
+        self._count("search")
+        self.search_latency.sleep(self.rng)
+        query_terms = _terms(query)
+        scored = sorted(
+            range(len(self.corpus)),
+            key=lambda i: len(query_terms & self._corpus_terms[i]),
+            reverse=True,
+        )
+        return [{k: v for k, v in self.corpus[i].items() if k in columns} for i in scored[:limit]]
+
+
+class InjectedFault(ConnectionError):
+    """Raised by ``FaultyBackend`` in place of a remote error."""
+
+
+class FaultyBackend:
+    """Wraps a backend and injects failures for resilience experiments.
+
+    Each call fails with ``InjectedFault`` with probability ``error_rate``
+    (after ``error_ms``, so errors are not free) and otherwise stalls for
+    ``stall_ms`` with probability ``stall_rate`` before running. Models in
+    ``down`` always fail, as does search when ``"search"`` is in it; the set
+    can be changed while a benchmark runs to start or end an outage.
+    """
+
+    def __init__(self, backend, error_rate=0.0, stall_rate=0.0, stall_ms=30000, error_ms=50, down=(), seed=None):
+        self.backend = backend
+        self.error_rate = error_rate
+        self.stall_rate = stall_rate
+        self.stall_ms = stall_ms
+        self.error_ms = error_ms
+        self.down = set(down)
+        self.rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.faults = {"error": 0, "stall": 0, "down": 0}
+
+    def _inject(self, name):
+        with self._lock:
+            roll = self.rng.random()
+            fault = "down" if name in self.down else "error" if roll < self.error_rate else (
+                "stall" if roll < self.error_rate + self.stall_rate else None)
+            if fault:
+                self.faults[fault] += 1
+        if fault == "stall":
+            time.sleep(self.stall_ms / 1000)
+        elif fault:
+            time.sleep(self.error_ms / 1000)
+            raise InjectedFault(f"injected {fault} for {name}")
+
+    def complete(self, model, prompt):
+        self._inject(model)
+        return self.backend.complete(model, prompt)
+
+    def search(self, service, query, columns, filter, limit):
+        self._inject("search")
+        return self.backend.search(service, query, columns, filter, limit)
+
+
+class FakeCursor:
+    def __init__(self, connection):
+        self.connection = connection
+
+    def execute(self, sql, params=None):
+        statement = sql.strip().split()[0].upper()
+        self.connection.statement_latency.get(statement, self.connection.default_latency).sleep()
+        self.connection.executed.append(sql)
+        return self
+
+    def executemany(self, sql, rows):
+        return self.execute(sql)
+
+    def fetchall(self):
+        return []
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    """Stand-in for ``snowflake.connector`` connections used by ``ingest``.
+
+    Statement latency is keyed by the first SQL keyword (``PUT``, ``INSERT``,
+    ``CREATE``...); everything else uses ``default_latency``.
+    """
+
+    def __init__(self, statement_latency=None, default_latency=None):
+        self.statement_latency = statement_latency if statement_latency is not None else {
+            "PUT": Latency("lognormal", p50=400, p95=1500),
+            "INSERT": Latency("lognormal", p50=900, p95=3000),
+            "CREATE": Latency("lognormal", p50=600, p95=2000),
+        }
+        self.default_latency = default_latency or Latency("fixed", ms=20)
+        self.executed = []
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def close(self):
+        pass
+
+
+class FakeModel:
+    """Deterministic stand-in for model quality in offline evaluations.
+
+    For each ``(model, question)`` the reply agrees with a reference answer
+    with probability ``quality[model][kind]``; otherwise it is an unsure
+    refusal (``refusal_rate``) or a degraded answer. Latency is sampled but
+    not slept, and accumulated in ``calls`` for reporting.
+    """
+
+    REFUSAL = "I could not find that in the brochures."
+
+    def __init__(self, quality, latency, kinds, refusal_rate=0.6, seed=0):
+        self.quality = quality
+        self.latency = latency
+        self.kinds = kinds
+        self.refusal_rate = refusal_rate
+        self.seed = seed
+        self.calls = []
+
+    @staticmethod
+    def reference(question):
+        return f"Reference answer for {question} with the relevant brochure details included."
+
+    def complete(self, model, prompt):
+        match = re.search(r"<question>(.*?)</question>", prompt, re.S)
+        question = match.group(1).strip() if match else prompt
+        rng = random.Random(f"{self.seed}:{model}:{question}")
+        ms = self.latency[model].sample(rng)
+        self.calls.append((model, ms, prompt))
+        kind = self.kinds.get(question, "synthesis")
+        if rng.random() < self.quality[model][kind]:
+            return self.reference(question)
+        if rng.random() < self.refusal_rate:
+            return self.REFUSAL
+        words = self.reference(question).split()
+        return " ".join(words[: len(words) // 2]) + " and some loosely related details."
+
+    def search(self, service, query, columns, filter, limit):
+        return []
@@ -0,0 +1,78 @@
+"""Overhead of the rerun profiling hook, off and on.
+
+Times a pure-Python stand-in for a rerun, rebuilding the ``suggest`` index
+from already-extracted brochures, ``--runs`` times with
+``profiling.profile_rerun`` disabled, with no hook at all and with the hook
+enabled (``cProfile`` plus the stack sampler). It reports the mean and p95
+per run, the overhead against no hook, and the samples and hotspots
+collected.
+
+Run from the repository root::
+
+    python -m benchmarks.profiling_bench
+    python -m benchmarks.profiling_bench --runs 50
+"""
+
+import argparse
+import statistics
+import tempfile
+import time
+
+import profiling
+import suggest
+
+
+def timed_ms(modes, runs):
+    """Milliseconds per run for each mode, interleaved so drift and warm-up hit every mode alike."""
+    times = {name: [] for name in modes}
+    for fn in modes.values():
+        fn()
+    for _ in range(runs):
+        for name, fn in modes.items():
+            start = time.perf_counter()
+            fn()
+            times[name].append((time.perf_counter() - start) * 1000)
+    return times
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pdf-dir", default=suggest.PDF_DIR)
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    index = suggest.SuggestIndex(args.pdf_dir)
+    index.refresh()
+    last = {}
+
+    def rerun():
+        index._rebuild()
+
+    def disabled():
+        with profiling.profile_rerun("bench", enabled=False):
+            rerun()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        def enabled():
+            with profiling.profile_rerun("bench", profile_dir=tmp) as profile:
+                rerun()
+            last["profile"] = profile
+
+        modes = {"no hook": rerun, "disabled": disabled, "enabled": enabled}
+        results = timed_ms(modes, args.runs)
+
+    base = statistics.mean(results["no hook"])
+    print(f"{args.runs} runs of a {len(index._view.keys)}-key index rebuild\n")
+    print(f"{'mode':>9} {'mean ms':>8} {'p95 ms':>8} {'overhead':>9}")
+    for name, ms in results.items():
+        p95 = sorted(ms)[min(len(ms) - 1, int(len(ms) * 0.95))]
+        print(f"{name:>9} {statistics.mean(ms):>8.2f} {p95:>8.2f} {statistics.mean(ms) / base - 1:>+9.1%}")
+
+    profile = last["profile"]
+    print(f"\nlast profiled run: {profile.samples} samples, top own time:")
+    for row in profile.hotspots[:5]:
+        print(f"  {row['own ms']:>8.2f} ms  {row['function']} ({row['where']})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""Chat turns under injected faults, with and without ``resilience.ResilientBackend``.
+
+Every simulated user asks ``QUESTIONS`` in turn; each turn retrieves with
+``pipeline.build_prompt`` and answers with ``pipeline.complete`` on the large
+model, against the benchmark fakes wrapped in ``FaultyBackend``. Scenarios:
+
+* ``healthy``: no faults;
+* ``flaky``: ``--error-rate`` of calls fail;
+* ``stalls``: ``--stall-rate`` of calls hang for ``--stall-ms``;
+* ``outage``: the large model fails every call.
+
+For each scenario it reports the share of turns answered, turn latency
+percentiles, how many turns were answered by the fallback model and how
+many remote calls were made per turn (hedges and retries cost calls).
+
+Run from the repository root::
+
+    python -m benchmarks.resilience_bench
+    python -m benchmarks.resilience_bench --users 8 --turns 20 --stall-ms 10000
+"""
+
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pipeline
+import resilience
+import routing
+from benchmarks.fakes import FakeBackend, FaultyBackend, Latency
+from benchmarks.run_benchmarks import QUESTIONS, percentile
+
+
+def scenarios(args):
+    return {
+        "healthy": {},
+        "flaky": {"error_rate": args.error_rate},
+        "stalls": {"stall_rate": args.stall_rate, "stall_ms": args.stall_ms},
+        "outage": {"down": {routing.LARGE_MODEL}},
+    }
+
+
+def run(backend, remote, users, turns, settings):
+    latencies, answered, fallback = [], 0, 0
+
+    def user_loop(user):
+        nonlocal answered, fallback
+        for turn in range(turns):
+            start = time.perf_counter()
+            try:
+                prompt, _, _ = pipeline.build_prompt(backend, settings, QUESTIONS[(user + turn) % len(QUESTIONS)])
+                reply = pipeline.complete(backend, settings.model_name, prompt)
+            except Exception:
+                reply = None
+            latencies.append((time.perf_counter() - start) * 1000)
+            if reply is not None:
+                answered += 1
+                fallback += not reply.startswith(f"[{settings.model_name}]")
+
+    with ThreadPoolExecutor(max_workers=users) as pool:
+        list(pool.map(user_loop, range(users)))
+    n = users * turns
+    return {
+        "answered": answered / n,
+        "fallback": fallback / n,
+        "p50_ms": percentile(latencies, 50),
+        "p95_ms": percentile(latencies, 95),
+        "p99_ms": percentile(latencies, 99),
+        "calls_per_turn": sum(remote.calls.values()) / n,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=8, help="simulated concurrent users")
+    parser.add_argument("--turns", type=int, default=25, help="questions per user")
+    parser.add_argument("--scenarios", default="healthy,flaky,stalls,outage")
+    parser.add_argument("--complete-latency", default="lognormal:120:400")
+    parser.add_argument("--search-latency", default="lognormal:15:60")
+    parser.add_argument("--error-rate", type=float, default=0.1)
+    parser.add_argument("--stall-rate", type=float, default=0.03)
+    parser.add_argument("--stall-ms", type=float, default=5000)
+    parser.add_argument("--complete-deadline-s", type=float, default=3.0)
+    parser.add_argument("--search-deadline-s", type=float, default=1.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    settings = pipeline.ChatSettings(model_name=routing.LARGE_MODEL, service="bench", use_chat_history=False)
+    all_scenarios = scenarios(args)
+    print(f"{args.users} users x {args.turns} turns, complete {args.complete_latency}, "
+          f"search {args.search_latency}, deadlines {args.search_deadline_s:g}s search / "
+          f"{args.complete_deadline_s:g}s complete\n")
+    print(f"{'scenario':>9} {'layer':>9} {'answered':>8} {'fallback':>8} {'p50 ms':>8} {'p95 ms':>8} "
+          f"{'p99 ms':>8} {'calls/turn':>10}")
+    for name in args.scenarios.split(","):
+        for layer in ("none", "resilient"):
+            remote = FakeBackend(complete_latency=Latency.parse(args.complete_latency),
+                                 search_latency=Latency.parse(args.search_latency), seed=args.seed)
+            faulty = FaultyBackend(remote, seed=args.seed, **all_scenarios[name])
+            backend = faulty
+            if layer == "resilient":
+                # A fresh guard per run so breakers and latency history start clean.
+                backend = resilience.ResilientBackend(
+                    faulty, guard=resilience.CallGuard(), search_deadline_s=args.search_deadline_s,
+                    complete_deadline_s=args.complete_deadline_s)
+            r = run(backend, remote, args.users, args.turns, settings)
+            print(f"{name:>9} {layer:>9} {r['answered']:>8.3f} {r['fallback']:>8.3f} {r['p50_ms']:>8.0f} "
+                  f"{r['p95_ms']:>8.0f} {r['p99_ms']:>8.0f} {r['calls_per_turn']:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
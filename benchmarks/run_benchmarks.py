@@ -0,0 +1,244 @@
+"""End-to-end latency and load benchmark with local stand-ins.
+
+Drives the real pipeline code (``pipeline.query_cortex``,
+``pipeline.build_prompt``, completions, ``ingest``) against the fakes in
+``benchmarks/fakes.py`` and the PDF Viewer page through Streamlit's AppTest,
+with many simulated users at once. Reports p50/p95/p99 latency, throughput
+and peak traced memory per stage and checks them against
+``benchmarks/baselines.json``.
+
+Run from the repository root::
+
+    python -m benchmarks.run_benchmarks --users 16 --turns 5
+    python -m benchmarks.run_benchmarks --update-baselines
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+import dedupe
+import ingest
+import pipeline
+import singleflight
+from benchmarks.fakes import FakeBackend, FakeConnection, Latency
+
+BASELINES_FILE = os.path.join(os.path.dirname(__file__), "baselines.json")
+PDF_DIR = "pdfs"
+PDF_VIEWER_PAGE = "pages/PDF Viewer.py"
+
+QUESTIONS = [
+    "What Signature Experiences are included in the Vietnam & Cambodia tour?",
+    "What are the scenic highlights of the Danube River Cruise?",
+    "What cities do we visit on the Enchanting Japan tour?",
+    "Are Freedom of Choice activities available in Prague?",
+    "What is the itinerary for the Ancient Kingdoms of Japan and South Korea?",
+    "Which meals are included on day 3 in Kyoto?",
+    "Is there a scenic flight over the Bungle Bungle Range?",
+    "What cabin categories are on the river cruise to Budapest?",
+]
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    k = (len(ordered) - 1) * pct / 100
+    lo = int(k)
+    hi = min(lo + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (k - lo)
+
+
+def run_stage(name, task, users, turns, measure_memory=True):
+    """Run ``task(user, turn)`` for every simulated user concurrently."""
+    latencies = []
+
+    def user_loop(user):
+        for turn in range(turns):
+            start = time.perf_counter()
+            task(user, turn)
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    if measure_memory:
+        tracemalloc.start()
+    wall_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=users) as pool:
+        list(pool.map(user_loop, range(users)))
+    wall = time.perf_counter() - wall_start
+    peak = tracemalloc.get_traced_memory()[1] if measure_memory else 0
+    if measure_memory:
+        tracemalloc.stop()
+
+    return {
+        "stage": name,
+        "calls": len(latencies),
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p95_ms": round(percentile(latencies, 95), 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+        "throughput_per_s": round(len(latencies) / wall, 2) if wall else 0.0,
+        "peak_mem_kb": round(peak / 1024, 1),
+    }
+
+
+def chat_tasks(backend, settings):
+    def question(user, turn):
+        return QUESTIONS[(user + turn) % len(QUESTIONS)]
+
+    def history(user, turn):
+        # Alternate user/assistant turns so build_prompt exercises the rewrite step.
+        messages = []
+        for t in range(turn):
+            messages.append({"role": "user", "content": question(user, t)})
+            messages.append({"role": "assistant", "content": "..."})
+        messages.append({"role": "user", "content": question(user, turn)})
+        return messages
+
+    def query_cortex(user, turn):
+        pipeline.query_cortex(backend, settings, question(user, turn))
+
+    def build_prompt(user, turn):
+        pipeline.build_prompt(backend, settings, question(user, turn), history(user, turn))
+
+    return {"query_cortex": query_cortex, "build_prompt": build_prompt}
+
+
+def complete_task(backend, settings):
+    """Completions only: the prompts are built here, before the stage's clock starts."""
+    prompts = [pipeline.build_prompt(backend, settings, q)[0] for q in QUESTIONS]
+
+    def complete(user, turn):
+        pipeline.complete(backend, settings.model_name, prompts[(user + turn) % len(prompts)])
+
+    return complete
+
+
+def ingest_task(pdf_paths, connection_factory):
+    # Strip only when the app would, with a private index so passage_index.json is not touched.
+    passages = dedupe.PassageIndex(path=None) if ingest.strips_boilerplate(ingest.CHUNKING) else None
+
+    def ingest_one(user, turn):
+        path = pdf_paths[(user + turn) % len(pdf_paths)]
+        file_name = ingest.staged_file_name(path)
+        chunks, shared = ingest.chunk_file(path, file_name, passages=passages)
+        ingest.stage_and_index(connection_factory, path, file_name, chunks, shared, passages)
+
+    return ingest_one
+
+
+def pdf_viewer_task(timeout):
+    from streamlit.testing.v1 import AppTest
+
+    def render(user, turn):
+        at = AppTest.from_file(os.path.abspath(PDF_VIEWER_PAGE), default_timeout=timeout)
+        at.run()
+        if at.exception:
+            raise RuntimeError(f"PDF Viewer raised: {at.exception[0].message}")
+
+    return render
+
+
+def compare_with_baselines(report, baselines, tolerance):
+    """Return a list of human-readable regressions."""
+    regressions = []
+    for row in report:
+        base = baselines.get(row["stage"])
+        if not base:
+            continue
+        for key in ("p50_ms", "p95_ms", "p99_ms", "peak_mem_kb"):
+            if key in base and row[key] > base[key] * (1 + tolerance):
+                regressions.append(f"{row['stage']}: {key} {row[key]} > baseline {base[key]}")
+        if "throughput_per_s" in base and row["throughput_per_s"] < base["throughput_per_s"] * (1 - tolerance):
+            regressions.append(
+                f"{row['stage']}: throughput_per_s {row['throughput_per_s']} < baseline {base['throughput_per_s']}")
+    return regressions
+
+
+def print_report(report):
+    header = ["stage", "calls", "p50_ms", "p95_ms", "p99_ms", "throughput_per_s", "peak_mem_kb"]
+    print(" | ".join(f"{h:>16}" for h in header))
+    for row in report:
+        print(" | ".join(f"{row[h]:>16}" for h in header))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=16, help="simulated concurrent users")
+    parser.add_argument("--turns", type=int, default=5, help="requests per user per stage")
+    parser.add_argument("--stages", default="query_cortex,build_prompt,complete,ingest,pdf_viewer")
+    parser.add_argument("--complete-latency", default="lognormal:120:400", help="e.g. fixed:50, uniform:10:40")
+    parser.add_argument("--search-latency", default="lognormal:15:60")
+    parser.add_argument("--sql-latency", default="lognormal:20:80")
+    parser.add_argument("--chunks", type=int, default=18, help="num_retrieved_chunks")
+    parser.add_argument("--ingest-files", type=int, default=4, help="brochures from pdfs/ to ingest")
+    parser.add_argument("--viewer-users", type=int, default=2, help="concurrent PDF Viewer sessions")
+    parser.add_argument("--viewer-timeout", type=float, default=300)
+    parser.add_argument("--singleflight", action="store_true", help="coalesce identical in-flight calls")
+    parser.add_argument("--no-memory", action="store_true", help="skip tracemalloc (it slows CPU-bound stages)")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed regression vs baseline")
+    parser.add_argument("--update-baselines", action="store_true")
+    parser.add_argument("--output", help="write the report as JSON to this path")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    backend = FakeBackend(
+        complete_latency=Latency.parse(args.complete_latency),
+        search_latency=Latency.parse(args.search_latency),
+        seed=args.seed,
+    )
+    fake_backend = backend
+    if args.singleflight:
+        backend = singleflight.SingleFlightBackend(backend, singleflight.SingleFlight())
+    settings = pipeline.ChatSettings(model_name="mistral-large2", service="bench", num_retrieved_chunks=args.chunks)
+    sql_latency = Latency.parse(args.sql_latency)
+
+    tasks = chat_tasks(backend, settings)
+    pdf_paths = sorted(os.path.join(PDF_DIR, f) for f in os.listdir(PDF_DIR) if f.lower().endswith(".pdf"))
+    tasks["ingest"] = ingest_task(pdf_paths[:args.ingest_files],
+                                  lambda: FakeConnection({}, default_latency=sql_latency))
+
+    report = []
+    for stage in args.stages.split(","):
+        users, turns = args.users, args.turns
+        if stage == "complete":
+            tasks[stage] = complete_task(backend, settings)
+        if stage == "pdf_viewer":
+            # Each viewer run renders the whole library, so one pass per session is enough.
+            tasks[stage] = pdf_viewer_task(args.viewer_timeout)
+            users, turns = args.viewer_users, 1
+        print(f"Running {stage} with {users} users x {turns} turns...")
+        report.append(run_stage(stage, tasks[stage], users, turns, measure_memory=not args.no_memory))
+
+    print_report(report)
+    print(f"Remote calls reaching the fake backend: {fake_backend.calls}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.update_baselines:
+        baselines = {}
+        if os.path.exists(BASELINES_FILE):
+            with open(BASELINES_FILE) as f:
+                baselines = json.load(f)
+        # Only the stages that ran are replaced.
+        baselines.update({row["stage"]: {k: v for k, v in row.items() if k != "stage"} for row in report})
+        with open(BASELINES_FILE, "w") as f:
+            json.dump(baselines, f, indent=2)
+        print(f"Baselines written to {BASELINES_FILE}")
+        return 0
+
+    if not os.path.exists(BASELINES_FILE):
+        print("No baselines recorded yet; run with --update-baselines.")
+        return 0
+    with open(BASELINES_FILE) as f:
+        regressions = compare_with_baselines(report, json.load(f), args.tolerance)
+    for r in regressions:
+        print(f"REGRESSION {r}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
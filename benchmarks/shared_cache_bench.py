@@ -0,0 +1,86 @@
+"""Brochure metadata across several worker processes, with and without ``shared_cache``.
+
+Starts ``--workers`` processes that each load the PDF Viewer's metadata for
+every brochure in ``pdfs/``, as each Streamlit worker does on its first
+visit. Without the shared tier every process extracts every brochure;
+with it the first process to reach a brochure extracts it and the others
+read the pickled result. Reports wall time, extractions and the cache's
+hit rate, plus the cost of one warm ``get``.
+
+Run from the repository root::
+
+    python -m benchmarks.shared_cache_bench
+    python -m benchmarks.shared_cache_bench --workers 8
+"""
+
+import argparse
+import multiprocessing
+import os
+import tempfile
+import time
+
+import brochure_info
+import shared_cache
+
+PDF_DIR = "pdfs"
+
+
+def load_all(args):
+    paths, cache_path = args
+    cache = shared_cache.SharedCache(cache_path) if cache_path else None
+    extracted = 0
+    for path in paths:
+        key = (os.path.basename(path), os.path.getmtime(path))
+        if cache is not None:
+            info = cache.get("brochure_info", key)
+            if info is not None:
+                continue
+        info = brochure_info.extract(path)
+        extracted += 1
+        if cache is not None:
+            cache.set("brochure_info", key, info)
+    return extracted
+
+
+def run(paths, workers, cache_path):
+    # Each worker starts at a different brochure, like users landing on different pages.
+    step = max(1, len(paths) // workers)
+    jobs = [(paths[i * step:] + paths[:i * step], cache_path) for i in range(workers)]
+    start = time.perf_counter()
+    with multiprocessing.Pool(workers) as pool:
+        extracted = sum(pool.map(load_all, jobs))
+    return time.perf_counter() - start, extracted
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pdf-dir", default=PDF_DIR)
+    parser.add_argument("--workers", type=int, default=4, help="Streamlit worker processes to simulate")
+    args = parser.parse_args(argv)
+
+    paths = [os.path.join(args.pdf_dir, f) for f in sorted(os.listdir(args.pdf_dir)) if f.lower().endswith(".pdf")]
+    with tempfile.TemporaryDirectory() as tmp:
+        cache_path = os.path.join(tmp, "shared_cache.db")
+        print(f"{len(paths)} brochures, {args.workers} workers\n")
+        print(f"{'mode':>10} {'wall s':>7} {'extractions':>11}")
+        for name, path in (("per-proc", None), ("shared", cache_path)):
+            wall, extracted = run(paths, args.workers, path)
+            print(f"{name:>10} {wall:>7.2f} {extracted:>11}")
+
+        cache = shared_cache.SharedCache(cache_path)
+        key = (os.path.basename(paths[0]), os.path.getmtime(paths[0]))
+        start = time.perf_counter()
+        for _ in range(1000):
+            cache.get("brochure_info", key)
+        get_us = (time.perf_counter() - start) * 1000
+        start = time.perf_counter()
+        for path in paths[:10]:
+            brochure_info.extract(path)
+        extract_us = (time.perf_counter() - start) / len(paths[:10]) * 1e6
+        stats = cache.stats()["brochure_info"]
+        print(f"\nhit rate {stats['hit_rate']:.3f}, {stats['entries']} entries, {stats['bytes'] / 1024:.0f} KB, "
+              f"warm get {get_us:.0f} us, extract {extract_us:.0f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""Search-as-you-type: the prefix index in ``suggest`` against re-scanning every document.
+
+Builds ``suggest.SuggestIndex`` over ``pdfs/`` and the tour files (cold,
+then a no-op ``refresh`` as every rerun does), then types each of
+``--queries`` one character at a time. For every prefix it times
+``suggest`` and ``matches`` against the substring scan the viewers ran
+before: every brochure's ``search_blob`` plus every tour's fields.
+
+Run from the repository root::
+
+    python -m benchmarks.suggest_bench
+    python -m benchmarks.suggest_bench --queries broome euccdr14 "east africa"
+"""
+
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+import brochure_info
+import shared_cache
+import suggest
+
+QUERIES = ["broome", "euccdr14", "croatia", "kimberley", "east africa", "rhine", "safari"]
+
+
+def timed_us(fn, repeat=50):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def scan(query, blobs, tours):
+    hits = [f for f, blob in blobs if query in blob or query in f.lower()]
+    hits += [t["trip_code"] for t in tours if any(query in (t.get(field) or "").lower()
+                                                   for field in ("trip_name", "trip_code", "region", "country"))]
+    return hits
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pdf-dir", default=suggest.PDF_DIR)
+    parser.add_argument("--queries", nargs="+", default=QUERIES)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # A private cache file so the build below pays for extraction like a fresh host.
+        shared_cache.CACHE = shared_cache.SharedCache(os.path.join(tmp, "cache.db"))
+        index = suggest.SuggestIndex(args.pdf_dir)
+        start = time.perf_counter()
+        index.refresh()
+        build_s = time.perf_counter() - start
+        noop_us = timed_us(index.refresh, repeat=20)
+
+        files = sorted(f for f in os.listdir(args.pdf_dir) if f.lower().endswith(".pdf"))
+        blobs = [(f, brochure_info.extract(os.path.join(args.pdf_dir, f)).search_blob) for f in files]
+        tours = suggest.load_tours()
+
+    prefixes = [q[:n] for q in args.queries for n in range(1, len(q) + 1)]
+    results = {"suggest": [], "matches": [], "scan": []}
+    for prefix in prefixes:
+        results["suggest"].append(timed_us(lambda: index.suggest(prefix)))
+        results["matches"].append(timed_us(lambda: index.matches(prefix)))
+        results["scan"].append(timed_us(lambda: scan(prefix, blobs, tours)))
+
+    print(f"{len(files)} brochures, {len(tours)} tours, {len(index._view.keys)} keys, {len(index._view.terms)} terms")
+    print(f"build {build_s:.2f} s cold, no-op refresh {noop_us / 1000:.2f} ms\n")
+    print(f"{len(prefixes)} prefixes typed")
+    print(f"{'lookup':>8} {'mean us':>8} {'p95 us':>8} {'max us':>8}")
+    for name, us in results.items():
+        p95 = sorted(us)[min(len(us) - 1, int(len(us) * 0.95))]
+        print(f"{name:>8} {statistics.mean(us):>8.1f} {p95:>8.1f} {max(us):>8.1f}")
+    print()
+    for query in args.queries:
+        print(f"{query!r:>14} -> {', '.join(s.text for s in index.suggest(query, 4))}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,262 @@
+"""Sweep retrieval and chat settings for recall, prompt size and latency.
+
+Runs every question in ``benchmarks/data/golden_set.jsonl`` through the real
+``pipeline.build_prompt`` and ``pipeline.complete`` for each combination of
+``num_retrieved_chunks``, ``num_chat_messages``, chunking strategy and model,
+and prints, per model, the configurations on the Pareto front of recall@k
+(higher is better), prompt tokens and end-to-end latency (lower is better).
+Recall only sees retrieval, so fronts are kept per model; how well each
+model answers shows in the ``answer`` column when completions are recorded
+or replayed (the share of replies containing the golden answer).
+
+Search is a local BM25 index over the brochures chunked with each strategy
+(see ``benchmarks/chunking_bench.py``). Each question is asked after the
+golden questions before it, so ``num_chat_messages`` controls how much
+history is rewritten into the query and quoted in the prompt. Completions
+come from one of three sources:
+
+* by default, a latency model per model (``--profile``) with the rewrite
+  echoing the question, so history costs tokens and time but never changes
+  what is retrieved;
+* ``--replay FILE`` reuses completions and their latencies recorded earlier,
+  falling back to the latency model for prompts it has not seen;
+* ``--record FILE`` calls Cortex ``Complete`` (``--secrets``) and appends
+  every reply and its latency to FILE for later replays.
+
+Run from the repository root::
+
+    python -m benchmarks.sweep
+    python -m benchmarks.sweep --chunks 4,8,12 --strategies layout --models mistral-large2,llama3.1-8b
+    python -m benchmarks.sweep --replay benchmarks/data/recorded_completions.jsonl --csv sweep.csv
+"""
+
+import argparse
+import csv
+import hashlib
+import json
+import re
+import time
+from dataclasses import dataclass
+
+import chunker
+import dedupe
+import pipeline
+import routing
+import tracing
+from benchmarks.chunking_bench import BM25, GOLDEN_FILE, PDF_DIR, chunk_corpus, load_golden
+
+SEARCH_MS = 150
+REWRITE_TOKENS = 40
+ANSWER_TOKENS = 150
+
+
+@dataclass
+class ModelProfile:
+    """Completion latency: a fixed cost, prompt prefill and per-token generation."""
+
+    base_ms: float
+    prefill_ms_per_ktok: float
+    decode_ms_per_token: float
+
+    @classmethod
+    def parse(cls, spec):
+        """Build from ``"base:prefill:decode"``, e.g. ``"600:300:30"``."""
+        return cls(*(float(v) for v in spec.split(":")))
+
+    def latency(self, prompt_tokens, output_tokens):
+        return self.base_ms + self.prefill_ms_per_ktok * prompt_tokens / 1000 + self.decode_ms_per_token * output_tokens
+
+
+# Assumed profiles; override with --profile MODEL=base:prefill:decode or measure with --record.
+MODEL_PROFILES = {
+    "mistral-large2": ModelProfile(600, 300, 30),
+    "llama3.1-70b": ModelProfile(500, 200, 20),
+    "llama3.1-8b": ModelProfile(250, 60, 8),
+}
+
+
+def prompt_key(model, prompt):
+    return f"{model}:{hashlib.sha1(prompt.encode('utf-8')).hexdigest()}"
+
+
+class SweepBackend:
+    """Pipeline backend with BM25 search and modelled, replayed or recorded completions.
+
+    ``elapsed_ms`` accumulates the latency of every call so the caller can
+    read the end-to-end time of one question without sleeping.
+    """
+
+    def __init__(self, index, max_k, profiles, replay=None, remote=None, record_path=None):
+        self.index = index
+        self.max_k = max_k
+        self.profiles = profiles
+        self.replay = replay or {}
+        self.remote = remote
+        self.record_path = record_path
+        self._searches = {}
+        self.elapsed_ms = 0.0
+        self.replayed = self.modelled = 0
+        self.last_modelled = False
+
+    def search(self, service, query, columns, filter, limit):
+        # BM25 is deterministic, so the top ``limit`` is a prefix of the top ``max_k``.
+        if query not in self._searches:
+            self._searches[query] = [
+                {"relative_path": file, "file_url": f"file://{file}", "chunk": f"{file}: {c.text}"}
+                for file, c, _ in self.index.search(query, self.max_k)]
+        self.elapsed_ms += SEARCH_MS
+        return self._searches[query][:limit]
+
+    def complete(self, model, prompt):
+        key = prompt_key(model, prompt)
+        self.last_modelled = False
+        if key in self.replay:
+            record = self.replay[key]
+            self.replayed += 1
+            self.elapsed_ms += record["ms"]
+            return record["reply"]
+        if self.remote is not None:
+            start = time.perf_counter()
+            reply = self.remote.complete(model, prompt)
+            ms = (time.perf_counter() - start) * 1000
+            self.replay[key] = {"reply": reply, "ms": ms}
+            with open(self.record_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps({"key": key, "reply": reply, "ms": round(ms, 1)}) + "\n")
+            self.elapsed_ms += ms
+            return reply
+        self.modelled += 1
+        self.last_modelled = True
+        question = re.search(r"<question>(.*?)</question>", prompt, re.S)
+        question = question.group(1).strip() if question else ""
+        rewrite = "Extend the user question" in prompt
+        self.elapsed_ms += self.profiles[model].latency(
+            tracing.estimate_tokens(prompt), REWRITE_TOKENS if rewrite else ANSWER_TOKENS)
+        return question if rewrite else f"Answer to: {question}"
+
+
+def load_replay(path):
+    with open(path, encoding="utf-8") as f:
+        return {r["key"]: r for r in map(json.loads, filter(str.strip, f))}
+
+
+def conversation(golden, i):
+    """Chat messages leading up to golden question ``i``: the earlier questions, then this one."""
+    messages = []
+    for item in golden[:i]:
+        messages += [{"role": "user", "content": item["question"]},
+                     {"role": "assistant", "content": f"Answer to: {item['question']}"}]
+    return messages + [{"role": "user", "content": golden[i]["question"]}]
+
+
+def run_config(backend, golden, model, chunks, history):
+    settings = pipeline.ChatSettings(model_name=model, service="sweep", num_retrieved_chunks=chunks,
+                                     num_chat_messages=history, rewrite_model=model)
+    hits, tokens, latency, credits = 0, [], [], 0.0
+    answered = real_replies = 0
+    for i, item in enumerate(golden):
+        messages = conversation(golden, i)
+        backend.elapsed_ms = 0.0
+        with tracing.trace("sweep", export=False):
+            prompt, _, results = pipeline.build_prompt(backend, settings, item["question"], messages)
+            reply = pipeline.complete(backend, model, prompt)
+        answer = item["answer"].lower()
+        hits += any(r["relative_path"] == item["file"] and answer in r["chunk"].lower() for r in results)
+        if not backend.last_modelled:
+            real_replies += 1
+            answered += answer in reply.lower()
+        tokens.append(tracing.estimate_tokens(prompt))
+        latency.append(backend.elapsed_ms)
+        credits += routing.estimate_credits(model, prompt, reply)
+    n = len(golden)
+    latency.sort()
+    return {
+        "recall": round(hits / n, 3),
+        "answer": round(answered / real_replies, 3) if real_replies else None,
+        "prompt_tokens": round(sum(tokens) / n),
+        "p50_ms": round(latency[n // 2]),
+        "p95_ms": round(latency[min(n - 1, int(n * 0.95))]),
+        "credits_per_1k": round(credits / n * 1000, 3),
+    }
+
+
+def pareto(rows):
+    """Mark rows no row for the same model beats on recall, prompt tokens and p50 latency at once."""
+    def dominates(a, b):
+        no_worse = a["recall"] >= b["recall"] and a["prompt_tokens"] <= b["prompt_tokens"] and a["p50_ms"] <= b["p50_ms"]
+        better = a["recall"] > b["recall"] or a["prompt_tokens"] < b["prompt_tokens"] or a["p50_ms"] < b["p50_ms"]
+        return no_worse and better
+
+    for row in rows:
+        row["pareto"] = not any(dominates(other, row) for other in rows if other["model"] == row["model"])
+    return rows
+
+
+def _ints(spec):
+    return [int(v) for v in spec.split(",")]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--golden", default=GOLDEN_FILE)
+    parser.add_argument("--pdf-dir", default=PDF_DIR)
+    parser.add_argument("--chunks", default="3,5,8,12,18", help="num_retrieved_chunks values")
+    parser.add_argument("--history", default="1,5,10", help="num_chat_messages values (1 means no history)")
+    parser.add_argument("--strategies", default=",".join(chunker.STRATEGIES))
+    parser.add_argument("--models", default=",".join(MODEL_PROFILES))
+    parser.add_argument("--profile", action="append", default=[], metavar="MODEL=BASE:PREFILL:DECODE",
+                        help="latency model for a model (ms, ms per 1k prompt tokens, ms per output token)")
+    parser.add_argument("--replay", help="JSONL of recorded completions to reuse")
+    parser.add_argument("--record", help="call Cortex and append completions to this JSONL")
+    parser.add_argument("--secrets", default=".streamlit/secrets.toml", help="Snowflake secrets for --record")
+    parser.add_argument("--all", action="store_true", help="print every configuration, not only the Pareto front")
+    parser.add_argument("--csv", help="also write every configuration to this CSV file")
+    args = parser.parse_args(argv)
+
+    profiles = dict(MODEL_PROFILES)
+    for spec in args.profile:
+        model, _, values = spec.partition("=")
+        profiles[model] = ModelProfile.parse(values)
+    golden = load_golden(args.golden)
+    chunk_values, history_values = _ints(args.chunks), _ints(args.history)
+    models = args.models.split(",")
+    replay = load_replay(args.replay) if args.replay else {}
+    remote = None
+    if args.record:
+        from batch_qa import cortex_backend
+        remote = cortex_backend(args.secrets)
+
+    corpus = dedupe.read_corpus(args.pdf_dir)
+    rows = []
+    for strategy in args.strategies.split(","):
+        docs, _ = chunk_corpus(corpus, strategy, chunker.DEFAULT_MAX_TOKENS, chunker.DEFAULT_OVERLAP)
+        backend = SweepBackend(BM25(docs), max(chunk_values), profiles, replay, remote, args.record)
+        for model in models:
+            for history in history_values:
+                for chunks in chunk_values:
+                    row = {"strategy": strategy, "model": model, "chunks": chunks, "history": history}
+                    row.update(run_config(backend, golden, model, chunks, history))
+                    rows.append(row)
+        if replay:
+            print(f"{strategy}: {backend.replayed} completions replayed, {backend.modelled} modelled")
+    pareto(rows)
+
+    columns = ["strategy", "model", "chunks", "history", "recall", "answer", "prompt_tokens", "p50_ms", "p95_ms",
+               "credits_per_1k", "pareto"]
+    if args.csv:
+        with open(args.csv, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=columns)
+            writer.writeheader()
+            writer.writerows(rows)
+    shown = rows if args.all else [r for r in rows if r["pareto"]]
+    print(f"{len(golden)} questions, {len(rows)} configurations, {sum(r['pareto'] for r in rows)} on the per-model Pareto fronts\n")
+    print(f"{'strategy':>8} {'model':>15} {'chunks':>6} {'history':>7} {'recall':>6} {'answer':>6} "
+          f"{'prompt tok':>10} {'p50 ms':>7} {'p95 ms':>7} {'cr/1k q':>7} {'pareto':>6}")
+    for r in sorted(shown, key=lambda r: (r["model"], r["p50_ms"], -r["recall"])):
+        answer = "-" if r["answer"] is None else f"{r['answer']:.3f}"
+        print(f"{r['strategy']:>8} {r['model']:>15} {r['chunks']:>6} {r['history']:>7} {r['recall']:>6.3f} "
+              f"{answer:>6} {r['prompt_tokens']:>10} {r['p50_ms']:>7} {r['p95_ms']:>7} {r['credits_per_1k']:>7.3f} "
+              f"{'*' if r['pareto'] else '':>6}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""Brochure metadata for the PDF Viewer: title, code, duration, route, type and regions.
+
+Every APT brochure opens with the same header::
+
+    East Africa Safari | Page 1
+    SMALL GROUP TOUR
+    EAST AFRICA SAFARI
+    2025 - 2026
+    AFE12
+    12 days / 11 nights Small Group Tour
+    Nairobi to Nairobi
+    ITINERARY
+
+``extract`` reads the whole document with PyMuPDF, lowercases it once and
+makes a single ``finditer`` pass of one combined pattern that picks up the
+header fields and every destination keyword. Regions are the ones whose
+keywords dominate the text, so an Alaska cruise that mentions Vancouver is
+tagged North America, not Europe because of a "European-style" dinner.
+"""
+
+import re
+from collections import Counter
+from dataclasses import dataclass, field
+
+import fitz
+
+from chunker import JUNK_CHARS_RE
+
+PREVIEW_CHARS = 1000
+# A region is tagged when it has at least this share of the top region's keyword hits.
+REGION_SHARE = 0.25
+
+TOUR_TYPES = {
+    "land tour": "Land Tour",
+    "river cruise": "River Cruise",
+    "ocean cruise": "Ocean Cruise",
+    "small ship cruise": "Small Ship Cruise",
+    "yacht cruise": "Yacht Cruise",
+    "small group tour": "Small Group Tour",
+    "rail tour": "Rail Tour",
+    "4wd tour": "4WD Tour",
+    "wilderness lodge": "Wilderness Lodge",
+    "extensions": "Extensions",
+}
+
+REGION_KEYWORDS = {
+    "Africa": """africa, african, kenya, nairobi, tanzania, serengeti, ngorongoro, masai mara, botswana,
+        okavango, chobe, zimbabwe, victoria falls, zambia, cape town, kruger, namibia, rwanda, uganda""",
+    "Europe": """europe, danube, rhine, moselle, seine, rhône, rhone, douro, amsterdam, budapest, vienna,
+        prague, paris, lisbon, porto, rome, venice, florence, italy, france, germany, spain, portugal,
+        croatia, dubrovnik, slovenia, greece, greek, dalmatian, scandinavia, norway, sweden, denmark,
+        iceland, faroe, scotland, ireland, dublin, britain, london, switzerland, zurich, balkans,
+        bucharest, transylvania, türkiye, turkiye, istanbul, mediterranean, finland, helsinki, lapland,
+        rovaniemi""",
+    "Asia": """asia, japan, tokyo, kyoto, osaka, hiroshima, korea, seoul, busan, vietnam, cambodia, mekong,
+        siem reap, angkor, hanoi, ho chi minh city, saigon, bangkok, thailand, singapore, kuala lumpur,
+        malaysia, sri lanka, colombo, koh rong, india, delhi, agra, jaipur, kolkata, varanasi, ganges""",
+    "Australia": """australia, kimberley, broome, darwin, bungle bungle, purnululu, kakadu, uluru,
+        alice springs, tasmania, hobart, launceston, queensland, cairns, great barrier reef, perth,
+        adelaide, kangaroo island, margaret river, outback, northern territory, top end,
+        gibb river road, el questro, mitchell falls, melbourne, sydney, brisbane, murray river, echuca""",
+    "New Zealand": """new zealand, auckland, queenstown, milford sound, rotorua, christchurch, wellington,
+        bay of islands, fiordland""",
+    "South America": """south america, peru, lima, cusco, machu picchu, amazon, galápagos, galapagos, chile,
+        atacama, santiago, argentina, buenos aires, iguazú, iguazu, brazil, rio de janeiro, patagonia""",
+    "North America": """canada, rockies, banff, jasper, lake louise, vancouver, calgary, whistler, alaska,
+        juneau, anchorage, toronto, montreal, québec, quebec, niagara, new england, usa, churchill,
+        hudson bay, whitehorse, yukon, winnipeg""",
+}
+KEYWORD_REGION = {
+    " ".join(kw.split()): region
+    for region, keywords in REGION_KEYWORDS.items() for kw in keywords.split(",")
+}
+
+# One pattern for the whole document; each alternative is a named group so a
+# single finditer pass sorts every hit by kind. Keywords are longest-first so
+# "south america" is counted once rather than also matching a shorter place.
+SCAN_RE = re.compile(
+    r"^(?P<title>[^\n|]+?)\s*\|\s*page 1$"
+    r"|^(?P<years>20\d\d(?:\s*-\s*20\d\d)?)\n(?P<code>[a-z]{2,}[a-z0-9]*)$"
+    r"|^(?P<days>\d+) days? / (?P<nights>\d+) nights?[ \t]*(?P<type>[^\n]*)"
+    r"(?:\n\s*\n?(?P<route>[^\n]{2,80})(?=\nitinerary$))?$"
+    r"|\b(?P<keyword>" + "|".join(re.escape(k) for k in sorted(KEYWORD_REGION, key=len, reverse=True)) + r")\b",
+    re.M,
+)
+
+
+@dataclass
+class BrochureInfo:
+    title: str = ""
+    code: str = ""
+    years: str = ""
+    days: int = 0
+    nights: int = 0
+    tour_type: str = ""
+    route: str = ""
+    regions: list = field(default_factory=list)
+    places: list = field(default_factory=list)  # destination keywords, most mentioned first
+    text_preview: str = ""
+
+    @property
+    def duration(self):
+        return f"{self.days} days / {self.nights} nights" if self.days else ""
+
+    @property
+    def tags(self):
+        return [t for t in [self.tour_type, *self.regions] if t] or ["General"]
+
+    @property
+    def search_blob(self):
+        return " ".join([self.title, self.code, self.route, self.tour_type, *self.regions, *self.places]).lower()
+
+
+def read_text(path):
+    """Text of every page, without the ligature, whitespace and clipping work PyMuPDF does by default.
+
+    Characters without a Unicode mapping come out as ``\\x00``, which ``JUNK_CHARS_RE`` drops.
+    """
+    with fitz.open(path) as doc:
+        return "\n".join(page.get_text("text", flags=fitz.TEXT_CID_FOR_UNKNOWN_UNICODE) for page in doc)
+
+
+def parse(text):
+    """``BrochureInfo`` from a brochure's full text."""
+    text = JUNK_CHARS_RE.sub("", text)
+    lower = text.lower()
+    # Lowercasing keeps offsets for everything but a few exotic characters; only then slice the original.
+    original = text if len(lower) == len(text) else None
+    info = BrochureInfo(text_preview=re.sub(r"[^\x00-\x7F]+", " ", text[:PREVIEW_CHARS]))
+    places = Counter()
+    for m in SCAN_RE.finditer(lower):
+        kind = m.lastgroup
+        if kind == "keyword":
+            places[m.group("keyword")] += 1
+        elif kind == "title" and not info.title:
+            info.title = original[m.start("title"):m.end("title")] if original else m.group("title").title()
+        elif kind == "code" and not info.code:
+            info.years, info.code = m.group("years"), m.group("code").upper()
+        elif kind in ("type", "route") and not info.days:
+            info.days, info.nights = int(m.group("days")), int(m.group("nights"))
+            tour_type = m.group("type").strip()
+            info.tour_type = TOUR_TYPES.get(tour_type, tour_type.title())
+            if m.group("route"):
+                info.route = original[m.start("route"):m.end("route")].strip() if original else m.group("route").title()
+    region_hits = Counter()
+    for place, n in places.items():
+        region_hits[KEYWORD_REGION[place]] += n
+    if region_hits:
+        top = region_hits.most_common(1)[0][1]
+        info.regions = [r for r, n in region_hits.most_common() if n >= REGION_SHARE * top]
+    info.places = [p for p, _ in places.most_common()]
+    return info
+
+
+def extract(path):
+    return parse(read_text(path))
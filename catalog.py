@@ -0,0 +1,307 @@
+"""One catalog of trips: trip code -> tour record, brochures, ships and region.
+
+Three datasets describe the same trips:
+
+* ``scraper/tour_info.json`` – tour records keyed by ``trip_code``;
+* ``pdfs/`` – brochures whose file names start with the trip code;
+* ``Fleet_snapshots/`` – one snapshot per ship (``coral-discoverer.json.gz``)
+  from ``scraper/fleet-data.py``, or the older ``Fleet_pdfs/`` renders where
+  no snapshots were taken, linked to the brochures and tour records that name
+  the ship.
+
+``TripCatalog`` links them into ``Trip`` entries held in dicts, so a trip
+code, a brochure file or a region resolves with one lookup, and keeps them
+in ``trip_catalog.json``. ``refresh`` re-reads only brochures whose mtime
+changed, the tour records when their file changes, and every brochure when
+the fleet does (a new ship can be named in any of them). Lookups start a
+background refresh at most every ``REFRESH_INTERVAL_S`` and answer from
+the current dicts meanwhile.
+
+Most trips come from the brochures alone: ``tour_info.json`` currently
+holds a single scraped tour, so only that trip has a tour record until the
+scraper writes a list.
+
+    python catalog.py             # refresh trip_catalog.json and print a summary
+    python catalog.py EUCCDR14    # one trip
+"""
+
+import argparse
+import json
+import os
+import re
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+
+import brochure_info
+import ingest
+import shared_cache
+import tour_facts
+
+CATALOG_FILE = "trip_catalog.json"
+PDF_DIR = "pdfs"
+FLEET_DIR = "Fleet_snapshots"
+FLEET_PDF_DIR = "Fleet_pdfs"
+VERSION = 1
+REFRESH_INTERVAL_S = 30
+UPPER_WORDS = {"apt", "mc", "mv", "ms", "ii", "iii", "iv"}
+
+
+@dataclass
+class Trip:
+    code: str
+    name: str = ""
+    region: str = ""
+    country: str = ""
+    brochures: list = field(default_factory=list)  # files in pdfs/, latest season last
+    ships: list = field(default_factory=list)  # ship ids, the file stems in Fleet_snapshots/
+    tour: dict = None  # record from tour_info.json
+
+    @property
+    def brochure(self):
+        return self.brochures[-1] if self.brochures else None
+
+
+def _normalize(text):
+    return " ".join(re.sub(r"[^a-z0-9]+", " ", text.lower()).split())
+
+
+def ship_name(ship):
+    """Display name of a ship file stem: ``apt-solara-and-apt-ostara`` -> "APT Solara and APT Ostara"."""
+    return " ".join(w.upper() if w in UPPER_WORDS else w if w == "and" else w.title() for w in ship.split("-"))
+
+
+def fleet_ships(fleet_dir=FLEET_DIR, pdf_dir=FLEET_PDF_DIR):
+    """Ship ids from the fleet snapshots, or from the PDF renders when there are none."""
+    for directory, suffix in ((fleet_dir, ".json.gz"), (pdf_dir, ".pdf")):
+        if os.path.isdir(directory):
+            ships = sorted(f[:-len(suffix)] for f in os.listdir(directory) if f.lower().endswith(suffix))
+            if ships:
+                return ships
+    return []
+
+
+def ship_patterns(ships):
+    """Normalized name -> ship; a stem naming two sister ships gives a name for each."""
+    return {_normalize(part.replace("-", " ")): ship for ship in ships for part in ship.split("-and-")}
+
+
+def ships_named(text, patterns):
+    text = f" {_normalize(text)} "
+    return sorted({ship for name, ship in patterns.items() if f" {name} " in text})
+
+
+def _season(file):
+    return max(re.findall(r"\b(\d{4})\b", file), default="")
+
+
+class TripCatalog:
+    def __init__(self, path=CATALOG_FILE, pdf_dir=PDF_DIR, fleet_dir=FLEET_DIR, tour_info=tour_facts.TOUR_INFO_FILE,
+                 fleet_pdf_dir=FLEET_PDF_DIR):
+        self.path = path
+        self.pdf_dir = pdf_dir
+        self.fleet_dir = fleet_dir
+        self.fleet_pdf_dir = fleet_pdf_dir
+        self.tour_info = tour_info
+        self._lock = threading.Lock()  # held for a whole refresh
+        self._lock_state = threading.Lock()  # guards _refreshing only
+        self._loaded = False
+        self._checked = 0.0
+        self._refreshing = False
+        # What trip_catalog.json stores besides the trips: enough to tell what changed.
+        self._state = {"version": VERSION, "fleet": [], "tour_info_mtime": None, "brochures": {}, "tours": {}}
+        self.trips = {}  # code -> Trip
+        self._by_brochure = {}  # file -> Trip
+        self._by_region = {}  # region -> [Trip]
+
+    def _load(self):
+        if self._loaded:
+            return
+        self._loaded = True
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("version") != VERSION:
+            return
+        trips = data.pop("trips")
+        self._state = data
+        self._index({code: Trip(**t) for code, t in trips.items()})
+
+    def _index(self, trips):
+        self.trips = trips
+        self._by_brochure = {file: t for t in trips.values() for file in t.brochures}
+        self._by_region = {}
+        for t in trips.values():
+            self._by_region.setdefault(t.region, []).append(t)
+
+    def save(self):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({**self._state, "trips": {code: asdict(t) for code, t in self.trips.items()}}, f)
+        os.replace(tmp_path, self.path)
+
+    def refresh(self):
+        """Re-read changed sources and relink; returns True if the catalog changed."""
+        with self._lock:
+            self._load()
+            self._checked = time.monotonic()
+            fleet = fleet_ships(self.fleet_dir, self.fleet_pdf_dir)
+            if fleet != self._state["fleet"]:
+                self._state["fleet"] = fleet
+                self._state["brochures"] = {}
+                self._state["tour_info_mtime"] = None
+            changed = self._refresh_brochures(fleet) | self._refresh_tours(ship_patterns(fleet))
+            if changed:
+                self._index(self._link())
+                self.save()
+            return changed
+
+    def _refresh_brochures(self, fleet):
+        patterns = ship_patterns(fleet)
+        brochures = self._state["brochures"]
+        files = {f: os.path.getmtime(os.path.join(self.pdf_dir, f))
+                 for f in (os.listdir(self.pdf_dir) if os.path.isdir(self.pdf_dir) else [])
+                 if tour_facts.BROCHURE_RE.match(f)}
+        changed = False
+        for file in [f for f in brochures if f not in files]:
+            del brochures[file]
+            changed = True
+        for file, mtime in files.items():
+            if brochures.get(file, {}).get("mtime") == mtime:
+                continue
+            path = os.path.join(self.pdf_dir, file)
+            text = []  # read at most once, and only if a cache below misses
+
+            def full_text():
+                if not text:
+                    text.append(brochure_info.read_text(path))
+                return text[0]
+
+            try:
+                # Same key as the PDF Viewer and suggest, so the text is parsed once per brochure version.
+                info = shared_cache.CACHE.get_or_set("brochure_info", (file, mtime),
+                                                     lambda: brochure_info.parse(full_text()))
+                ships = shared_cache.CACHE.get_or_set("brochure_ships", (file, mtime, tuple(fleet)),
+                                                      lambda: ships_named(full_text(), patterns))
+            except Exception:
+                continue
+            m = tour_facts.BROCHURE_RE.match(file)
+            brochures[file] = {"mtime": mtime, "code": m.group("code").upper(), "title": m.group("title"),
+                               "regions": info.regions, "ships": ships}
+            changed = True
+        return changed
+
+    def _refresh_tours(self, patterns):
+        mtime = os.path.getmtime(self.tour_info) if os.path.exists(self.tour_info) else None
+        if mtime == self._state["tour_info_mtime"]:
+            return False
+        tours = {}
+        for tour in tour_facts._load_tour_info(self.tour_info):
+            code = (tour.get("trip_code") or "").upper()
+            if code:
+                tours[code] = {"record": tour, "ships": ships_named(json.dumps(tour), patterns)}
+        self._state["tours"] = tours
+        self._state["tour_info_mtime"] = mtime
+        return True
+
+    def _link(self):
+        trips = {}
+        for file, b in sorted(self._state["brochures"].items(), key=lambda item: (_season(item[0]), item[0])):
+            trip = trips.setdefault(b["code"], Trip(b["code"]))
+            trip.brochures.append(file)
+            trip.name = b["title"]
+            trip.region = trip.region or (b["regions"][0] if b["regions"] else "")
+            trip.ships = sorted(set(trip.ships) | set(b["ships"]))
+        for code, t in self._state["tours"].items():
+            trip = trips.setdefault(code, Trip(code))
+            record = t["record"]
+            trip.tour = record
+            trip.name = record.get("trip_name") or trip.name
+            trip.region = record.get("region") or trip.region
+            trip.country = record.get("country") or ""
+            trip.ships = sorted(set(trip.ships) | set(t["ships"]))
+        return trips
+
+    def refresh_in_background(self):
+        """Start a ``refresh`` on a thread unless one is running; returns the thread, or None."""
+        with self._lock_state:
+            if self._refreshing:
+                return None
+            self._refreshing = True
+            self._checked = time.monotonic()
+
+        def run():
+            try:
+                self.refresh()
+            finally:
+                self._refreshing = False
+
+        thread = threading.Thread(target=run, daemon=True, name="trip-catalog")
+        thread.start()
+        return thread
+
+    def _maybe_refresh(self):
+        if not self._loaded and self._lock.acquire(blocking=False):
+            try:
+                self._load()  # the saved catalog, a quick JSON read
+            finally:
+                self._lock.release()
+        # Never on the caller's thread: a rerun must not wait on a rebuild, its own or another session's.
+        if time.monotonic() - self._checked > REFRESH_INTERVAL_S:
+            self.refresh_in_background()
+
+    def get(self, code):
+        """The ``Trip`` for ``code``, or None."""
+        self._maybe_refresh()
+        return self.trips.get(code.upper())
+
+    def by_brochure(self, file):
+        self._maybe_refresh()
+        return self._by_brochure.get(file)
+
+    def in_region(self, region):
+        self._maybe_refresh()
+        return self._by_region.get(region, [])
+
+    def codes_in(self, text):
+        """Known trip codes mentioned in ``text``, in order."""
+        self._maybe_refresh()
+        return list(dict.fromkeys(c for c in tour_facts.TRIP_CODE_RE.findall(text.upper()) if c in self.trips))
+
+
+CATALOG = TripCatalog()
+
+
+def file_filter(files):
+    """Cortex Search filter keeping chunks of the brochures ``files``, or None for no files."""
+    clauses = [{"@eq": {ingest.PATH_ATTRIBUTE: ingest.staged_file_name(f)}} for f in files]
+    if not clauses:
+        return None
+    return clauses[0] if len(clauses) == 1 else {"@or": clauses}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("code", nargs="?", help="print this trip")
+    parser.add_argument("--path", default=CATALOG_FILE)
+    args = parser.parse_args(argv)
+
+    catalog = TripCatalog(args.path)
+    start = time.perf_counter()
+    catalog.refresh()
+    elapsed = time.perf_counter() - start
+    if args.code:
+        trip = catalog.get(args.code)
+        print(json.dumps(asdict(trip), indent=2) if trip else f"No trip {args.code}")
+        return
+    trips = catalog.trips.values()
+    print(f"✅ {len(catalog.trips)} trips in {args.path} ({elapsed:.2f} s): "
+          f"{sum(bool(t.brochures) for t in trips)} with brochures, {sum(bool(t.tour) for t in trips)} with tour "
+          f"records, {sum(bool(t.ships) for t in trips)} with ships")
+    for region, region_trips in sorted(catalog._by_region.items()):
+        print(f"  {region or '(no region)':<15} {len(region_trips)}")
+
+
+if __name__ == "__main__":
+    main()
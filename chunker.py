@@ -0,0 +1,168 @@
+"""Local, layout-aware brochure chunking on PyMuPDF text output.
+
+``chunk_pdf`` supports three strategies:
+
+* ``"page"`` – one chunk per page (what uploads used to index);
+* ``"fixed"`` – token-sized windows over the whole text, ignoring layout;
+* ``"layout"`` – sections split on headings (larger-than-body type) and
+  "Day N" itinerary markers, then windowed to ``max_tokens`` with
+  ``overlap``; every window repeats its section heading so a chunk from the
+  middle of a long day still says which day it belongs to.
+
+Running headers ("Tour Name | Page 3"), the phone banner and icon-font
+glyphs are dropped before chunking.
+"""
+
+import re
+from collections import Counter
+from dataclasses import dataclass
+
+import fitz
+
+STRATEGIES = ("page", "fixed", "layout")
+DEFAULT_MAX_TOKENS = 256
+DEFAULT_OVERLAP = 32
+MIN_SECTION_TOKENS = 40
+HEADING_SIZE_RATIO = 1.15
+MAX_HEADING_CHARS = 90
+
+DAY_RE = re.compile(r"^day\s+\d+(\s*[-–&]\s*\d+)?\b", re.I)
+BOILERPLATE_RE = re.compile(r"\|\s*page\s+\d+\s*$|^\d{4} \d{3} \d{3}$", re.I)
+# Icon fonts map glyphs into the Private Use Area; PDFs also leak control characters.
+JUNK_CHARS_RE = re.compile("[\ue000-\uf8ff\x00-\x08\x0b-\x1f]")
+
+
+@dataclass
+class Chunk:
+    text: str
+    page: int  # 1-based page the chunk starts on
+    page_end: int
+    section: str = ""
+
+    @property
+    def tokens(self):
+        return estimate_tokens(self.text)
+
+
+def estimate_tokens(text):
+    """Approximate model tokens from word count (~4 tokens per 3 words)."""
+    return len(text.split()) * 4 // 3
+
+
+def _windows(words, max_tokens, overlap):
+    size = max(1, max_tokens * 3 // 4)
+    step = max(1, size - overlap * 3 // 4)
+    for start in range(0, max(len(words) - overlap * 3 // 4, 1), step):
+        yield start, words[start:start + size]
+
+
+def page_lines(page):
+    """``(text, size, block)`` for each non-boilerplate line on a page."""
+    lines = []
+    for block_no, block in enumerate(page.get_text("dict", flags=fitz.TEXTFLAGS_TEXT)["blocks"]):
+        for line in block.get("lines", []):
+            spans = [s for s in line["spans"] if JUNK_CHARS_RE.sub("", s["text"]).strip()]
+            if not spans:
+                continue
+            text = JUNK_CHARS_RE.sub("", " ".join(s["text"].strip() for s in spans)).strip()
+            if text and not BOILERPLATE_RE.search(text):
+                lines.append((text, max(s["size"] for s in spans), block_no))
+    return lines
+
+
+def _body_size(pages):
+    sizes = Counter()
+    for lines in pages:
+        for text, size, _ in lines:
+            sizes[round(size, 1)] += len(text)
+    return sizes.most_common(1)[0][0] if sizes else 10.0
+
+
+def layout_sections(pages):
+    """Split ``page_lines`` output into ``[heading, body lines, first page, last page]`` sections."""
+    body_size = _body_size(pages)
+    sections = []
+    current = None
+    for page_no, lines in enumerate(pages, 1):
+        for text, size, _ in lines:
+            is_day = bool(DAY_RE.match(text))
+            is_heading = is_day or (size >= body_size * HEADING_SIZE_RATIO and len(text) <= MAX_HEADING_CHARS)
+            if is_heading and current is not None and not current[1] and not is_day:
+                # Consecutive heading lines ("DAY 1" then "Arrive Dubrovnik") form one heading.
+                current[0] = f"{current[0]} – {text}"
+                continue
+            if is_heading or current is None:
+                current = [text if is_heading else "", [], page_no, page_no]
+                sections.append(current)
+                if is_heading:
+                    continue
+            current[1].append(text)
+            current[3] = page_no
+    return sections
+
+
+def layout_chunks(pages, max_tokens=DEFAULT_MAX_TOKENS, overlap=DEFAULT_OVERLAP, strip=None):
+    chunks = []
+    pending = []  # short non-day sections waiting to be merged into the next one
+    for heading, body, first, last in layout_sections(pages):
+        body = [strip(" ".join(body), first)] if strip else body
+        text = " ".join(([heading] if heading else []) + body).strip()
+        if not text:
+            continue
+        if estimate_tokens(text) < MIN_SECTION_TOKENS and not DAY_RE.match(heading):
+            pending.append((text, first))
+            continue
+        if pending:
+            text = " ".join([t for t, _ in pending] + [text])
+            first = pending[0][1]
+            pending = []
+        words = text.split()
+        prefix = [heading] if heading else []
+        for i, window in _windows(words, max_tokens, overlap):
+            body_words = window if i == 0 or not prefix else prefix + window
+            chunks.append(Chunk(" ".join(body_words), first, last, heading))
+    if pending:
+        chunks.append(Chunk(" ".join(t for t, _ in pending), pending[0][1], len(pages), ""))
+    return chunks
+
+
+def page_chunks(pages, strip=None):
+    chunks = []
+    for n, lines in enumerate(pages, 1):
+        text = " ".join(t for t, *_ in lines)
+        text = strip(text, n) if strip else text
+        if text.strip():
+            chunks.append(Chunk(text, n, n))
+    return chunks
+
+
+def fixed_chunks(pages, max_tokens=DEFAULT_MAX_TOKENS, overlap=DEFAULT_OVERLAP, strip=None):
+    words, word_pages = [], []
+    for n, lines in enumerate(pages, 1):
+        text = " ".join(t for t, *_ in lines)
+        for w in (strip(text, n) if strip else text).split():
+            words.append(w)
+            word_pages.append(n)
+    return [Chunk(" ".join(window), word_pages[i], word_pages[i + len(window) - 1])
+            for i, window in _windows(words, max_tokens, overlap) if window]
+
+
+def chunk_pages(pages, strategy="layout", max_tokens=DEFAULT_MAX_TOKENS, overlap=DEFAULT_OVERLAP, strip=None):
+    """Chunk ``read_pages`` output; ``strip(text, page)`` may remove text (e.g. shared boilerplate) first."""
+    if strategy == "page":
+        return page_chunks(pages, strip)
+    if strategy == "fixed":
+        return fixed_chunks(pages, max_tokens, overlap, strip)
+    if strategy == "layout":
+        return layout_chunks(pages, max_tokens, overlap, strip)
+    raise ValueError(f"Unknown chunking strategy: {strategy} (expected one of {STRATEGIES})")
+
+
+def read_pages(path):
+    """``page_lines`` for every page of the PDF at ``path``."""
+    with fitz.open(path) as doc:
+        return [page_lines(page) for page in doc]
+
+
+def chunk_pdf(path, strategy="layout", max_tokens=DEFAULT_MAX_TOKENS, overlap=DEFAULT_OVERLAP, strip=None):
+    return chunk_pages(read_pages(path), strategy, max_tokens, overlap, strip)
@@ -0,0 +1,82 @@
+"""Page-level citations: the brochure pages an answer was built from, rendered one page at a time.
+
+Locally chunked rows carry ``[file, page]`` pairs in their ``sources``
+column (``pipeline.source_pages``). ``page_image`` and ``page_text`` open the
+cited brochure with PyMuPDF and load only that page: opening a document
+reads its cross-reference table, not every page, so checking a citation
+costs the same for a 4-page flyer as for a 90-page catalogue. Rendered pages
+are kept in ``shared_cache`` for every worker process.
+
+Only rows chunked by this app have page numbers, and a page can be shown
+only while its brochure is in ``PDF_DIR`` on this host; anything else is
+cited by file name alone.
+"""
+
+import os
+
+import fitz
+
+import ingest
+import pipeline
+import shared_cache
+
+PDF_DIR = "pdfs"
+ZOOM = 1.5
+EXCERPT_CHARS = 600
+MAX_CITATIONS = 6
+
+_paths = {}  # (pdf_dir, dir mtime) -> staged file name -> local path
+
+
+def cited_pages(results, limit=MAX_CITATIONS):
+    """Distinct ``(file, page)`` pairs of ``results`` in retrieval order."""
+    pages = []
+    for r in results:
+        for ref in pipeline.source_pages(r):
+            if ref not in pages:
+                pages.append(ref)
+    return pages[:limit]
+
+
+def local_pdf(file, pdf_dir=PDF_DIR):
+    """Path in ``pdf_dir`` of the brochure staged as ``file``, or None if it is not on this host."""
+    if not os.path.isdir(pdf_dir):
+        return None
+    key = (pdf_dir, os.path.getmtime(pdf_dir))
+    if key not in _paths:
+        _paths.clear()
+        _paths[key] = {ingest.staged_file_name(f): os.path.join(pdf_dir, f) for f in os.listdir(pdf_dir)}
+    return _paths[key].get(ingest.staged_file_name(file))
+
+
+def _cache_key(path, page, *extra):
+    return (os.path.basename(path), os.path.getmtime(path), page, *extra)
+
+
+def _cached_page(namespace, key, read):
+    try:
+        return shared_cache.CACHE.get_or_set(namespace, key(), read)
+    except (OSError, RuntimeError, ValueError):
+        # The brochure was removed or replaced since it was indexed, is unreadable, or lost the page.
+        return None
+
+
+def page_image(path, page, zoom=ZOOM):
+    """PNG of 1-based ``page`` of ``path``, or None if that page cannot be read."""
+    def render():
+        with fitz.open(path) as doc:
+            return doc.load_page(page - 1).get_pixmap(matrix=fitz.Matrix(zoom, zoom)).tobytes("png")
+
+    return _cached_page("page_render", lambda: _cache_key(path, page, zoom), render)
+
+
+def page_text(path, page, limit=EXCERPT_CHARS):
+    """Text of 1-based ``page`` of ``path`` cut to ``limit`` characters, or None if that page cannot be read."""
+    def extract():
+        with fitz.open(path) as doc:
+            return " ".join(doc.load_page(page - 1).get_text().split())
+
+    text = _cached_page("page_text", lambda: _cache_key(path, page), extract)
+    if text is None or len(text) <= limit:
+        return text
+    return text[:limit].rsplit(" ", 1)[0] + " …"
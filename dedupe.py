@@ -0,0 +1,340 @@
+"""Near-duplicate boilerplate detection across the brochure corpus.
+
+Brochures repeat the same passages – the "Freedom of Choice" and
+"Signature Experience" legends, the interactive-itinerary note, terms and
+fleet descriptions – so the same text was indexed once per brochure and
+crowded the top-k results. ``find_shared`` groups near-identical sentences
+with MinHash signatures and LSH banding; a group found in at least
+``MIN_FILES`` brochures is shared boilerplate.
+
+At ingestion ``PassageIndex.stripper`` removes shared sentences from a
+brochure before it is chunked. Each run of consecutive shared sentences
+becomes one ``SharedRun``, indexed once with a source reference for every
+brochure page it was taken from.
+
+    python dedupe.py            # rebuild passage_index.json from pdfs/ and report the shrink
+"""
+
+import argparse
+import json
+import os
+import re
+import threading
+import zlib
+from collections import defaultdict
+from dataclasses import dataclass, field
+
+import numpy as np
+
+import chunker
+
+PDF_DIR = "pdfs"
+INDEX_FILE = "passage_index.json"
+SHINGLE_WORDS = 3
+NUM_PERM = 128
+BANDS = 32  # 4 rows per band: pairs above ~0.45 Jaccard become candidates
+SIMILARITY = 0.8  # estimated Jaccard needed to merge two sentences
+MIN_SENTENCE_WORDS = 8
+# Day-by-day text is reused across variants of a trip (up to ~24 brochures for the
+# Canadian Rockies); collapsing it loses which trip a chunk belongs to.
+MIN_FILES = 25
+_PRIME = (1 << 31) - 1
+
+SENTENCE_RE = re.compile(
+    r"(?<=[.!?])\s+(?=[A-Z\"“‘'])"
+    r"|(?<=[A-Z]{2})\s+(?=[A-Z][a-z])"  # "... ITINERARY To view the itinerary"
+    r"|\s+(?=(?:Freedom of Choice|Signature Experience|Daily|Stay|Note|Important):)")
+
+
+@dataclass
+class SharedSentence:
+    text: str
+    signature: list
+    files: int
+
+
+@dataclass
+class SharedRun:
+    """Consecutive shared sentences, indexed once for every page they were stripped from."""
+    text: str
+    sources: list = field(default_factory=list)  # [file, page] pairs
+    stored: bool = False  # already inserted into the docs table
+    chunk: str = None  # chunk column of the inserted row; later uploads update its sources by it
+
+    def add_source(self, file, page):
+        if [file, page] not in self.sources:
+            self.sources.append([file, page])
+
+
+class MinHasher:
+    def __init__(self, num_perm=NUM_PERM, seed=1):
+        rng = np.random.default_rng(seed)
+        self.a = rng.integers(1, _PRIME, num_perm, dtype=np.uint64)
+        self.b = rng.integers(0, _PRIME, num_perm, dtype=np.uint64)
+
+    def signature(self, text):
+        words = re.findall(r"\w+", text.lower())
+        shingles = {" ".join(words[i:i + SHINGLE_WORDS]) for i in range(max(len(words) - SHINGLE_WORDS + 1, 1))}
+        hashes = np.fromiter((zlib.crc32(s.encode()) for s in shingles), dtype=np.uint64, count=len(shingles))
+        return ((self.a[:, None] * hashes[None, :] + self.b[:, None]) % _PRIME).min(axis=1)
+
+
+def similarity(sig_a, sig_b):
+    """Estimated Jaccard similarity of the shingle sets behind two signatures."""
+    return float(np.mean(np.asarray(sig_a) == np.asarray(sig_b)))
+
+
+def _band_keys(signature, bands=BANDS):
+    signature = np.asarray(signature, dtype=np.uint64)
+    rows = len(signature) // bands
+    return [(b, signature[b * rows:(b + 1) * rows].tobytes()) for b in range(bands)]
+
+
+def sentences(text):
+    return [s.strip() for s in SENTENCE_RE.split(text) if s.strip()]
+
+
+def _candidate(sentence):
+    return len(sentence.split()) >= MIN_SENTENCE_WORDS
+
+
+def find_shared(corpus, hasher=None, min_files=MIN_FILES, threshold=SIMILARITY):
+    """Sentences repeated (nearly) verbatim in ``min_files`` brochures of ``corpus`` (``{file: pages}``)."""
+    hasher = hasher or MinHasher()
+    items = []
+    for file, pages in corpus.items():
+        for lines in pages:
+            items.extend((file, s) for s in sentences(" ".join(t for t, *_ in lines)) if _candidate(s))
+    signatures = [hasher.signature(s) for _, s in items]
+
+    parent = list(range(len(items)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    buckets = defaultdict(list)
+    for i, sig in enumerate(signatures):
+        for key in _band_keys(sig):
+            bucket = buckets[key]
+            for j in bucket:
+                if find(i) != find(j) and similarity(sig, signatures[j]) >= threshold:
+                    parent[find(i)] = find(j)
+            bucket.append(i)
+
+    groups = defaultdict(list)
+    for i in range(len(items)):
+        groups[find(i)].append(i)
+    shared = []
+    for members in groups.values():
+        files = len({items[i][0] for i in members})
+        if files >= min_files:
+            # The most common wording stands for the group.
+            texts = [items[i][1] for i in members]
+            rep = max(members, key=lambda i: (texts.count(items[i][1]), -i))
+            shared.append(SharedSentence(items[rep][1], signatures[rep].tolist(), files))
+    return sorted(shared, key=lambda s: -s.files)
+
+
+class PassageIndex:
+    """Persistent shared sentences and runs, used to strip boilerplate from new uploads.
+
+    ``path=None`` keeps the index in memory only.
+    """
+
+    def __init__(self, path=INDEX_FILE, hasher=None):
+        self.path = path
+        self.hasher = hasher or MinHasher()
+        self._lock = threading.RLock()
+        self._loaded = False
+        self.sentences = []
+        self.runs = {}
+        self._buckets = {}
+        # Run text -> chunk column of its row in the docs table, kept across rebuilds. The chunk is
+        # None for runs saved before it was recorded.
+        self._stored = {}
+
+    def _load(self):
+        with self._lock:
+            if self._loaded:
+                return
+            if self.path and os.path.exists(self.path):
+                with open(self.path, encoding="utf-8") as f:
+                    data = json.load(f)
+                self._set([SharedSentence(**s) for s in data["sentences"]],
+                          {k: SharedRun(**r) for k, r in data["runs"].items()})
+                stored = data.get("stored", {})
+                self._stored = dict.fromkeys(stored) if isinstance(stored, list) else stored
+            self._loaded = True
+
+    def _set(self, shared, runs):
+        self.sentences = shared
+        self.runs = runs
+        self._buckets = defaultdict(list)
+        for n, s in enumerate(shared):
+            for key in _band_keys(s.signature):
+                self._buckets[key].append(n)
+
+    def save(self):
+        if not self.path:
+            return
+        with self._lock:
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"sentences": [vars(s) for s in self.sentences],
+                           "runs": {k: vars(r) for k, r in self.runs.items()},
+                           "stored": self._stored}, f)
+            os.replace(tmp_path, self.path)
+
+    def rebuild(self, corpus, min_files=MIN_FILES):
+        """Re-detect shared sentences over the whole corpus; runs are collected again as brochures are stripped."""
+        # Load first: runs stored by earlier processes must stay marked, or the next ingest inserts them again.
+        self._load()
+        shared = find_shared(corpus, self.hasher, min_files)
+        with self._lock:
+            self._stored.update({r.text: r.chunk for r in self.runs.values() if r.stored})
+            self._set(shared, {})
+            self._loaded = True
+        self.save()
+        return shared
+
+    def claim(self, runs, chunk):
+        """Mark ``runs`` stored and return the ones not stored before, which the caller inserts.
+
+        Decided under the lock, so concurrent uploads sharing a run insert it
+        once. ``chunk(run)`` is the chunk column a claimed run is inserted
+        as; call ``release`` with the claimed runs if the insert fails.
+        """
+        claimed = []
+        with self._lock:
+            for run in runs:
+                if run.text in self._stored:
+                    run.stored, run.chunk = True, self._stored[run.text]
+                    continue
+                run.stored, run.chunk = True, chunk(run)
+                self._stored[run.text] = run.chunk
+                claimed.append(run)
+        self.save()
+        return claimed
+
+    def release(self, runs):
+        with self._lock:
+            for run in runs:
+                run.stored, run.chunk = False, None
+                self._stored.pop(run.text, None)
+        self.save()
+
+    def match(self, sentence):
+        """Id of the shared sentence ``sentence`` is a near-duplicate of, or None."""
+        self._load()
+        sig = self.hasher.signature(sentence)
+        candidates = {n for key in _band_keys(sig) for n in self._buckets.get(key, ())}
+        best = max(((similarity(sig, self.sentences[n].signature), n) for n in candidates), default=(0.0, None))
+        return best[1] if best[0] >= SIMILARITY else None
+
+    def stripper(self, file):
+        """A ``chunker`` ``strip`` callable for ``file``; its ``.runs`` lists the runs it removed."""
+        self._load()
+        return Stripper(self, file)
+
+    def add_run(self, ids, file, page):
+        key = ",".join(map(str, ids))
+        with self._lock:
+            run = self.runs.get(key)
+            if run is None:
+                text = " ".join(self.sentences[n].text for n in ids)
+                run = self.runs[key] = SharedRun(text, stored=text in self._stored, chunk=self._stored.get(text))
+            run.add_source(file, page)
+        return run
+
+
+class Stripper:
+    def __init__(self, index, file):
+        self.index = index
+        self.file = file
+        self.runs = []
+
+    def __call__(self, text, page):
+        if not self.index.sentences:
+            return text
+        kept, run = [], []
+        for s in sentences(text) + [None]:
+            n = self.index.match(s) if s is not None and _candidate(s) else None
+            if n is not None:
+                run.append(n)
+                continue
+            if run:
+                self.runs.append(self.index.add_run(run, self.file, page))
+                run = []
+            if s is not None:
+                kept.append(s)
+        return " ".join(kept)
+
+
+def shared_chunk(run):
+    """The chunk that stands for a shared run, placed on its first source."""
+    _, page = run.sources[0]
+    return chunker.Chunk(run.text, page, page, section="shared")
+
+
+def read_corpus(pdf_dir=PDF_DIR):
+    return {name: chunker.read_pages(os.path.join(pdf_dir, name))
+            for name in sorted(os.listdir(pdf_dir)) if name.lower().endswith(".pdf")}
+
+
+def dedupe_corpus(corpus, index, strategy="layout", max_tokens=chunker.DEFAULT_MAX_TOKENS,
+                  overlap=chunker.DEFAULT_OVERLAP):
+    """``(docs, report)``; ``docs`` are ``(file, chunk, sources)`` with shared runs collapsed."""
+    before = [c for pages in corpus.values() for c in chunker.chunk_pages(pages, strategy, max_tokens, overlap)]
+    docs, runs = [], {}
+    for file, pages in corpus.items():
+        strip = index.stripper(file)
+        docs.extend((file, c, [[file, c.page]])
+                    for c in chunker.chunk_pages(pages, strategy, max_tokens, overlap, strip))
+        runs.update((id(r), r) for r in strip.runs)
+    docs.extend((r.sources[0][0], shared_chunk(r), r.sources) for r in runs.values())
+    tokens_before = sum(c.tokens for c in before)
+    tokens_after = sum(c.tokens for _, c, _ in docs)
+    report = {
+        "brochures": len(corpus),
+        "shared_sentences": len(index.sentences),
+        "shared_runs": len(runs),
+        "chunks_before": len(before),
+        "chunks_after": len(docs),
+        "tokens_before": tokens_before,
+        "tokens_after": tokens_after,
+        "shrink_pct": round(100 * (1 - tokens_after / tokens_before), 1) if tokens_before else 0.0,
+    }
+    return docs, report
+
+
+INDEX = PassageIndex()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pdf-dir", default=PDF_DIR)
+    parser.add_argument("--index", default=INDEX_FILE)
+    parser.add_argument("--strategy", default="layout", choices=chunker.STRATEGIES)
+    parser.add_argument("--min-files", type=int, default=MIN_FILES,
+                        help="brochures a sentence must appear in to count as boilerplate")
+    parser.add_argument("--top", type=int, default=8, help="print the most widely shared sentences")
+    args = parser.parse_args(argv)
+
+    corpus = read_corpus(args.pdf_dir)
+    shared = PassageIndex(args.index).rebuild(corpus, args.min_files)
+    # Runs are recorded as brochures are uploaded, so measure the shrink on a scratch copy.
+    scratch = PassageIndex(path=None)
+    scratch._set(shared, {})
+    _, report = dedupe_corpus(corpus, scratch, args.strategy)
+    for s in shared[:args.top]:
+        print(f"{s.files:>4} brochures  {s.text[:90]}")
+    print()
+    for key, value in report.items():
+        print(f"{key:>16}: {value}")
+
+
+if __name__ == "__main__":
+    main()
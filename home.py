@@ -1,38 +1,52 @@
 import streamlit as st
 from snowflake.core import Root
-from snowflake.cortex import Complete
 from snowflake.snowpark.session import Session
 import snowflake.connector
+import dataclasses
 import json
 import os
-import shutil
-import tempfile
-import fitz
+import uuid
+import catalog
+import citations
+import ingest
+import ingest_jobs
+import pipeline
+import prewarm
+import profiling
+import resilience
+import routing
+import scheduler
+import shared_cache
+import singleflight
+import suggest
+import tour_facts
+import tracing
 
 APP_NAME = "SS Intelliguide – AI-Powered Travel Intelligence"
 st.set_page_config(APP_NAME, page_icon="🌏", layout="wide")
-MODELS = ["mistral-large2", "llama3.1-70b", "llama3.1-8b"]
+MODELS = [routing.AUTO_MODEL, "mistral-large2", "llama3.1-70b", "llama3.1-8b"]
 
 # Snowflake session config
-connection_parameters = {
-    "user": st.secrets["snowflake"]["user"],
-    "password": st.secrets["snowflake"]["password"],
-    "account": st.secrets["snowflake"]["account"],
-    "warehouse": st.secrets["snowflake"]["warehouse"],
-    "database": st.secrets["snowflake"]["database"],
-    "schema": st.secrets["snowflake"]["schema"],
-    "role": st.secrets["snowflake"].get("role", "ACCOUNTADMIN")
-}
+connection_parameters = pipeline.connection_parameters(st.secrets["snowflake"])
 
 session = Session.builder.configs(connection_parameters).create()
 root = Root(session)
-
-TOPICS = ["All Locations", "Europe", "Australia", "New-Zealand", "Asia", "Africa", "South-America", "Antartica", "North-America"]
+if os.environ.get("INTELLIGUIDE_METRICS_PORT"):
+    tracing.serve_metrics(int(os.environ["INTELLIGUIDE_METRICS_PORT"]))
+st.session_state.setdefault("session_id", uuid.uuid4().hex)
+backend = singleflight.SingleFlightBackend(shared_cache.CachedBackend(resilience.ResilientBackend(
+    scheduler.ScheduledBackend(pipeline.CortexBackend(session, root), st.session_state.session_id)
+)))
+prewarm_backend = singleflight.SingleFlightBackend(resilience.ResilientBackend(
+    scheduler.ScheduledBackend(pipeline.CortexBackend(session, root), "prewarm"), fallback_model=None
+))
+
+TOPICS = ["All Locations", "Europe", "Australia", "New-Zealand", "Asia", "Africa", "South-America", "Antarctica", "North-America"]
 SESSION_STATE_FILE = "session_state.json"
-STAGE_NAME = "@apt_pdf_db.public.apt"
+STAGE_NAME = ingest.STAGE_NAME
 
-def complete(model, prompt):
-    return Complete(model, prompt, session=session).replace("$", "\$")
+def complete(model, prompt, stage="complete"):
+    return pipeline.complete(backend, model, prompt, stage=stage)
 
 
 def save_session_state():
@@ -67,71 +81,127 @@ def init_service_metadata():
         metadata = []
         for s in services:
             svc_name = s["name"]
-            search_col = session.sql(f"DESC CORTEX SEARCH SERVICE {svc_name};").collect()[0]["search_column"]
-            metadata.append({"name": svc_name, "search_column": search_col})
+            desc = session.sql(f"DESC CORTEX SEARCH SERVICE {svc_name};").collect()[0].as_dict()
+            columns = [c.strip().lower() for c in (desc.get("columns") or "").split(",")]
+            attributes = [c.strip().lower() for c in (desc.get("attribute_columns") or "").split(",")]
+            metadata.append({"name": svc_name, "search_column": desc["search_column"],
+                             "page_sources": pipeline.SOURCES_COLUMN in columns,
+                             "file_filter": ingest.PATH_ATTRIBUTE in attributes})
         st.session_state.service_metadata = metadata
 
 
-def get_chat_history():
-    return st.session_state.messages[-st.session_state.num_chat_messages:-1]
+@st.cache_resource
+def build_catalog():
+    """Start building the trip catalog and the search suggestions when the process starts, not at first use."""
+    catalog.CATALOG.refresh_in_background()
+    suggest.INDEX.refresh_in_background()
+    return True
+
+
+def search_filter(service, question=""):
+    """Narrow retrieval to the brochures of trips named by code in ``question``, else of the selected topic."""
+    if not service.get("file_filter"):
+        return None  # services created before relative_path was an attribute cannot filter on it
+    # Lookups never wait on a refresh; until the first build lands they find no trips and nothing is filtered.
+    codes = catalog.CATALOG.codes_in(question)
+    if codes:
+        trips = [catalog.CATALOG.get(code) for code in codes]
+    elif st.session_state.get("selected_topic", TOPICS[0]) != TOPICS[0]:
+        trips = catalog.CATALOG.in_region(st.session_state.selected_topic.replace("-", " "))
+    else:
+        return None
+    return catalog.file_filter([file for trip in trips for file in trip.brochures])
 
 
-def summarize_chat(chat_history, question):
-    prompt = f"""
-    [INST]
-    Extend the user question using the chat history.
-    <chat_history>{chat_history}</chat_history>
-    <question>{question}</question>
-    [/INST]
-    """
-    return complete(st.session_state.model_name, prompt)
+def chat_settings(question=""):
+    service = next(
+        (s for s in st.session_state.service_metadata if s["name"] == st.session_state.selected_cortex_search_service),
+        {"search_column": pipeline.DEFAULT_SEARCH_COLUMN}  # fallback
+    )
+    return pipeline.ChatSettings(
+        model_name=st.session_state.model_name,
+        service=st.session_state.selected_cortex_search_service,
+        search_column=service["search_column"],
+        num_retrieved_chunks=st.session_state.num_retrieved_chunks,
+        num_chat_messages=st.session_state.num_chat_messages,
+        use_chat_history=st.session_state.use_chat_history,
+        adaptive_retrieval=st.session_state.get("adaptive_retrieval", False),
+        rewrite_model=routing.resolve(st.session_state.model_name, "rewrite"),
+        page_sources=service.get("page_sources", False),
+        search_filter=search_filter(service, question),
+    )
 
 
-def build_prompt(question):
-    chat_history = get_chat_history() if st.session_state.use_chat_history else []
-    chat_text = "\n".join([msg["content"] for msg in chat_history if msg["role"] == "user"])
-    summary = summarize_chat(chat_text, question) if chat_history else question
-    context = query_cortex(summary)
-    prompt = f"""
-    [INST]
-    You are SS IntelliGuide, a helpful AI assistant with access to APT PDF-based knowledge.
-    Use the provided <context> and <chat_history> to answer user questions.
-    Respond clearly, briefly, and helpfully.
-
-    <chat_history>{chat_text}</chat_history>
-    <context>{context}</context>
-    <question>{question}</question>
-    [/INST]
-    Answer:
-    """
-    return prompt
+def prewarm_settings():
+    return dataclasses.replace(chat_settings(), use_chat_history=False, search_filter=None)
 
 
-def query_cortex(query, columns=None, filter={}):
-    columns = columns or []
-    db, schema = session.get_current_database(), session.get_current_schema()
-    svc = root.databases[db].schemas[schema].cortex_search_services[st.session_state.selected_cortex_search_service]
-    
-    search_col = next(
-        (s["search_column"] for s in st.session_state.service_metadata if s["name"] == st.session_state.selected_cortex_search_service),
-        "chunk"  # fallback
-    )
+def get_chat_history():
+    return pipeline.chat_history(st.session_state.messages, chat_settings())
 
-    all_columns = list(set(columns + [search_col, "file_url", "relative_path"]))
-    results = svc.search(query, columns=all_columns, filter=filter, limit=st.session_state.num_retrieved_chunks).results
 
-    def make_context(i, r):
-        file = r.get("relative_path", "unknown")
-      
-        chunk = next((v for k, v in r.items() if k.lower() == search_col.lower()), "[Missing chunk]")
-        return f"Context {i+1}: {file}:\n{chunk}"
+def summarize_chat(chat_history, question):
+    return pipeline.summarize_chat(backend, routing.resolve(st.session_state.model_name, "rewrite"), chat_history, question)
 
-    context = "\n\n".join([make_context(i, r) for i, r in enumerate(results)])
 
+def show_debug_context(context, results):
     if st.session_state.debug:
         st.sidebar.write("🔎 Raw Cortex Result Preview:", results[0] if results else {})
         st.sidebar.text_area("📄 Context Documents", context, height=300)
 
+
+def show_trace_waterfall(trace):
+    if not st.session_state.debug or trace is None:
+        return
+    total = max(trace.duration_ms, 1e-6)
+    rows = []
+    for span in sorted(trace.spans, key=lambda s: s.start):
+        offset = (span.start - trace.start) * 1000
+        attrs = ", ".join(f"{k}={v}" for k, v in span.attrs.items())
+        rows.append(f"""
+            <div style='font-size: 12px; margin: 2px 0;'>
+                <div>{'&nbsp;' * 2 * span.depth}{span.name} · {span.duration_ms:.0f} ms <span style='color: #888;'>{attrs}</span></div>
+                <div style='background: #e9ecef; height: 8px; border-radius: 4px;'>
+                    <div style='margin-left: {offset / total * 100:.1f}%; width: {max(span.duration_ms / total * 100, 0.5):.1f}%;
+                        background: #1f77b4; height: 8px; border-radius: 4px;'></div>
+                </div>
+            </div>""")
+    st.sidebar.markdown("⏱️ **Turn Timing**" + "".join(rows), unsafe_allow_html=True)
+    st.sidebar.write("🚦 Cortex slots:", scheduler.SCHEDULER.stats())
+    st.sidebar.write("🗄️ Shared cache:", shared_cache.CACHE.stats())
+
+
+def build_prompt(question):
+    """The answer prompt and the ``[file, page]`` pairs it cites."""
+    prompt, context, results = pipeline.build_prompt(backend, chat_settings(question), question, st.session_state.messages)
+    show_debug_context(context, results)
+    return prompt, [list(ref) for ref in citations.cited_pages(results)]
+
+
+def show_citations(sources, key):
+    """Cited brochure pages; a page is rendered only when its toggle is switched on."""
+    with st.expander("📑 Sources"):
+        unviewable = False
+        for n, (file, page) in enumerate(sources):
+            label = f"{file} – page {page}" if page else file
+            path = citations.local_pdf(file) if page else None
+            if path is None:
+                unviewable = True
+                st.markdown(f"- {label}")
+            elif st.toggle(f"🔍 {label}", key=f"cite_{key}_{n}"):
+                image = citations.page_image(path, page)
+                if image is None:
+                    st.caption("This page can no longer be read from the brochure.")
+                else:
+                    st.image(image, use_container_width=True)
+        if unviewable:
+            st.caption("Pages can be previewed only for brochures uploaded through this app whose PDF is "
+                       "still in its pdfs/ folder; other sources are listed by file.")
+
+
+def query_cortex(query, columns=None, filter={}):
+    context, results = pipeline.query_cortex(backend, chat_settings(), query, columns, filter)
+    show_debug_context(context, results)
     return context
 
 
@@ -164,99 +234,71 @@ def init_config():
         st.selectbox("Cortex Search Service", [s["name"] for s in st.session_state.service_metadata], key="selected_cortex_search_service")
         st.button("🧹 Clear Chat", key="clear_conversation")
         st.toggle("🐞 Debug Mode", key="debug", value=False)
+        if st.session_state.debug:
+            st.toggle("🔬 Profile Reruns", key="profile_reruns", value=False,
+                      help=f"cProfile each rerun and save .prof and flame-graph .folded files to {profiling.PROFILE_DIR}/")
         st.toggle("🕘 Use Chat History", key="use_chat_history", value=True)
         st.selectbox("📂 Filter by Topic", TOPICS, key="selected_topic")
         st.image("https://raw.githubusercontent.com/Shail1602/Inellibot/main/SS%20Intellibot.png", caption="SS IntelliGuide", use_container_width=True)
         st.caption("Ask Smart. Get Smarter.")
         
         with st.expander("🧠 Advanced Options"):
-            st.selectbox("Select Model", MODELS, key="model_name")
+            st.selectbox("Select Model", MODELS, key="model_name", format_func=lambda m: "⚡ Auto (routed)" if m == routing.AUTO_MODEL else m)
             st.slider("Context Chunks", 1, 20, 18, key="num_retrieved_chunks")
+            st.toggle("🎯 Adaptive Retrieval", key="adaptive_retrieval", value=False,
+                      help="Over-fetch and send only as many chunks as the question needs, up to Context Chunks")
             st.slider("Chat History Messages", 1, 10, 5, key="num_chat_messages")
 
+def connect_snowflake():
+    return snowflake.connector.connect(**connection_parameters)
+
+
 def upload_to_snowflake_stage(uploaded_file):
-    with tempfile.NamedTemporaryFile(delete=False) as tmp:
-        tmp.write(uploaded_file.read())
-        tmp_path = tmp.name
-
-    conn = snowflake.connector.connect(**connection_parameters)
-    cs = conn.cursor()
-    file_name = os.path.basename(uploaded_file.name).replace(" ", "_")
-    staged_path = f"{file_name}" 
-    target_temp_path = os.path.join(tempfile.gettempdir(), file_name)
-    shutil.copy(tmp_path, target_temp_path)
-    staged_file_path = f"fomc/{file_name}"
-
-    extracted_text = []
-    try:
-        with fitz.open(tmp_path) as doc:
-            for page in doc:
-                text = page.get_text()
-                if text.strip():
-                    extracted_text.append(text.strip())
-    except Exception as e:
-        st.error(f"Failed to extract text: {e}")
-        return
-    
-    try:
-        put_query = f"PUT file://{target_temp_path} {STAGE_NAME}  OVERWRITE=TRUE AUTO_COMPRESS=FALSE"
-        cs.execute(put_query)
-        cs.execute("USE DATABASE apt_pdf_db")
-        cs.execute("USE SCHEMA public")
-        cs.execute(f"ALTER STAGE apt_pdf_db.public.apt REFRESH")
-        
-        for idx, chunk in enumerate(extracted_text):
-            chunk_sql = f"""
-            INSERT INTO apt_pdf_db.public.docs_chunks_table
-            SELECT
-                relative_path,
-                build_scoped_file_url({STAGE_NAME}, relative_path) AS file_url,
-                CONCAT(SPLIT_PART(relative_path, '/', -1), ': ', func.chunk) AS chunk,
-                'English' AS language
-            FROM (
-                SELECT relative_path
-                FROM directory({STAGE_NAME})
-                WHERE relative_path = ('{file_name}') 
-            ),
-            TABLE(apt_pdf_db.public.pdf_text_chunker(build_scoped_file_url({STAGE_NAME}, relative_path))) AS func;
-            """
-            cs.execute(chunk_sql)
-            cs.execute("ALTER STAGE apt_pdf_db.public.apt REFRESH")
-            cs.execute("""
-            CREATE OR REPLACE CORTEX SEARCH SERVICE apt_pdf_db.public.apt_pdf
-                ON chunk
-                ATTRIBUTES language
-                WAREHOUSE = apt_pdf_wh
-                TARGET_LAG = '1 minute'
-                AS (
-                    SELECT
-                        chunk,
-                        relative_path,
-                        file_url,
-                        language
-                    FROM apt_pdf_db.public.docs_chunks_table
-                );
-            """)
-            st.success(f"✅ Uploaded and Reindexed the file : {file_name}")
-            
-            os.remove(tmp_path)
-            if os.path.exists(target_temp_path):
-                os.remove(target_temp_path)       
-            if "uploaded_pdf" in st.session_state:
-                del st.session_state["uploaded_pdf"]
-            
-    except Exception as e:
-        st.error(f"Failed to upload/index: {e}")
-    finally:
-        cs.close()
-        conn.close()
+    """Queue an upload for background ingestion and return its job."""
+    on_done = None
+    if "selected_cortex_search_service" in st.session_state:
+        settings = prewarm_settings()
+
+        def on_done(job):
+            prewarm.warm_in_background(prewarm_backend, settings)
+    return ingest_jobs.QUEUE.submit(uploaded_file, uploaded_file.name, connect_snowflake, on_done=on_done)
+
+
+def session_jobs():
+    jobs = (ingest_jobs.QUEUE.get(job_id) for job_id in st.session_state.get("ingest_jobs", {}).values())
+    return [job for job in jobs if job is not None]
+
+
+def show_ingest_jobs():
+    for job in session_jobs():
+        icon = {"done": "✅", "duplicate": "♻️", "failed": "❌"}.get(job.status, "⏳")
+        st.progress(job.progress, text=f"{icon} {job.file_name} – {job.status_text}")
+        if job.error:
+            st.error(f"Failed to upload/index {job.file_name}: {job.error}")
+
+
+@st.fragment(run_every="2s")
+def poll_ingest_jobs():
+    show_ingest_jobs()
+    if all(job.finished for job in session_jobs()):
+        # A full rerun draws the finished jobs without this fragment, which stops the polling.
+        st.rerun()
+
 
 def handle_uploaded_pdf():
-    uploaded_file = st.sidebar.file_uploader("📥 Upload PDF", type=["pdf"], key="pdf_uploader")
-    if uploaded_file is not None:
-        st.session_state.uploaded_pdf = uploaded_file.name
-        st.sidebar.success(f"Uploaded: {uploaded_file.name}")
-        upload_to_snowflake_stage(uploaded_file)
+    uploaded_files = st.sidebar.file_uploader("📥 Upload PDF", type=["pdf"], key="pdf_uploader",
+                                              accept_multiple_files=True)
+    # The uploader keeps returning its files on every rerun; submit each one once.
+    submitted = st.session_state.setdefault("ingest_jobs", {})
+    for uploaded_file in uploaded_files or []:
+        if uploaded_file.file_id not in submitted:
+            submitted[uploaded_file.file_id] = upload_to_snowflake_stage(uploaded_file).id
+    if submitted:
+        with st.sidebar:
+            if all(job.finished for job in session_jobs()):
+                show_ingest_jobs()
+            else:
+                poll_ingest_jobs()
 
 
 def generate_summary():
@@ -277,7 +319,7 @@ def generate_summary():
     ...
     [/INST]
     """
-    summary = complete(st.session_state.model_name, prompt)
+    summary = complete(routing.resolve(st.session_state.model_name, "synthesis"), prompt, stage="generate_summary")
     return summary.strip()
 
 
@@ -452,13 +494,15 @@ def main():
     
 
     add_custom_css()
+    build_catalog()
     init_service_metadata()
     handle_uploaded_pdf()
     init_config()
     init_messages()
 
     if len(st.session_state.messages) == 0:
-        st.markdown("""
+        featured = "".join(f"<li>{q['icon']} {q['question']}</li>" for q in prewarm.featured_questions())
+        st.markdown(f"""
             <div style='
             position: relative;
             background-image: url("https://images.unsplash.com/photo-1507525428034-b723cf961d3e?auto=format&fit=crop&w=1470&q=80");
@@ -478,11 +522,7 @@ def main():
             <p style='font-size: 15px;'><strong>Brochures Available:</strong> Enchanting Japan, Vietnam & Cambodia, Ancient Kingdoms of Asia, European River Cruises, and more.</p>
             <p style='font-size: 16px; margin-top: 20px;'><strong>Try asking:</strong></p>
                 <ul style='list-style: none; padding-left: 0; font-size: 15px; line-height: 1.8;'>
-                  <li>🌏 What Signature Experiences are included in the Vietnam & Cambodia tour?</li>
-                  <li>🚂 What are the scenic highlights of the Danube River Cruise?</li>
-                  <li>🗾 What cities do we visit on the Enchanting Japan tour?</li>
-                  <li>🏰 Are Freedom of Choice activities available in Prague?</li>
-                  <li>📅 What is the itinerary for the Ancient Kingdoms of Japan and South Korea?</li>
+                  {featured}
                 </ul>
               </div>
             </div>
@@ -492,6 +532,8 @@ def main():
         css_class = "chat-left" if msg["role"] == "assistant" else "chat-right"
         st.markdown(f"<div class='{css_class}'>{msg['content']}</div>", unsafe_allow_html=True)
         if msg["role"] == "assistant":
+            if msg.get("sources"):
+                show_citations(msg["sources"], i)
             if st.button("⭐ Pin this response", key=f"pin_{i}"):
                 st.session_state.pinned_messages.append(msg["content"])
                 save_session_state()
@@ -500,12 +542,43 @@ def main():
     disable_chat = not st.session_state.service_metadata
     if question := st.chat_input("💬 Ask your question...", disabled=disable_chat):
         st.session_state.messages.append({"role": "user", "content": question})
-        with st.spinner("SS IntelliGuide is typing..."):
-            prompt = build_prompt(question.replace("'", ""))
-            reply = complete(st.session_state.model_name, prompt)
-            st.session_state.messages.append({"role": "assistant", "content": reply})
-            save_session_state()
-            st.markdown(f"<div class='chat-left'>{reply}</div>", unsafe_allow_html=True)
+        try:
+            with st.spinner("SS IntelliGuide is typing..."), tracing.trace("chat_turn", model=st.session_state.model_name) as turn:
+                with tracing.span("tour_facts") as facts_span:
+                    facts_answer = tour_facts.answer(question)
+                    facts_span.set(cache_hit=facts_answer is not None)
+                featured = prewarm.lookup(st.session_state.selected_cortex_search_service, question) if not get_chat_history() else None
+                sources = []
+                if facts_answer:
+                    reply, model_used = facts_answer, "tour_facts"
+                elif featured:
+                    with tracing.span("prewarmed", cache_hit=True):
+                        reply, model_used = featured["answer"], featured["model"]
+                    prewarm.refresh_in_background(prewarm_backend, prewarm_settings(), featured)
+                else:
+                    try:
+                        prompt, sources = build_prompt(question.replace("'", ""))
+                        reply, model_used = routing.routed_complete(backend, st.session_state.model_name, question, prompt)
+                    except resilience.Unavailable:
+                        # Cortex is failing: a stored answer to a near match beats no answer.
+                        cached = prewarm.lookup(st.session_state.selected_cortex_search_service, question)
+                        if not cached:
+                            raise
+                        sources = []
+                        with tracing.span("prewarmed", cache_hit=True, fallback=True):
+                            reply, model_used = cached["answer"], cached["model"]
+                turn.attrs["model_used"] = model_used
+                st.session_state.messages.append({"role": "assistant", "content": reply, "sources": sources})
+                save_session_state()
+                with tracing.span("render"):
+                    st.markdown(f"<div class='chat-left'>{reply}</div>", unsafe_allow_html=True)
+                    if sources:
+                        show_citations(sources, len(st.session_state.messages) - 1)
+        except scheduler.AdmissionError as e:
+            # Drop the unanswered question so it can simply be asked again.
+            st.session_state.messages.pop()
+            st.warning(f"🚦 {e}")
+        show_trace_waterfall(turn)
 
     if st.session_state.messages:
         with st.expander("📌 Pinned Messages"):
@@ -514,8 +587,11 @@ def main():
 
         with st.expander("📊 Generate Summary"):
             if st.button("Generate Insight Summary"):
-                summary = generate_summary()
-                st.markdown(f"**🔎 Summary:**\n\n{summary}", unsafe_allow_html=True)
+                try:
+                    summary = generate_summary()
+                    st.markdown(f"**🔎 Summary:**\n\n{summary}", unsafe_allow_html=True)
+                except scheduler.AdmissionError as e:
+                    st.warning(f"🚦 {e}")
 
         with st.expander("⬇️ Download Chat History"):
             full_chat = "\n".join([f"{m['role'].capitalize()}: {m['content']}" for m in st.session_state.messages])
@@ -536,4 +612,8 @@ def main():
             """, unsafe_allow_html=True)
    
 if __name__ == "__main__":
-    main()
+    # Read before main() draws the toggle; widget values are already updated when a rerun starts.
+    enabled = st.session_state.get("debug", False) and st.session_state.get("profile_reruns", False)
+    with profiling.profile_rerun("home", enabled) as profile:
+        main()
+    profiling.show_profile(profile, st.sidebar)
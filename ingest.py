@@ -0,0 +1,190 @@
+"""Brochure ingestion: text extraction, staging and re-indexing.
+
+Kept free of Streamlit so uploads can be driven from the app, the benchmark
+harness or a script. ``connect`` is any callable returning a DB-API style
+connection (``snowflake.connector.connect`` in production).
+"""
+
+import json
+import os
+
+import fitz
+
+import chunker
+import dedupe
+import tracing
+
+STAGE_NAME = "@apt_pdf_db.public.apt"
+# "server" chunks with the pdf_text_chunker UDF; anything else is a chunker.STRATEGIES entry.
+CHUNKING = os.environ.get("INTELLIGUIDE_CHUNKING", "layout")
+# "1" or "0" forces collapsing shared boilerplate (dedupe.py) on or off. By default it is off for layout
+# chunking, where it still costs recall (chunking_bench --dedupe MRR 0.761 -> 0.738), and on otherwise.
+STRIP_BOILERPLATE = os.environ.get("INTELLIGUIDE_STRIP_BOILERPLATE")
+
+INSERT_CHUNKS_SQL = """
+    INSERT INTO apt_pdf_db.public.docs_chunks_table
+    SELECT
+        relative_path,
+        build_scoped_file_url({stage}, relative_path) AS file_url,
+        CONCAT(SPLIT_PART(relative_path, '/', -1), ': ', func.chunk) AS chunk,
+        'English' AS language
+    FROM (
+        SELECT relative_path
+        FROM directory({stage})
+        WHERE relative_path = ('{file_name}')
+    ),
+    TABLE(apt_pdf_db.public.pdf_text_chunker(build_scoped_file_url({stage}, relative_path))) AS func;
+"""
+
+ADD_SOURCES_COLUMN_SQL = "ALTER TABLE apt_pdf_db.public.docs_chunks_table ADD COLUMN IF NOT EXISTS sources VARCHAR"
+
+INSERT_LOCAL_CHUNK_SQL = """
+    INSERT INTO apt_pdf_db.public.docs_chunks_table (relative_path, chunk, language, sources)
+    VALUES (%s, %s, 'English', %s)
+"""
+
+UPDATE_SOURCES_SQL = "UPDATE apt_pdf_db.public.docs_chunks_table SET sources = %s WHERE chunk = %s"
+# Runs stored before their chunk was recorded: the row is "<first file>: <text>" for a file we no longer know.
+UPDATE_SOURCES_BY_TEXT_SQL = "UPDATE apt_pdf_db.public.docs_chunks_table SET sources = %s WHERE ENDSWITH(chunk, %s)"
+
+SET_FILE_URL_SQL = """
+    UPDATE apt_pdf_db.public.docs_chunks_table
+    SET file_url = build_scoped_file_url({stage}, relative_path)
+    WHERE relative_path = '{file_name}' AND file_url IS NULL
+"""
+
+CREATE_SEARCH_SERVICE_SQL = """
+    CREATE OR REPLACE CORTEX SEARCH SERVICE apt_pdf_db.public.apt_pdf
+        ON chunk
+        ATTRIBUTES language, relative_path
+        WAREHOUSE = apt_pdf_wh
+        TARGET_LAG = '1 minute'
+        AS (
+            SELECT
+                chunk,
+                relative_path,
+                file_url,
+                language,
+                sources
+            FROM apt_pdf_db.public.docs_chunks_table
+        );
+"""
+
+# Filterable, so retrieval can be narrowed to given brochures (catalog.file_filter).
+PATH_ATTRIBUTE = "relative_path"
+
+
+def staged_file_name(name):
+    return os.path.basename(name).replace(" ", "_")
+
+
+def extract_pages(path):
+    """Return the stripped text of every non-empty page."""
+    extracted_text = []
+    with tracing.span("ingest.extract") as s, fitz.open(path) as doc:
+        for page in doc:
+            text = page.get_text()
+            if text.strip():
+                extracted_text.append(text.strip())
+        s.set(pages=len(doc), chunks=len(extracted_text))
+    return extracted_text
+
+
+def strips_boilerplate(strategy):
+    if STRIP_BOILERPLATE is not None:
+        return STRIP_BOILERPLATE == "1"
+    return strategy != "layout"
+
+
+def chunk_file(path, file_name, strategy=None, passages=None):
+    """``(chunks, shared)`` for ``path``: its own chunks and the shared boilerplate runs stripped from it.
+
+    Chunks are None when chunking is left to the server UDF. ``passages``
+    defaults to ``dedupe.INDEX`` when ``strips_boilerplate``, else nothing is stripped.
+    """
+    strategy = strategy or CHUNKING
+    if strategy == "server":
+        extract_pages(path)  # still fail fast on unreadable PDFs before staging
+        return None, []
+    if passages is None and strips_boilerplate(strategy):
+        passages = dedupe.INDEX
+    with tracing.span("ingest.local_chunk", strategy=strategy) as s:
+        strip = passages.stripper(file_name) if passages is not None else None
+        chunks = chunker.chunk_pdf(path, strategy, strip=strip)
+        shared = list({id(r): r for r in strip.runs}.values()) if strip is not None else []
+        s.set(chunks=len(chunks), shared=len(shared))
+    return chunks, shared
+
+
+def _chunk_row(file_name, text, sources):
+    return file_name, f"{file_name}: {text}", json.dumps(sources)
+
+
+def reindex(connect):
+    """Rebuild the Cortex Search service over the docs table."""
+    conn = connect()
+    cs = conn.cursor()
+    try:
+        with tracing.span("ingest.reindex"):
+            cs.execute(ADD_SOURCES_COLUMN_SQL)
+            cs.execute(CREATE_SEARCH_SERVICE_SQL)
+    finally:
+        cs.close()
+        conn.close()
+
+
+def stage_and_index(connect, local_path, file_name, chunks=None, shared=(), passages=dedupe.INDEX,
+                    rebuild_service=True, progress=None):
+    """PUT the file on the stage, chunk it into the docs table and rebuild the search service.
+
+    ``chunks`` and ``shared`` (from ``chunk_file``) are inserted as-is; a
+    shared run that is already indexed only has its ``sources`` updated.
+    Without chunks the server-side ``pdf_text_chunker`` UDF chunks the
+    staged file. ``progress(step)`` is called before the "put", "chunk"
+    and "reindex" steps; pass ``rebuild_service=False`` to leave the
+    rebuild to a later ``reindex`` call.
+    """
+    progress = progress or (lambda step: None)
+    conn = connect()
+    cs = conn.cursor()
+    try:
+        progress("put")
+        with tracing.span("ingest.put", bytes=os.path.getsize(local_path)):
+            cs.execute(f"PUT file://{local_path} {STAGE_NAME}  OVERWRITE=TRUE AUTO_COMPRESS=FALSE")
+            cs.execute("USE DATABASE apt_pdf_db")
+            cs.execute("USE SCHEMA public")
+            cs.execute("ALTER STAGE apt_pdf_db.public.apt REFRESH")
+        progress("chunk")
+        with tracing.span("ingest.chunk", local=chunks is not None):
+            # The search service selects ``sources``, so the column must exist even for server-chunked rows.
+            cs.execute(ADD_SOURCES_COLUMN_SQL)
+            if chunks is None:
+                cs.execute(INSERT_CHUNKS_SQL.format(stage=STAGE_NAME, file_name=file_name))
+            else:
+                inserts = []
+                if shared:  # runs only come from stripping, so ``passages`` can be None without them
+                    inserts = passages.claim(shared, lambda r: _chunk_row(r.sources[0][0], r.text, r.sources)[1])
+                rows = [_chunk_row(file_name, c.text, [[file_name, c.page]]) for c in chunks]
+                rows += [(r.sources[0][0], r.chunk, json.dumps(r.sources)) for r in inserts]
+                try:
+                    cs.executemany(INSERT_LOCAL_CHUNK_SQL, rows)
+                except Exception:
+                    if inserts:
+                        passages.release(inserts)
+                    raise
+                claimed = {id(r) for r in inserts}
+                updates = [r for r in shared if id(r) not in claimed]
+                if any(r.chunk for r in updates):
+                    cs.executemany(UPDATE_SOURCES_SQL, [(json.dumps(r.sources), r.chunk) for r in updates if r.chunk])
+                if any(not r.chunk for r in updates):
+                    cs.executemany(UPDATE_SOURCES_BY_TEXT_SQL,
+                                   [(json.dumps(r.sources), f": {r.text}") for r in updates if not r.chunk])
+                cs.execute(SET_FILE_URL_SQL.format(stage=STAGE_NAME, file_name=file_name))
+            cs.execute("ALTER STAGE apt_pdf_db.public.apt REFRESH")
+        if rebuild_service:
+            progress("reindex")
+            with tracing.span("ingest.reindex"):
+                cs.execute(CREATE_SEARCH_SERVICE_SQL)
+    finally:
+        cs.close()
+        conn.close()
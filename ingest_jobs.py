@@ -0,0 +1,245 @@
+"""Background brochure ingestion.
+
+``IngestQueue.submit`` streams an upload to disk once, hashing it on the
+way. Content that is already queued, running or indexed is not ingested
+again; anything else is moved into a directory of its own job under the
+name it will have on the stage. Worker threads run chunking, staging and
+the docs-table insert for several brochures at once. Search-service
+rebuilds run on a single thread and cover every job inserted since the
+previous rebuild started, so a burst of uploads triggers one or two
+rebuilds instead of one each. The app polls ``Job`` status and progress
+instead of blocking the rerun.
+"""
+
+import hashlib
+import json
+import os
+import queue
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+
+import ingest
+import shared_cache
+import tracing
+
+UPLOAD_DIR = os.path.join(tempfile.gettempdir(), "intelliguide_uploads")
+INGESTED_FILE = "ingested_files.json"
+WORKERS = int(os.environ.get("INTELLIGUIDE_INGEST_WORKERS", "2"))
+READ_BLOCK = 1 << 20
+
+# status -> progress shown while in that status
+PROGRESS = {
+    "queued": 0.0,
+    "chunking": 0.1,
+    "put": 0.35,
+    "chunk": 0.55,
+    "reindex": 0.8,
+    "done": 1.0,
+    "duplicate": 1.0,
+    "failed": 1.0,
+}
+STATUS_TEXT = {
+    "queued": "Queued",
+    "chunking": "Extracting and chunking",
+    "put": "Uploading to stage",
+    "chunk": "Inserting chunks",
+    "reindex": "Rebuilding search index",
+    "done": "Indexed",
+    "duplicate": "Already indexed",
+    "failed": "Failed",
+}
+FINISHED = ("done", "duplicate", "failed")
+
+
+@dataclass
+class Job:
+    id: str
+    file_name: str
+    digest: str
+    path: str
+    status: str = "queued"
+    error: str = ""
+    chunks: int = 0
+    created_at: float = field(default_factory=time.time)
+    finished_at: float = 0.0
+    connect: object = field(default=None, repr=False)
+    on_done: object = field(default=None, repr=False)
+
+    @property
+    def progress(self):
+        return PROGRESS[self.status]
+
+    @property
+    def finished(self):
+        return self.status in FINISHED
+
+    @property
+    def status_text(self):
+        return STATUS_TEXT[self.status]
+
+
+def save_upload(fileobj, upload_dir=UPLOAD_DIR):
+    """Stream ``fileobj`` to a temporary file in ``upload_dir`` once; return ``(path, sha256)``."""
+    os.makedirs(upload_dir, exist_ok=True)
+    digest = hashlib.sha256()
+    tmp_path = os.path.join(upload_dir, f".{uuid.uuid4().hex}.part")
+    if hasattr(fileobj, "seek"):
+        fileobj.seek(0)
+    with open(tmp_path, "wb") as out:
+        while block := fileobj.read(READ_BLOCK):
+            digest.update(block)
+            out.write(block)
+    return tmp_path, digest.hexdigest()
+
+
+class IngestQueue:
+    def __init__(self, workers=WORKERS, ingested_file=INGESTED_FILE, upload_dir=UPLOAD_DIR):
+        self.workers = workers
+        self.ingested_file = ingested_file
+        self.upload_dir = upload_dir
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._threads = []
+        self._jobs = {}
+        self._by_digest = {}
+        self._ingested = self._load_ingested()
+        # Jobs whose chunks are inserted and that wait for the next search-service rebuild.
+        self._reindex_cond = threading.Condition()
+        self._pending_reindex = []
+        self._reindex_thread = None
+
+    def _load_ingested(self):
+        if not os.path.exists(self.ingested_file):
+            return {}
+        with open(self.ingested_file, encoding="utf-8") as f:
+            return json.load(f)
+
+    def _record_ingested(self, job):
+        with self._lock:
+            self._ingested[job.digest] = {"file": job.file_name, "at": time.time()}
+            tmp_path = f"{self.ingested_file}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self._ingested, f, indent=2)
+            os.replace(tmp_path, self.ingested_file)
+
+    def _start_workers(self):
+        self._threads = [t for t in self._threads if t.is_alive()]
+        for n in range(len(self._threads), self.workers):
+            thread = threading.Thread(target=self._work, daemon=True, name=f"ingest-{n}")
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, fileobj, name, connect, on_done=None):
+        """Queue an upload for ingestion and return its ``Job``.
+
+        An upload whose content is already queued, running or indexed returns
+        the existing job, or a finished "duplicate" job.
+        """
+        tmp_path, digest = save_upload(fileobj, self.upload_dir)
+        with self._lock:
+            existing = self._by_digest.get(digest)
+            if existing is not None and existing.status != "failed":
+                os.remove(tmp_path)
+                return existing
+            job_id = uuid.uuid4().hex[:12]
+            # A directory per job, so no other job's cleanup can remove this file.
+            job = Job(job_id, ingest.staged_file_name(name), digest,
+                      os.path.join(self.upload_dir, job_id, ingest.staged_file_name(name)),
+                      connect=connect, on_done=on_done)
+            self._jobs[job.id] = job
+            self._by_digest[digest] = job
+            if digest in self._ingested:
+                job.status, job.finished_at = "duplicate", time.time()
+            else:
+                os.makedirs(os.path.dirname(job.path))
+                os.replace(tmp_path, job.path)
+                self._queue.put(job)
+                self._start_workers()
+        if job.status == "duplicate":
+            os.remove(tmp_path)
+        return job
+
+    def get(self, job_id):
+        return self._jobs.get(job_id)
+
+    def jobs(self):
+        with self._lock:
+            return sorted(self._jobs.values(), key=lambda j: j.created_at)
+
+    def active(self):
+        return [j for j in self.jobs() if not j.finished]
+
+    def _cleanup(self, job):
+        shutil.rmtree(os.path.dirname(job.path), ignore_errors=True)
+
+    def _work(self):
+        while True:
+            job = self._queue.get()
+            try:
+                self._run(job)
+            finally:
+                self._queue.task_done()
+
+    def _run(self, job):
+        with tracing.trace("ingest", file=job.file_name, job=job.id):
+            try:
+                job.status = "chunking"
+                chunks, shared = ingest.chunk_file(job.path, job.file_name)
+                job.chunks = len(chunks or ())
+                ingest.stage_and_index(job.connect, job.path, job.file_name, chunks, shared,
+                                       rebuild_service=False, progress=lambda step: setattr(job, "status", step))
+            except Exception as e:
+                tracing.annotate(error=f"{type(e).__name__}: {e}")
+                self._finish(job, f"{type(e).__name__}: {e}")
+                return
+            finally:
+                self._cleanup(job)
+        with self._reindex_cond:
+            job.status = "reindex"
+            self._pending_reindex.append(job)
+            self._reindex_cond.notify()
+            if self._reindex_thread is None or not self._reindex_thread.is_alive():
+                self._reindex_thread = threading.Thread(target=self._reindex_loop, daemon=True, name="ingest-reindex")
+                self._reindex_thread.start()
+
+    def _reindex_loop(self):
+        """Rebuild the search service once for every job inserted since the last rebuild started."""
+        while True:
+            with self._reindex_cond:
+                while not self._pending_reindex:
+                    self._reindex_cond.wait()
+                batch, self._pending_reindex = self._pending_reindex, []
+            error = ""
+            with tracing.trace("ingest_reindex", jobs=len(batch)):
+                try:
+                    ingest.reindex(batch[-1].connect)
+                    shared_cache.CACHE.invalidate("search")
+                except Exception as e:
+                    error = f"{type(e).__name__}: {e}"
+                    tracing.annotate(error=error)
+                for job in batch:
+                    try:
+                        self._finish(job, error)
+                    except Exception as e:
+                        # Fail this job, not the thread every later upload waits on for its reindex.
+                        tracing.annotate(finish_error=f"{job.file_name}: {type(e).__name__}: {e}")
+                        if not job.finished:
+                            job.error, job.status = f"{type(e).__name__}: {e}", "failed"
+                            job.finished_at = time.time()
+
+    def _finish(self, job, error=""):
+        if error:
+            job.error, job.status = error, "failed"
+        else:
+            self._record_ingested(job)
+            job.status = "done"
+        job.finished_at = time.time()
+        if job.status == "done" and job.on_done is not None:
+            job.on_done(job)
+
+
+QUEUE = IngestQueue()
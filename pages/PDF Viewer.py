@@ -1,24 +1,81 @@
 import streamlit as st
 import os
-import PyPDF2
 import re
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import brochure_info
+import catalog
+import profiling
+import shared_cache
+import suggest
 
 PDF_DIR = "pdfs"
 st.set_page_config(page_title="📚 APT Tour Brochure Library", layout="wide")
 
-if "dark_mode" not in st.session_state:
-    st.session_state.dark_mode = False
 
-if "selected_pdf" not in st.session_state:
-    st.session_state.selected_pdf = None
+def use_suggestion(text):
+    st.session_state.pdf_search = text
 
-# Sidebar toggle for Dark Mode
-with st.sidebar:
-    st.toggle("🌃 Dark Mode", key="dark_mode")
 
-# Dynamic theme based on Dark Mode
-if st.session_state.dark_mode:
-    st.markdown("""
+def tag_icon(tag):
+    return {
+        "Ocean Cruise": "🚣️",
+        "River Cruise": "🛶",
+        "Land Tour": "🚍",
+        "Small Ship Cruise": "🛳️",
+        "Yacht Cruise": "⛵",
+        "Small Group Tour": "👥",
+        "Rail Tour": "🚆",
+        "Wilderness Lodge": "🏕️",
+        "Extensions": "➕",
+        "4WD Tour": "🚙",
+        "Europe": "🇪🇺",
+        "Asia": "🌏",
+        "Australia": "🇦🇺",
+        "New Zealand": "🇿🇿",
+        "Africa": "🌍",
+        "South America": "🌎",
+        "North America": "🌎",
+        "General": "📊"
+    }.get(tag, "📌")
+
+
+@st.cache_data(show_spinner=False)
+def extract_pdf_info(file_path, mtime):
+    """Brochure metadata, re-extracted only when the file changes (``mtime`` is the cache key).
+
+    Other worker processes share what has been extracted through ``shared_cache``.
+    """
+    try:
+        return shared_cache.CACHE.get_or_set("brochure_info", (os.path.basename(file_path), mtime),
+                                             lambda: brochure_info.extract(file_path))
+    except Exception:
+        return brochure_info.BrochureInfo(regions=["Error"])
+
+
+def read_pdf(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def main():
+    if "dark_mode" not in st.session_state:
+        st.session_state.dark_mode = False
+
+    if "selected_pdf" not in st.session_state:
+        st.session_state.selected_pdf = None
+
+    # Sidebar toggle for Dark Mode
+    with st.sidebar:
+        st.toggle("🌃 Dark Mode", key="dark_mode")
+        if st.session_state.get("debug", False):
+            st.toggle("🔬 Profile Reruns", key="profile_viewer", value=False,
+                      help=f"cProfile each rerun and save .prof and flame-graph .folded files to {profiling.PROFILE_DIR}/")
+
+    # Dynamic theme based on Dark Mode
+    if st.session_state.dark_mode:
+        st.markdown("""
         <style>
         body, .stApp {
             background-color: #0e1117;
@@ -30,8 +87,8 @@ if st.session_state.dark_mode:
         }
         </style>
     """, unsafe_allow_html=True)
-else:
-    st.markdown("""
+    else:
+        st.markdown("""
         <style>
         body, .stApp {
             background-color: #f6f9fc;
@@ -44,7 +101,7 @@ else:
         </style>
     """, unsafe_allow_html=True)
 
-st.markdown("""
+    st.markdown("""
     <div style='background-image: url("https://images.unsplash.com/photo-1507525428034-b723cf961d3e"); 
                 background-size: cover; 
                 background-position: center; 
@@ -56,9 +113,17 @@ st.markdown("""
     </div>
 """, unsafe_allow_html=True)
 
-search_query = st.text_input("🔍 Search by code, title, or location (e.g., Broome, Darwin, Safari):").strip().lower()
+    # Picks up brochures added or changed since the last rerun on a thread; until the first build is
+    # ready the filter below falls back to the brochure text.
+    suggest.INDEX.refresh_in_background()
+    search_query = st.text_input("🔍 Search by code, title, or location (e.g., Broome, Darwin, Safari):", key="pdf_search").strip().lower()
+    suggestions = [s for s in suggest.INDEX.suggest(search_query, 6) if s.text.lower() != search_query] if search_query else []
+    if suggestions:
+        for col, s in zip(st.columns(len(suggestions)), suggestions):
+            col.button(f"{s.text} ({s.count})", key=f"pdf_suggest_{s.text}", on_click=use_suggestion, args=(s.text,),
+                       help=f"{s.kind}, in {s.count} brochures and tours")
 
-st.markdown("""
+    st.markdown("""
     <style>
     .card {
         border-radius: 14px;
@@ -85,15 +150,22 @@ st.markdown("""
         color: white;
     }
     .badge[data-tag="Land Tour"] { background: #2a9d8f; }
-    .badge[data-tag="4WD"] { background: #e76f51; }
+    .badge[data-tag="4WD Tour"] { background: #e76f51; }
     .badge[data-tag="Africa"] { background: #264653; }
     .badge[data-tag="Australia"] { background: #f4a261; }
     .badge[data-tag="Europe"] { background: #457b9d; }
     .badge[data-tag="River Cruise"] { background: #6a4c93; }
     .badge[data-tag="Ocean Cruise"] { background: #1f77b4; }
+    .badge[data-tag="Small Ship Cruise"] { background: #17becf; }
+    .badge[data-tag="Yacht Cruise"] { background: #0a9396; }
+    .badge[data-tag="Small Group Tour"] { background: #bc6c25; }
+    .badge[data-tag="Rail Tour"] { background: #9c6644; }
+    .badge[data-tag="Wilderness Lodge"] { background: #606c38; }
+    .badge[data-tag="Extensions"] { background: #b5838d; }
     .badge[data-tag="Asia"] { background: #ff6b6b; }
     .badge[data-tag="South America"] { background: #43aa8b; }
     .badge[data-tag="New Zealand"] { background: #8d99ae; }
+    .badge[data-tag="North America"] { background: #d62828; }
     .badge[data-tag="General"] { background: #888; }
     .center-btn {
         display: flex;
@@ -103,89 +175,57 @@ st.markdown("""
     </style>
 """, unsafe_allow_html=True)
 
-def tag_icon(tag):
-    return {
-        "Ocean Cruise": "🚣️",
-        "River Cruise": "🛶",
-        "Land Tour": "🚍",
-        "4WD": "🚙",
-        "Europe": "🇪🇺",
-        "Asia": "🌏",
-        "Australia": "🇦🇺",
-        "New Zealand": "🇿🇿",
-        "Africa": "🌍",
-        "South America": "🌎",
-        "General": "📊"
-    }.get(tag, "📌")
-
-def extract_pdf_info(file_path):
-    try:
-        with open(file_path, "rb") as f:
-            reader = PyPDF2.PdfReader(f)
-            text = ""
-            for page in reader.pages[:3]:
-                text += page.extract_text() or ""
-            text = re.sub(r'[^\x00-\x7F]+', ' ', text)
-
-            title = text.strip().split("\n")[0][:80]
-            code = re.search(r"\b[A-Z]{3,}\d{2,}\b", text)
-            days = re.search(r"\b\d+\s+days?\s*/\s*\d+\s+nights?\b", text, re.IGNORECASE)
-            route = re.search(r"(\b\w+ to \w+\b)", text)
-
-            tags = []
-            for tag in ["Ocean Cruise", "River Cruise", "Land Tour", "4WD", "Europe", "Asia", "Australia", "New Zealand", "Africa", "South America"]:
-                if tag.lower() in text.lower():
-                    tags.append(tag)
-
-            return {
-                "title": title,
-                "code": code.group(0) if code else "N/A",
-                "days": days.group(0) if days else "N/A",
-                "route": route.group(0) if route else "N/A",
-                "tags": tags or ["General"],
-                "search_blob": f"{title.lower()} {route.group(0).lower() if route else ''} {tags}".lower(),
-                "text_preview": text[:1000]  # Shorter preview
-            }
-    except Exception:
-        return {"title": "N/A", "code": "N/A", "days": "N/A", "route": "N/A", "tags": ["Error"], "search_blob": "", "text_preview": ""}
-
-pdf_files = sorted([f for f in os.listdir(PDF_DIR) if f.lower().endswith(".pdf")])
-indexed_files = [(f, extract_pdf_info(os.path.join(PDF_DIR, f))) for f in pdf_files]
-filtered = [item for item in indexed_files if search_query in item[1]["search_blob"] or search_query in item[0].lower()] if search_query else indexed_files
-
-page_size = 15
-total_pages = max(1, (len(filtered) - 1) // page_size + 1)
-page = st.number_input("Page", min_value=1, max_value=total_pages, value=1)
-start = (page - 1) * page_size
-end = start + page_size
-current_files = filtered[start:end]
-
-if current_files:
-    rows = [st.columns(3) for _ in range((len(current_files) + 2) // 3)]
-    for idx, (filename, info) in enumerate(current_files):
-        file_path = os.path.join(PDF_DIR, filename)
-        clean_title = re.sub(r'[^\x00-\x7F]+', '', info["title"])
-        col = rows[idx // 3][idx % 3]
-        with col:
-            with st.container():
-                st.markdown(f"""
+    pdf_files = sorted([f for f in os.listdir(PDF_DIR) if f.lower().endswith(".pdf")])
+    indexed_files = [(f, extract_pdf_info(os.path.join(PDF_DIR, f), os.path.getmtime(os.path.join(PDF_DIR, f)))) for f in pdf_files]
+    matched = suggest.INDEX.matches(search_query)
+    filtered = [item for item in indexed_files if ("brochure", item[0]) in matched] if matched is not None else indexed_files
+    if search_query and not filtered:
+        # No index hit, or the hits are tours only; fall back to searching the brochure text.
+        filtered = [item for item in indexed_files if search_query in item[1].search_blob or search_query in item[0].lower()]
+
+    page_size = 15
+    total_pages = max(1, (len(filtered) - 1) // page_size + 1)
+    page = st.number_input("Page", min_value=1, max_value=total_pages, value=1)
+    start = (page - 1) * page_size
+    end = start + page_size
+    current_files = filtered[start:end]
+
+    if current_files:
+        rows = [st.columns(3) for _ in range((len(current_files) + 2) // 3)]
+        for idx, (filename, info) in enumerate(current_files):
+            file_path = os.path.join(PDF_DIR, filename)
+            clean_title = re.sub(r'[^\x00-\x7F]+', '', info.title) or "N/A"
+            trip = catalog.CATALOG.by_brochure(filename)
+            ships = f"<br><small>🚢 {', '.join(catalog.ship_name(ship) for ship in trip.ships)}</small>" if trip and trip.ships else ""
+            col = rows[idx // 3][idx % 3]
+            with col:
+                with st.container():
+                    st.markdown(f"""
                 <div class='card'>
                     <div>
-                        <strong>📄 {info['code']} – {clean_title}</strong><br>
-                        <small>⏱️ {info['days']} | 🚩 {info['route']}</small><br>
+                        <strong>📄 {info.code or 'N/A'} – {clean_title}</strong><br>
+                        <small>⏱️ {info.duration or 'N/A'} | 🚩 {info.route or 'N/A'}</small>{ships}<br>
                         <div style='margin-top: 6px; display: flex; flex-wrap: wrap;'>
-                            {''.join([f"<span class='badge' data-tag='{tag}'>{tag_icon(tag)} {tag}</span>" for tag in info['tags']])}
+                            {''.join([f"<span class='badge' data-tag='{tag}'>{tag_icon(tag)} {tag}</span>" for tag in info.tags])}
                         </div>
                         <div style='margin-top: 12px;'>
                             <strong>Preview:</strong>
                             <div style='font-size: 13px; white-space: pre-wrap; max-height: 100px; overflow-y: auto;'>
-                                {info['text_preview']}
+                                {info.text_preview}
                             </div>
                         </div>
                     </div>
                     <div class='center-btn'>
                 """, unsafe_allow_html=True)
-                with open(file_path, "rb") as f:
-                    st.download_button("📅 Download PDF", f, file_name=filename, key=f"dl_{filename}")
-else:
-    st.warning("No PDF files match your search.")
+                    # Read only when clicked, not for every card on every rerun.
+                    st.download_button("📅 Download PDF", lambda path=file_path: read_pdf(path), file_name=filename,
+                                       mime="application/pdf", key=f"dl_{filename}")
+    else:
+        st.warning("No PDF files match your search.")
+
+
+# Read before main() draws the toggle; widget values are already updated when a rerun starts.
+enabled = st.session_state.get("debug", False) and st.session_state.get("profile_viewer", False)
+with profiling.profile_rerun("pdf_viewer", enabled) as profile:
+    main()
+profiling.show_profile(profile, st.sidebar)
@@ -1,6 +1,11 @@
 import streamlit as st
 import json
 import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import catalog
+import suggest
 
 # --- Load JSON data ---
 json_file = "scraper/tour_info.json"
@@ -18,16 +23,30 @@ st.set_page_config(layout="wide")
 st.markdown("## 🌍 APT Tours Viewer & Editor")
 
 # --- Search Field ---
-search_term = st.text_input("🔎 Search by trip name, code, region, or country").lower()
+def use_suggestion(text):
+    st.session_state.tour_search = text
+
+# Built on a thread; until it is ready the filter below falls back to the tour fields.
+suggest.INDEX.refresh_in_background()
+search_term = st.text_input("🔎 Search by trip name, code, region, or country", key="tour_search").strip().lower()
+suggestions = [s for s in suggest.INDEX.suggest(search_term, 6) if s.text.lower() != search_term] if search_term else []
+if suggestions:
+    for col, s in zip(st.columns(len(suggestions)), suggestions):
+        col.button(f"{s.text} ({s.count})", key=f"tour_suggest_{s.text}", on_click=use_suggestion, args=(s.text,),
+                   help=f"{s.kind}, in {s.count} brochures and tours")
 
 # --- Filter Tours ---
-filtered_tours = [
-    tour for tour in tours
-    if search_term in tour["trip_name"].lower()
-    or search_term in tour["trip_code"].lower()
-    or search_term in tour["region"].lower()
-    or search_term in tour["country"].lower()
-]
+matched = suggest.INDEX.matches(search_term)
+filtered_tours = [tour for tour in tours if ("tour", tour["trip_code"].upper()) in matched] if matched is not None else tours
+if search_term and not filtered_tours:
+    # No index hit, or the hits are brochures only; fall back to searching the tour fields.
+    filtered_tours = [
+        tour for tour in tours
+        if search_term in tour["trip_name"].lower()
+        or search_term in tour["trip_code"].lower()
+        or search_term in tour["region"].lower()
+        or search_term in tour["country"].lower()
+    ]
 
 # --- Tour Cards ---
 for tour in filtered_tours:
@@ -39,6 +58,11 @@ for tour in filtered_tours:
             st.markdown(f"**📍 Country:** {tour.get('country', '')}")
             st.markdown(f"**🔗 Original URL:** [{tour.get('original_url', '')}]({tour.get('original_url', '')})")
             st.markdown(f"**🔗 Booking URL:** [{tour.get('booking_url', '')}]({tour.get('booking_url', '')})")
+            trip = catalog.CATALOG.get(tour["trip_code"])
+            if trip and trip.brochure:
+                st.markdown(f"**📄 Brochure:** {trip.brochure}")
+            if trip and trip.ships:
+                st.markdown(f"**🚢 Ship:** {', '.join(catalog.ship_name(ship) for ship in trip.ships)}")
 
             st.markdown("**📋 Trip Inclusions:**")
             st.markdown("\n".join([f"- {item}" for item in tour.get("trip_inclusions", [])]))
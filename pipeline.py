@@ -0,0 +1,187 @@
+"""Chat pipeline shared by the Streamlit app and the offline tools.
+
+Everything here is free of Streamlit so the same prompt building, retrieval
+and completion code can be driven by ``home.py``, the benchmark harness or a
+headless script. Remote calls go through a *backend* object exposing
+``complete(model, prompt)`` and ``search(service, query, columns, filter,
+limit)``; ``CortexBackend`` talks to Snowflake and ``benchmarks/fakes.py``
+provides local stand-ins with the same interface.
+"""
+
+import json
+from dataclasses import dataclass
+
+import retrieval
+import tracing
+
+DEFAULT_SEARCH_COLUMN = "chunk"
+SOURCES_COLUMN = "sources"
+
+
+@dataclass
+class ChatSettings:
+    model_name: str
+    service: str
+    search_column: str = DEFAULT_SEARCH_COLUMN
+    num_retrieved_chunks: int = 18
+    num_chat_messages: int = 5
+    use_chat_history: bool = True
+    rewrite_model: str = None  # defaults to model_name
+    adaptive_retrieval: bool = False  # over-fetch and keep only as many chunks as the question needs
+    page_sources: bool = False  # also fetch SOURCES_COLUMN (file and page of each chunk); needs a service that has it
+    search_filter: dict = None  # Cortex Search filter for the answer's retrieval, e.g. catalog.file_filter
+
+
+def connection_parameters(snowflake_secrets):
+    """Connector/Snowpark parameters from the ``[snowflake]`` secrets section."""
+    return {
+        "user": snowflake_secrets["user"],
+        "password": snowflake_secrets["password"],
+        "account": snowflake_secrets["account"],
+        "warehouse": snowflake_secrets["warehouse"],
+        "database": snowflake_secrets["database"],
+        "schema": snowflake_secrets["schema"],
+        "role": snowflake_secrets.get("role", "ACCOUNTADMIN")
+    }
+
+
+class CortexBackend:
+    """Backend that calls Snowflake Cortex ``Complete`` and Cortex Search."""
+
+    def __init__(self, session, root):
+        self.session = session
+        self.root = root
+
+    def complete(self, model, prompt):
+        # Imported here so offline tools can use the pipeline without the SDK.
+        from snowflake.cortex import Complete
+        return Complete(model, prompt, session=self.session)
+
+    def search(self, service, query, columns, filter, limit):
+        db, schema = self.session.get_current_database(), self.session.get_current_schema()
+        svc = self.root.databases[db].schemas[schema].cortex_search_services[service]
+        return svc.search(query, columns=columns, filter=filter, limit=limit).results
+
+
+def escape_markdown(text):
+    return text.replace("$", "\\$")
+
+
+def complete_with_model(backend, model, prompt, stage="complete"):
+    """``complete``, also returning the model that answered: a fallback reply names its own."""
+    with tracing.span(stage, model=model, prompt_tokens=tracing.estimate_tokens(prompt)) as s:
+        reply = backend.complete(model, prompt)
+        s.set(completion_tokens=tracing.estimate_tokens(reply))
+    return escape_markdown(reply), getattr(reply, "model", None) or model
+
+
+def complete(backend, model, prompt, stage="complete"):
+    """Run a completion inside a tracing span and escape it for Markdown."""
+    return complete_with_model(backend, model, prompt, stage)[0]
+
+
+def chat_history(messages, settings):
+    """Previous turns to use as history; the last message is the current question."""
+    if not settings.use_chat_history:
+        return []
+    return messages[-settings.num_chat_messages:-1]
+
+
+def summarize_chat(backend, model, chat_history, question):
+    prompt = f"""
+    [INST]
+    Extend the user question using the chat history.
+    <chat_history>{chat_history}</chat_history>
+    <question>{question}</question>
+    [/INST]
+    """
+    return complete(backend, model, prompt, stage="summarize_chat")
+
+
+def source_pages(result):
+    """``[(file, page)]`` a result was chunked from; ``page`` is None for rows without a ``sources`` column."""
+    sources = next((v for k, v in result.items() if k.lower() == SOURCES_COLUMN), None)
+    try:
+        pairs = json.loads(sources) if isinstance(sources, str) else sources
+    except ValueError:
+        pairs = None
+    if pairs:
+        return [(file, page) for file, page in pairs]
+    return [(result.get("relative_path", "unknown"), None)]
+
+
+def make_context(results, search_col):
+    def make_entry(i, r):
+        file, page = source_pages(r)[0]
+        location = f"{file} (page {page})" if page else file
+        chunk = next((v for k, v in r.items() if k.lower() == search_col.lower()), "[Missing chunk]")
+        return f"Context {i+1}: {location}:\n{chunk}"
+
+    return "\n\n".join([make_entry(i, r) for i, r in enumerate(results)])
+
+
+def query_cortex(backend, settings, query, columns=None, filter=None):
+    """Search the selected service and return ``(context, results)``.
+
+    With ``settings.adaptive_retrieval`` the search over-fetches candidates
+    and ``retrieval.select`` keeps at most ``num_retrieved_chunks`` of them.
+    """
+    columns = columns or []
+    search_col = settings.search_column
+    all_columns = list(set(columns + [search_col, "file_url", "relative_path"]
+                           + ([SOURCES_COLUMN] if settings.page_sources else [])))
+    limit = settings.num_retrieved_chunks
+    if settings.adaptive_retrieval:
+        limit *= retrieval.OVERFETCH
+    with tracing.span("query_cortex", limit=limit) as s:
+        results = backend.search(settings.service, query, all_columns, filter or {}, limit)
+        if settings.adaptive_retrieval:
+            fetched = len(results)
+            results, _ = retrieval.select(results, query, search_col, settings.num_retrieved_chunks)
+            s.set(fetched=fetched)
+        context = make_context(results, search_col)
+        s.set(chunks=len(results), context_tokens=tracing.estimate_tokens(context))
+    return context, results
+
+
+def answer_prompt(chat_text, context, question):
+    return f"""
+    [INST]
+    You are SS IntelliGuide, a helpful AI assistant with access to APT PDF-based knowledge.
+    Use the provided <context> and <chat_history> to answer user questions.
+    Respond clearly, briefly, and helpfully.
+
+    <chat_history>{chat_text}</chat_history>
+    <context>{context}</context>
+    <question>{question}</question>
+    [/INST]
+    Answer:
+    """
+
+
+def build_prompt(backend, settings, question, messages=()):
+    """Rewrite the question with history, retrieve context and build the answer prompt.
+
+    Returns ``(prompt, context, results)``.
+    """
+    with tracing.span("build_prompt"):
+        return _build_prompt(backend, settings, question, messages)
+
+
+def _build_prompt(backend, settings, question, messages):
+    history = chat_history(list(messages), settings)
+    chat_text = "\n".join([msg["content"] for msg in history if msg["role"] == "user"])
+    rewrite_model = settings.rewrite_model or settings.model_name
+    summary = summarize_chat(backend, rewrite_model, chat_text, question) if history else question
+    context, results = query_cortex(backend, settings, summary, filter=settings.search_filter)
+    if settings.search_filter and not results:
+        # The filtered brochures may not be in this service; an unfiltered answer beats none.
+        context, results = query_cortex(backend, settings, summary)
+    prompt = answer_prompt(chat_text, context, question)
+    tracing.annotate(prompt_tokens=tracing.estimate_tokens(prompt))
+    return prompt, context, results
+
+
+def answer(backend, settings, question, messages=()):
+    prompt, _, _ = build_prompt(backend, settings, question, messages)
+    return complete(backend, settings.model_name, prompt)
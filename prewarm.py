@@ -0,0 +1,166 @@
+"""Precomputed answers for the featured "Try asking" questions.
+
+``warm`` answers every question in ``featured_questions.json`` and stores
+the reply with a fingerprint of the chunks it was built from. The chat
+serves a stored answer straight away when a question matches a featured
+one exactly or nearly, then re-checks the retrieval in the background and
+recomputes the answer if the underlying chunks have changed.
+
+    python prewarm.py           # after a re-index
+    python prewarm.py --fake    # dry run against the benchmark fakes
+"""
+
+import argparse
+import difflib
+import hashlib
+import json
+import os
+import threading
+import time
+
+import pipeline
+import resilience
+import routing
+import singleflight
+import tracing
+
+FEATURED_QUESTIONS_FILE = "featured_questions.json"
+PREWARMED_FILE = "prewarmed_answers.json"
+NEAR_MATCH_RATIO = 0.9
+REFRESH_INTERVAL_S = 600
+# Cortex Search picks up new chunks within its one-minute TARGET_LAG.
+REINDEX_SETTLE_S = 90
+
+_lock = threading.Lock()
+_refreshing = set()
+
+
+def featured_questions(path=FEATURED_QUESTIONS_FILE):
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def load_answers(path=PREWARMED_FILE):
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _save_answers(answers, path=PREWARMED_FILE):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(answers, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def _store(key, entry, path=PREWARMED_FILE):
+    with _lock:
+        answers = load_answers(path)
+        answers[key] = entry
+        _save_answers(answers, path)
+
+
+def answer_key(service, question):
+    return f"{service}|{singleflight.normalize(question).rstrip('?')}"
+
+
+def fingerprint(results):
+    digest = hashlib.sha1()
+    for r in results:
+        digest.update(json.dumps(r, sort_keys=True, default=str).encode())
+    return digest.hexdigest()
+
+
+def warm_one(backend, settings, question, path=PREWARMED_FILE):
+    with tracing.span("prewarm", question=question[:60]):
+        prompt, context, results = pipeline.build_prompt(backend, settings, question)
+        reply, model = routing.routed_complete(backend, settings.model_name, question, prompt)
+    entry = {
+        "question": question,
+        "answer": reply,
+        "model": model,
+        "fingerprint": fingerprint(results),
+        "created_at": time.time(),
+        "checked_at": time.time(),
+    }
+    _store(answer_key(settings.service, question), entry, path)
+    return entry
+
+
+def warm(backend, settings, questions=None, path=PREWARMED_FILE):
+    questions = questions if questions is not None else [q["question"] for q in featured_questions()]
+    return [warm_one(backend, settings, q, path) for q in questions]
+
+
+def warm_in_background(backend, settings, delay_s=REINDEX_SETTLE_S):
+    """Re-warm every featured question once a re-index has had time to land."""
+    def run():
+        time.sleep(delay_s)
+        with tracing.trace("prewarm_all"):
+            warm(backend, settings)
+
+    threading.Thread(target=run, daemon=True, name="prewarm").start()
+
+
+def lookup(service, question, path=PREWARMED_FILE, min_ratio=NEAR_MATCH_RATIO):
+    """Stored entry for an exact or near match of ``question``, or None."""
+    answers = load_answers(path)
+    key = answer_key(service, question)
+    if key in answers:
+        return answers[key]
+    prefix = f"{service}|"
+    candidates = {k[len(prefix):]: k for k in answers if k.startswith(prefix)}
+    match = difflib.get_close_matches(key[len(prefix):], list(candidates), n=1, cutoff=min_ratio)
+    return answers[candidates[match[0]]] if match else None
+
+
+def refresh_in_background(backend, settings, entry, path=PREWARMED_FILE, interval_s=REFRESH_INTERVAL_S):
+    """Recompute ``entry`` in a background thread if its chunks changed since it was built."""
+    key = answer_key(settings.service, entry["question"])
+    with _lock:
+        if key in _refreshing or time.time() - entry.get("checked_at", 0) < interval_s:
+            return
+        _refreshing.add(key)
+
+    def run():
+        try:
+            with tracing.trace("prewarm_refresh", question=entry["question"][:60]):
+                _, results = pipeline.query_cortex(backend, settings, entry["question"])
+                if fingerprint(results) != entry["fingerprint"]:
+                    warm_one(backend, settings, entry["question"], path)
+                else:
+                    _store(key, {**entry, "checked_at": time.time()}, path)
+        finally:
+            with _lock:
+                _refreshing.discard(key)
+
+    threading.Thread(target=run, daemon=True, name="prewarm-refresh").start()
+
+
+def main(argv=None):
+    import batch_qa
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--model", default=routing.AUTO_MODEL)
+    parser.add_argument("--service", default=batch_qa.DEFAULT_SERVICE)
+    parser.add_argument("--chunks", type=int, default=18)
+    parser.add_argument("--secrets", default=batch_qa.SECRETS_FILE)
+    parser.add_argument("--fake", action="store_true", help="use the local benchmark fakes instead of Snowflake")
+    args = parser.parse_args(argv)
+
+    if args.fake:
+        from benchmarks.fakes import FakeBackend
+        backend = FakeBackend()
+    else:
+        backend = batch_qa.cortex_backend(args.secrets)
+    settings = pipeline.ChatSettings(model_name=args.model, service=args.service,
+                                     num_retrieved_chunks=args.chunks, use_chat_history=False)
+    for entry in warm(resilience.ResilientBackend(backend, fallback_model=None), settings):
+        print(f"✅ {entry['model']:>15}  {entry['question']}")
+
+
+if __name__ == "__main__":
+    main()
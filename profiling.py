@@ -0,0 +1,214 @@
+"""Profile one Streamlit rerun: where a slow page spent its time.
+
+``profile_rerun`` wraps a page's ``main()``; when disabled it does nothing
+but yield None, so the hook can stay in place. When enabled it runs two
+profilers on the script thread at once:
+
+* ``cProfile`` for exact call counts, own time and cumulative time per
+  function (the sidebar tables), saved as ``.prof`` for ``snakeviz`` or
+  ``python -m pstats``;
+* a sampler that reads the script thread's stack every
+  ``SAMPLE_INTERVAL_S`` and saves it as collapsed stacks (``.folded``, one
+  ``root;caller;callee count`` line per stack) for ``flamegraph.pl`` or
+  speedscope.
+
+Only one ``cProfile`` can be active per process, so while another session
+is profiling a rerun gets the sampler alone.
+
+    python profiling.py profiles/home-20260101-120000.prof   # top functions of a saved profile
+"""
+
+import argparse
+import cProfile
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+
+PROFILE_DIR = os.environ.get("INTELLIGUIDE_PROFILE_DIR", "profiles")
+SAMPLE_INTERVAL_S = 0.005
+MAX_STACK_DEPTH = 128
+TOP_N = 15
+KEEP_FILES = 40  # newest .prof/.folded pairs kept in PROFILE_DIR
+
+
+@dataclass
+class RerunProfile:
+    name: str
+    wall_ms: float = 0.0
+    samples: int = 0
+    hotspots: list = field(default_factory=list)  # rows by own time
+    cumulative: list = field(default_factory=list)  # rows by cumulative time
+    prof_path: str = None
+    folded_path: str = None
+    note: str = ""
+
+
+def frame_label(code):
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class StackSampler:
+    """Counts the stacks of one thread, sampled from a background thread."""
+
+    def __init__(self, thread_id, base_depth=0, interval_s=SAMPLE_INTERVAL_S):
+        self.thread_id = thread_id
+        self.base_depth = base_depth  # outer frames (the Streamlit runner) left off every stack
+        self.interval_s = interval_s
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="rerun-sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval_s):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(frame.f_code)
+                frame = frame.f_back
+            stack.reverse()
+            stack = stack[self.base_depth:self.base_depth + MAX_STACK_DEPTH]
+            if stack:
+                self.stacks[";".join(frame_label(code) for code in stack)] += 1
+
+    def folded(self):
+        return "".join(f"{stack} {n}\n" for stack, n in self.stacks.most_common())
+
+
+def _depth(frame):
+    depth = 0
+    while frame is not None:
+        depth += 1
+        frame = frame.f_back
+    return depth
+
+
+def stat_rows(stats, sort, limit=TOP_N):
+    """Top ``limit`` functions of a ``pstats.Stats`` by ``"tottime"`` or ``"cumtime"``."""
+    rows = []
+    for (file, line, func), (_, calls, tottime, cumtime, _) in stats.stats.items():
+        where = f"{os.path.basename(file)}:{line}" if line else "built-in"
+        rows.append({"function": func, "where": where, "calls": calls,
+                     "own ms": round(tottime * 1000, 2), "cumulative ms": round(cumtime * 1000, 2)})
+    key = "own ms" if sort == "tottime" else "cumulative ms"
+    return sorted(rows, key=lambda r: r[key], reverse=True)[:limit]
+
+
+def _mtime(path):
+    try:
+        return os.path.getmtime(path)
+    except FileNotFoundError:
+        return 0.0
+
+
+def _prune(profile_dir, keep=KEEP_FILES):
+    # Several sessions or workers can prune at once; a file another one removed is already gone.
+    files = sorted((os.path.join(profile_dir, f) for f in os.listdir(profile_dir)), key=_mtime)
+    for path in files[:-2 * keep]:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+class RerunProfiler:
+    """Both profilers for one rerun; ``profile_rerun`` starts and stops it around the page."""
+
+    def __init__(self, name, profile_dir=PROFILE_DIR):
+        self.result = RerunProfile(name)
+        self.profile_dir = profile_dir
+        self._profiler = None
+        self._sampler = None
+        self._start = None
+
+    def start(self, frame=None):
+        # Leave off the frames outside the caller's, so stacks start at the page's own code.
+        frame = frame or sys._getframe(1)
+        self._sampler = StackSampler(threading.get_ident(), base_depth=_depth(frame) - 1)
+        self._profiler = cProfile.Profile()
+        try:
+            self._profiler.enable()
+        except ValueError:
+            self._profiler = None
+            self.result.note = "Another rerun is being profiled; showing samples only."
+        self._sampler.start()
+        self._start = time.perf_counter()
+        return self
+
+    def stop(self):
+        """Stop both profilers, save the files and return the ``RerunProfile``."""
+        result = self.result
+        result.wall_ms = (time.perf_counter() - self._start) * 1000
+        if self._profiler is not None:
+            self._profiler.disable()
+        self._sampler.stop()
+        result.samples = sum(self._sampler.stacks.values())
+        os.makedirs(self.profile_dir, exist_ok=True)
+        stem = os.path.join(self.profile_dir, f"{result.name}-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}")
+        result.folded_path = stem + ".folded"
+        with open(result.folded_path, "w", encoding="utf-8") as f:
+            f.write(self._sampler.folded())
+        if self._profiler is not None:
+            stats = pstats.Stats(self._profiler, stream=io.StringIO())
+            result.hotspots = stat_rows(stats, "tottime")
+            result.cumulative = stat_rows(stats, "cumtime")
+            result.prof_path = stem + ".prof"
+            stats.dump_stats(result.prof_path)
+        _prune(self.profile_dir)
+        return result
+
+
+@contextmanager
+def profile_rerun(name, enabled=True, profile_dir=PROFILE_DIR):
+    """Profile the enclosed block; yields a ``RerunProfile`` filled in on exit, or None when disabled."""
+    if not enabled:
+        yield None
+        return
+    profiler = RerunProfiler(name, profile_dir).start(sys._getframe(2))
+    try:
+        yield profiler.result
+    finally:
+        profiler.stop()
+
+
+def show_profile(profile, container):
+    """Hotspots of a profiled rerun in a Streamlit ``container`` such as ``st.sidebar``; nothing for None."""
+    if profile is None:
+        return
+    panel = container.expander(f"🔬 Rerun Profile · {profile.wall_ms:.0f} ms", expanded=True)
+    if profile.note:
+        panel.caption(profile.note)
+    panel.markdown("**Hotspots** (own time)")
+    panel.dataframe(profile.hotspots, hide_index=True)
+    panel.markdown("**Cumulative**")
+    panel.dataframe(profile.cumulative, hide_index=True)
+    panel.caption(f"{profile.samples} stack samples · {profile.prof_path or ''} {profile.folded_path}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("path", help="a .prof file saved by profile_rerun")
+    parser.add_argument("--sort", choices=["tottime", "cumtime"], default="cumtime")
+    parser.add_argument("--limit", type=int, default=25)
+    args = parser.parse_args(argv)
+
+    rows = stat_rows(pstats.Stats(args.path, stream=io.StringIO()), args.sort, args.limit)
+    print(f"{'calls':>8} {'own ms':>9} {'cum ms':>9}  function")
+    for r in rows:
+        print(f"{r['calls']:>8} {r['own ms']:>9.2f} {r['cumulative ms']:>9.2f}  {r['function']} ({r['where']})")
+
+
+if __name__ == "__main__":
+    main()
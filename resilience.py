@@ -0,0 +1,342 @@
+"""Deadlines, hedging, retries and circuit breaking for remote Cortex calls.
+
+Every ``complete`` and ``search`` runs on a worker thread so the caller can
+give up at a deadline instead of waiting on a stalled request forever. A
+call still running after the observed p95 latency for its op gets one
+duplicate (a hedge) and the first reply wins. Failed attempts are retried
+with full-jitter exponential backoff while the deadline allows it.
+
+Consecutive failures open a per-op circuit breaker, after which calls fail
+fast until a trial call succeeds. ``ResilientBackend`` then degrades: a
+completion falls back to ``FALLBACK_MODEL`` within what is left of its
+deadline and a search to the last good results for the same query. When
+nothing is left it raises ``Unavailable``, an ``AdmissionError`` whose
+message is safe to show to users; the chat then serves a prewarmed answer
+if one matches.
+
+A call abandoned at its deadline, or a hedge that lost, gives its
+scheduler slot back at once but keeps its worker until the remote call
+returns, so ``CALL_WORKERS`` bounds how many stalled calls can pile up.
+"""
+
+import contextvars
+import os
+import random
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import routing
+import scheduler
+import singleflight
+import tracing
+
+SEARCH_DEADLINE_S = float(os.environ.get("INTELLIGUIDE_SEARCH_DEADLINE_S", 15))
+COMPLETE_DEADLINE_S = float(os.environ.get("INTELLIGUIDE_COMPLETE_DEADLINE_S", 45))
+MAX_ATTEMPTS = 3
+BACKOFF_BASE_S = 0.2
+BACKOFF_MAX_S = 2.0
+HEDGE_PERCENTILE = 95
+HEDGE_MIN_SAMPLES = 20  # no hedging until an op has this many latencies to go on
+LATENCY_WINDOW = 200
+BREAKER_FAILURES = 5
+BREAKER_RESET_S = 30
+CALL_WORKERS = int(os.environ.get("INTELLIGUIDE_CALL_WORKERS", 64))
+FALLBACK_MODEL = routing.SMALL_MODEL
+STALE_SEARCHES = 256
+
+CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+_STATE_VALUE = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+_breaker_state = tracing.METRICS.gauge("intelliguide_breaker_state", "Circuit breaker state (0 closed, 1 half open, 2 open)")
+_attempts = tracing.METRICS.counter("intelliguide_call_attempts_total", "Remote call attempts by op and outcome")
+_hedges = tracing.METRICS.counter("intelliguide_hedges_total", "Hedged duplicate requests by op")
+_fallbacks = tracing.METRICS.counter("intelliguide_fallbacks_total", "Degraded replies by op and source")
+
+
+class Unavailable(scheduler.AdmissionError):
+    pass
+
+
+class CallTimedOut(Unavailable):
+    pass
+
+
+class CircuitOpen(Unavailable):
+    pass
+
+
+def is_retryable(error):
+    """Remote and transport errors are worth another attempt; admission and programming errors are not."""
+    return not isinstance(error, (scheduler.AdmissionError, ValueError, TypeError, KeyError))
+
+
+class _DegradedReply(str):
+    degraded = True
+    model = None  # the fallback model that wrote it
+
+
+class _DegradedResults(list):
+    degraded = True
+
+
+def degraded(value, model=None):
+    """Mark a fallback reply or stale results so caches pass them through without storing them."""
+    if not isinstance(value, str):
+        return _DegradedResults(value)
+    reply = _DegradedReply(value)
+    reply.model = model
+    return reply
+
+
+def is_degraded(value):
+    return getattr(value, "degraded", False)
+
+
+def backoff(attempt, base=BACKOFF_BASE_S, cap=BACKOFF_MAX_S, rng=random):
+    """Full jitter: a uniform delay up to the capped exponential backoff."""
+    return rng.uniform(0, min(cap, base * 2 ** attempt))
+
+
+class LatencyTracker:
+    """Rolling window of successful call latencies per op."""
+
+    def __init__(self, window=LATENCY_WINDOW, min_samples=HEDGE_MIN_SAMPLES):
+        self.window = window
+        self.min_samples = min_samples
+        self._lock = threading.Lock()
+        self._samples = {}
+
+    def observe(self, op, seconds):
+        with self._lock:
+            self._samples.setdefault(op, deque(maxlen=self.window)).append(seconds)
+
+    def percentile(self, op, pct):
+        """Latency in seconds at ``pct``, or None until ``min_samples`` calls have been seen."""
+        with self._lock:
+            samples = sorted(self._samples.get(op, ()))
+        if len(samples) < self.min_samples:
+            return None
+        return samples[min(len(samples) - 1, int(len(samples) * pct / 100))]
+
+
+class CircuitBreaker:
+    """Opens after ``failures`` consecutive failures; lets one trial call through after ``reset_s``."""
+
+    def __init__(self, name, failures=BREAKER_FAILURES, reset_s=BREAKER_RESET_S):
+        self.name = name
+        self.failures = failures
+        self.reset_s = reset_s
+        self.state = CLOSED
+        self.consecutive = 0
+        self.opened_at = 0.0
+        self._trial = False
+        self._lock = threading.Lock()
+
+    def _set(self, state):
+        self.state = state
+        _breaker_state.set(_STATE_VALUE[state], op=self.name)
+
+    def allow(self):
+        with self._lock:
+            if self.state == OPEN and time.monotonic() - self.opened_at >= self.reset_s:
+                self._set(HALF_OPEN)
+            if self.state == CLOSED:
+                return True
+            if self.state == HALF_OPEN and not self._trial:
+                self._trial = True
+                return True
+            return False
+
+    def success(self):
+        with self._lock:
+            self.consecutive = 0
+            self._trial = False
+            if self.state != CLOSED:
+                self._set(CLOSED)
+
+    def skip(self):
+        """The call never reached the remote, so let another trial through."""
+        with self._lock:
+            self._trial = False
+
+    def failure(self):
+        with self._lock:
+            self.consecutive += 1
+            self._trial = False
+            if self.state == HALF_OPEN or self.consecutive >= self.failures:
+                self.opened_at = time.monotonic()
+                self._set(OPEN)
+
+
+class CallGuard:
+    """Latency history, breakers and worker threads shared by every session in the process."""
+
+    def __init__(self, max_attempts=MAX_ATTEMPTS, hedge_percentile=HEDGE_PERCENTILE,
+                 breaker_failures=BREAKER_FAILURES, breaker_reset_s=BREAKER_RESET_S,
+                 workers=CALL_WORKERS, latency=None, rng=None):
+        self.max_attempts = max_attempts
+        self.hedge_percentile = hedge_percentile
+        self.breaker_failures = breaker_failures
+        self.breaker_reset_s = breaker_reset_s
+        self.latency = latency or LatencyTracker()
+        self.rng = rng or random.Random()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="cortex-call")
+        self._lock = threading.Lock()
+        self._breakers = {}
+
+    def breaker(self, op):
+        with self._lock:
+            if op not in self._breakers:
+                self._breakers[op] = CircuitBreaker(op, self.breaker_failures, self.breaker_reset_s)
+            return self._breakers[op]
+
+    def _submit(self, op, fn):
+        claim = scheduler.Claim()
+
+        def timed():
+            start = time.monotonic()
+            result = claim.run(fn)
+            self.latency.observe(op, time.monotonic() - start)
+            return result
+
+        # Run in a copy of the caller's context so spans and annotations land in its trace.
+        future = self._executor.submit(contextvars.copy_context().run, timed)
+        future.claim = claim
+        return future
+
+    def _hedged(self, op, fn, deadline, hedge):
+        futures = {self._submit(op, fn)}
+        try:
+            delay = self.latency.percentile(op, self.hedge_percentile) if hedge else None
+            if delay is not None and delay < deadline - time.monotonic():
+                done, _ = wait(futures, timeout=delay)
+                if not done:
+                    futures.add(self._submit(op, fn))
+                    _hedges.inc(op=op)
+                    tracing.annotate(hedged=True)
+            error = None
+            while futures:
+                done, futures = wait(futures, timeout=max(0.0, deadline - time.monotonic()),
+                                     return_when=FIRST_COMPLETED)
+                if not done:
+                    raise CallTimedOut("SS IntelliGuide is taking too long to answer. Please try again.")
+                for future in done:
+                    if future.exception() is None:
+                        return future.result()
+                    error = future.exception()
+            raise error
+        finally:
+            # Calls still running lost the race or passed the deadline: free their slots for other callers.
+            for future in futures:
+                future.cancel()
+                future.claim.abandon()
+
+    def call(self, op, fn, deadline_s, hedge=True):
+        """Run ``fn()`` within ``deadline_s`` with hedging, retries and the breaker for ``op``."""
+        deadline = time.monotonic() + deadline_s
+        breaker = self.breaker(op)
+        for attempt in range(self.max_attempts):
+            if not breaker.allow():
+                _attempts.inc(op=op, outcome="rejected")
+                raise CircuitOpen("SS IntelliGuide cannot reach Cortex right now. Please try again shortly.")
+            try:
+                result = self._hedged(op, fn, deadline, hedge)
+            except CallTimedOut:
+                breaker.failure()
+                _attempts.inc(op=op, outcome="timeout")
+                raise
+            except scheduler.AdmissionError:
+                # Shed or timed out in our own queue: not the remote's fault.
+                breaker.skip()
+                _attempts.inc(op=op, outcome="rejected")
+                raise
+            except Exception as e:
+                breaker.failure()
+                _attempts.inc(op=op, outcome="error")
+                if not is_retryable(e):
+                    raise
+                delay = backoff(attempt, rng=self.rng)
+                if attempt + 1 == self.max_attempts or time.monotonic() + delay >= deadline:
+                    raise Unavailable("SS IntelliGuide could not get an answer from Cortex. Please try again.") from e
+                tracing.annotate(retries=attempt + 1)
+                time.sleep(delay)
+                continue
+            breaker.success()
+            _attempts.inc(op=op, outcome="ok")
+            return result
+
+
+GUARD = CallGuard()
+
+
+class _LRU:
+    def __init__(self, size):
+        self.size = size
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key in self._items:
+                self._items.move_to_end(key)
+            return self._items.get(key)
+
+    def put(self, key, value):
+        with self._lock:
+            self._items[key] = list(value)
+            self._items.move_to_end(key)
+            while len(self._items) > self.size:
+                self._items.popitem(last=False)
+
+
+_stale_searches = _LRU(STALE_SEARCHES)
+
+
+class ResilientBackend:
+    """Backend wrapper that bounds, hedges and retries every call and degrades when a path is failing.
+
+    ``fallback_model`` answers when the requested model's breaker is open or
+    its call fails; pass None where the reply must come from the requested
+    model (batch answers and prewarming record which model wrote them).
+    """
+
+    def __init__(self, backend, guard=GUARD, search_deadline_s=SEARCH_DEADLINE_S,
+                 complete_deadline_s=COMPLETE_DEADLINE_S, fallback_model=FALLBACK_MODEL):
+        self.backend = backend
+        self.guard = guard
+        self.search_deadline_s = search_deadline_s
+        self.complete_deadline_s = complete_deadline_s
+        self.fallback_model = fallback_model
+
+    def complete(self, model, prompt):
+        # One deadline for the whole turn: the fallback only gets what the requested model left of it.
+        deadline = time.monotonic() + self.complete_deadline_s
+        try:
+            return self.guard.call(f"complete:{model}", lambda: self.backend.complete(model, prompt),
+                                   self.complete_deadline_s)
+        except Unavailable as e:
+            if self.fallback_model in (None, model) or time.monotonic() >= deadline:
+                raise
+            tracing.annotate(fallback_model=self.fallback_model, fallback_reason=type(e).__name__)
+        _fallbacks.inc(op="complete", source=self.fallback_model)
+        return degraded(self.guard.call(f"complete:{self.fallback_model}",
+                                        lambda: self.backend.complete(self.fallback_model, prompt),
+                                        deadline - time.monotonic()), model=self.fallback_model)
+
+    def search(self, service, query, columns, filter, limit):
+        key = (service, singleflight.normalize(query), tuple(sorted(columns)), repr(filter), limit)
+        try:
+            results = self.guard.call("search", lambda: self.backend.search(service, query, columns, filter, limit),
+                                      self.search_deadline_s)
+        except Unavailable:
+            stale = _stale_searches.get(key)
+            if stale is None:
+                raise
+            tracing.annotate(fallback="stale_search")
+            _fallbacks.inc(op="search", source="stale")
+            return degraded(stale)
+        _stale_searches.put(key, results)
+        return results
+
@@ -0,0 +1,94 @@
+"""Cheap local re-ranking of Cortex Search results."""
+
+import re
+
+STOPWORDS = frozenset("""
+a an and are as at be by can do does for from how i in is it of on or our the this to
+we what when where which who will with you your tour trip
+""".split())
+
+
+def terms(text):
+    return [t for t in re.findall(r"[a-z0-9]+", text.lower()) if t not in STOPWORDS]
+
+
+def chunk_text(result, search_col):
+    return next((v for k, v in result.items() if k.lower() == search_col.lower()), "") or ""
+
+
+def lexical_score(query_terms, text_terms):
+    """Fraction of the query's terms that appear in the text."""
+    if not query_terms:
+        return 0.0
+    return len(query_terms & text_terms) / len(query_terms)
+
+
+def rerank(results, query, search_col, limit=None):
+    """Order results by lexical overlap with ``query``; ties keep the search order."""
+    query_terms = set(terms(query))
+    scored = sorted(
+        enumerate(results),
+        key=lambda ir: (-lexical_score(query_terms, set(terms(chunk_text(ir[1], search_col)))), ir[0]),
+    )
+    ranked = [r for _, r in scored]
+    return ranked[:limit] if limit is not None else ranked
+
+
+# Adaptive retrieval depth: over-fetch, re-score, cut where relevance falls off.
+OVERFETCH = 3
+MIN_CHUNKS = 3
+SCORE_GAP = 0.2  # stop at the first chunk scoring this far below the best one
+CUMULATIVE_RELEVANCE = 0.7  # or once the kept chunks hold this share of the top candidates' relevance
+DIVERSITY_DECAY = 0.9  # each further chunk from the same brochure scores this much less
+SEMANTIC_WEIGHT = 0.4
+
+
+def semantic_score(result, rank, total):
+    """Search similarity if the service returned one, otherwise a prior from the search rank."""
+    scores = result.get("@scores") or {}
+    if "cosine_similarity" in scores:
+        return float(scores["cosine_similarity"])
+    return 1.0 - rank / max(total, 1)
+
+
+def select(results, query, search_col, max_chunks, min_chunks=MIN_CHUNKS, gap=SCORE_GAP,
+           cumulative=CUMULATIVE_RELEVANCE, diversity=DIVERSITY_DECAY):
+    """Pick the chunks worth sending from an over-fetched candidate list.
+
+    Candidates are scored by search similarity and lexical overlap with
+    ``query``, then taken greedily with a per-brochure diversity penalty.
+    Selection stops at ``max_chunks``, or after ``min_chunks`` once the next
+    score falls ``gap`` below the best one or the kept chunks carry
+    ``cumulative`` of the relevance (score above the weakest candidate's)
+    of the best ``max_chunks``. Returns ``(selected, scores)``.
+    """
+    if not results:
+        return [], []
+    query_terms = set(terms(query))
+    base = [
+        SEMANTIC_WEIGHT * semantic_score(r, i, len(results))
+        + (1 - SEMANTIC_WEIGHT) * lexical_score(query_terms, set(terms(chunk_text(r, search_col))))
+        for i, r in enumerate(results)
+    ]
+    floor, top = min(base), max(base)
+    relevance = [b - floor for b in base]
+    budget = sum(sorted(relevance, reverse=True)[:max_chunks]) or 1.0
+    remaining = list(range(len(results)))
+    per_file = {}
+    selected, scores, kept_relevance = [], [], 0.0
+
+    def adjusted(i):
+        return base[i] * diversity ** per_file.get(results[i].get("relative_path"), 0)
+
+    while remaining and len(selected) < max_chunks:
+        best = max(remaining, key=lambda i: (adjusted(i), -i))
+        score = adjusted(best)
+        if len(selected) >= min_chunks and (score < top * (1 - gap) or kept_relevance >= cumulative * budget):
+            break
+        remaining.remove(best)
+        selected.append(results[best])
+        scores.append(score)
+        kept_relevance += relevance[best]
+        path = results[best].get("relative_path")
+        per_file[path] = per_file.get(path, 0) + 1
+    return selected, scores
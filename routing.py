@@ -0,0 +1,101 @@
+"""Route chat work across ``MODELS`` by task weight.
+
+When the sidebar model is ``AUTO_MODEL`` the query rewrite and short factual
+lookups go to ``SMALL_MODEL``; anything that needs synthesis goes to
+``LARGE_MODEL``. A small-model answer that looks unsure (refusals, "not in
+the context", near-empty replies) is escalated to the large model.
+"""
+
+import re
+
+import pipeline
+import tracing
+
+AUTO_MODEL = "auto"
+SMALL_MODEL = "llama3.1-8b"
+LARGE_MODEL = "mistral-large2"
+
+# Cortex credits per million tokens, used for cost estimates.
+MODEL_CREDITS_PER_MTOK = {
+    "mistral-large2": 1.95,
+    "llama3.1-70b": 1.21,
+    "llama3.1-8b": 0.19,
+}
+
+SYNTHESIS_PATTERNS = [
+    r"\bcompar", r"\bdifferen", r"\bvs\.?\b", r"\bversus\b", r"\brecommend", r"\bsuggest",
+    r"\bbest\b", r"\bplan\b", r"\bwhy\b", r"\bexplain", r"\bsummar", r"\bdescribe",
+    r"\bitinerary\b", r"\bpros\b", r"\bcons\b", r"\bshould\b", r"\bhighlights\b",
+]
+LOOKUP_PATTERNS = [
+    r"^(what|which) (is|are) the (price|cost|date|code|duration|length)", r"\bhow (much|many|long)\b",
+    r"^(when|where)\b", r"^(is|are|does|do|can) ", r"\bprice\b", r"\bcost\b", r"\btrip code\b",
+    r"\b[A-Z]{3,}\d{1,3}\b", r"\bdeparts?\b", r"\bstart date\b", r"\bincluded\b",
+]
+LOW_CONFIDENCE_PATTERNS = [
+    r"\bi (do not|don't) know\b", r"\bnot (mentioned|provided|specified|available|included) in\b",
+    r"\bno (information|details|mention)\b", r"\b(does|do) not (provide|contain|mention|specify)\b",
+    r"\bunable to (find|determine|answer)\b", r"\bcannot (find|determine|answer)\b",
+    r"\bcould not find\b", r"\bnot sure\b",
+]
+_synthesis = [re.compile(p, re.I) for p in SYNTHESIS_PATTERNS]
+_lookup = [re.compile(p) if "[A-Z]" in p else re.compile(p, re.I) for p in LOOKUP_PATTERNS]
+_low_confidence = [re.compile(p, re.I) for p in LOW_CONFIDENCE_PATTERNS]
+
+MIN_CONFIDENT_WORDS = 4
+MAX_LOOKUP_WORDS = 18
+
+
+def classify(question):
+    """Return ``("lookup" | "synthesis", confidence)`` for a user question."""
+    q = question.strip()
+    words = len(q.split())
+    synthesis = sum(1 for p in _synthesis if p.search(q))
+    lookup = sum(1 for p in _lookup if p.search(q))
+    # Several questions in one message or a long message need the large model.
+    if q.count("?") > 1 or words > MAX_LOOKUP_WORDS:
+        synthesis += 1
+    if lookup > synthesis:
+        return "lookup", lookup / (lookup + synthesis)
+    if synthesis:
+        return "synthesis", synthesis / (lookup + synthesis)
+    return "synthesis", 0.5
+
+
+def is_low_confidence(reply):
+    if len(reply.split()) < MIN_CONFIDENT_WORDS:
+        return True
+    return any(p.search(reply) for p in _low_confidence)
+
+
+def resolve(model_name, task):
+    """Model for a task (``"rewrite"``, ``"lookup"`` or ``"synthesis"``) given the sidebar choice."""
+    if model_name != AUTO_MODEL:
+        return model_name
+    return SMALL_MODEL if task in ("rewrite", "lookup") else LARGE_MODEL
+
+
+def model_for(model_name, question, min_confidence=0.6):
+    task, confidence = classify(question)
+    if task == "lookup" and confidence < min_confidence:
+        task = "synthesis"
+    return resolve(model_name, task)
+
+
+def routed_complete(backend, model_name, question, prompt, stage="complete"):
+    """Complete ``prompt`` with the routed model, escalating unsure small-model replies.
+
+    Returns ``(reply, model_used)``; ``model_used`` is the fallback model when
+    the resilience layer answered with it.
+    """
+    model = model_for(model_name, question)
+    reply, model_used = pipeline.complete_with_model(backend, model, prompt, stage=stage)
+    if model_name == AUTO_MODEL and model != LARGE_MODEL and is_low_confidence(reply):
+        tracing.annotate(escalated_from=model)
+        reply, model_used = pipeline.complete_with_model(backend, LARGE_MODEL, prompt, stage=f"{stage}_escalated")
+    return reply, model_used
+
+
+def estimate_credits(model, prompt, reply=""):
+    tokens = tracing.estimate_tokens(prompt) + tracing.estimate_tokens(reply)
+    return tokens / 1_000_000 * MODEL_CREDITS_PER_MTOK.get(model, MODEL_CREDITS_PER_MTOK[LARGE_MODEL])
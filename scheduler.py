@@ -0,0 +1,230 @@
+"""Admission control for Cortex calls shared by every session in the process.
+
+Each model (and Cortex Search) gets a fixed number of concurrent slots.
+Callers that find no free slot wait in a per-session FIFO queue and slots
+are handed out round-robin across sessions, so one busy session cannot
+starve the others. A request that would make the queue too deep is shed
+immediately with ``Overloaded``; one still waiting at its deadline gives up
+with ``DeadlineExceeded``.
+
+A caller that stops waiting for a call (a losing hedge, a call past its
+deadline) runs it under a ``Claim`` and abandons the claim, which hands the
+call's slot back at once instead of when the remote call finally returns.
+"""
+
+import contextvars
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+
+import tracing
+
+MODEL_CONCURRENCY = {
+    "mistral-large2": 4,
+    "llama3.1-70b": 6,
+    "llama3.1-8b": 12,
+}
+DEFAULT_MODEL_CONCURRENCY = 4
+SEARCH_CONCURRENCY = 16
+MAX_QUEUE_DEPTH = int(os.environ.get("INTELLIGUIDE_MAX_QUEUE_DEPTH", 32))
+# No longer than resilience.COMPLETE_DEADLINE_S: a call still queued after the caller gave up is wasted.
+DEFAULT_DEADLINE_S = float(os.environ.get("INTELLIGUIDE_DEADLINE_S", 45))
+
+_queue_depth = tracing.METRICS.gauge("intelliguide_queue_depth", "Requests waiting for a Cortex slot")
+_in_use = tracing.METRICS.gauge("intelliguide_slots_in_use", "Cortex slots currently held")
+_wait_seconds = tracing.METRICS.histogram("intelliguide_queue_wait_seconds", "Time spent waiting for a Cortex slot")
+_rejected = tracing.METRICS.counter("intelliguide_admission_rejected_total", "Requests shed or timed out in the queue")
+
+
+class AdmissionError(Exception):
+    """The request was not admitted; the message is safe to show to users."""
+
+
+class Overloaded(AdmissionError):
+    pass
+
+
+class DeadlineExceeded(AdmissionError):
+    pass
+
+
+class Claim:
+    """The slots taken by one call run through ``Claim.run``; ``abandon`` releases them early."""
+
+    def __init__(self):
+        self.abandoned = False
+        self._held = []  # (scheduler, resource name)
+        self._lock = threading.Lock()
+
+    def run(self, fn):
+        token = _claim.set(self)
+        try:
+            return fn()
+        finally:
+            _claim.reset(token)
+
+    def hold(self, scheduler, name):
+        """Record a slot just acquired; False if the claim was already abandoned."""
+        with self._lock:
+            if not self.abandoned:
+                self._held.append((scheduler, name))
+            return not self.abandoned
+
+    def drop(self, scheduler, name):
+        """Forget a slot about to be released; False if ``abandon`` already released it."""
+        with self._lock:
+            if (scheduler, name) in self._held:
+                self._held.remove((scheduler, name))
+                return True
+            return False
+
+    def abandon(self):
+        with self._lock:
+            self.abandoned = True
+            held, self._held = self._held, []
+        for scheduler, name in held:
+            scheduler.release(name)
+
+
+_claim = contextvars.ContextVar("scheduler_claim", default=None)
+
+
+class _Waiter:
+    def __init__(self):
+        self.granted = threading.Event()
+
+
+class _Resource:
+    def __init__(self, name, capacity):
+        self.name = name
+        self.capacity = capacity
+        self.active = 0
+        self.queues = OrderedDict()  # session id -> deque of waiters, in round-robin order
+
+    @property
+    def depth(self):
+        return sum(len(q) for q in self.queues.values())
+
+    def next_waiter(self):
+        session_id, queue = next(iter(self.queues.items()))
+        waiter = queue.popleft()
+        # Move the session to the back so the next slot goes to someone else.
+        del self.queues[session_id]
+        if queue:
+            self.queues[session_id] = queue
+        return waiter
+
+
+class CortexScheduler:
+    def __init__(self, model_concurrency=None, search_concurrency=SEARCH_CONCURRENCY,
+                 max_queue_depth=MAX_QUEUE_DEPTH):
+        self.model_concurrency = dict(MODEL_CONCURRENCY if model_concurrency is None else model_concurrency)
+        self.search_concurrency = search_concurrency
+        self.max_queue_depth = max_queue_depth
+        self._lock = threading.Lock()
+        self._resources = {}
+
+    def _resource(self, name):
+        if name not in self._resources:
+            if name == "search":
+                capacity = self.search_concurrency
+            else:
+                capacity = self.model_concurrency.get(name.split(":", 1)[-1], DEFAULT_MODEL_CONCURRENCY)
+            self._resources[name] = _Resource(name, capacity)
+        return self._resources[name]
+
+    def _publish(self, resource):
+        _queue_depth.set(resource.depth, resource=resource.name)
+        _in_use.set(resource.active, resource=resource.name)
+
+    def acquire(self, name, session_id, deadline):
+        """Block until a slot for ``name`` is free; returns the seconds spent waiting."""
+        start = time.monotonic()
+        with self._lock:
+            resource = self._resource(name)
+            if resource.active < resource.capacity and not resource.queues:
+                resource.active += 1
+                self._publish(resource)
+                _wait_seconds.observe(0.0, resource=name)
+                return 0.0
+            if resource.depth >= self.max_queue_depth:
+                _rejected.inc(resource=name, reason="overloaded")
+                raise Overloaded("SS IntelliGuide is very busy right now. Please try again in a moment.")
+            waiter = _Waiter()
+            resource.queues.setdefault(session_id, deque()).append(waiter)
+            self._publish(resource)
+
+        if waiter.granted.wait(max(0.0, deadline - time.monotonic())):
+            waited = time.monotonic() - start
+            _wait_seconds.observe(waited, resource=name)
+            return waited
+
+        with self._lock:
+            if waiter.granted.is_set():
+                # Granted just as we timed out: hand the slot straight back.
+                self._release_locked(resource)
+            else:
+                queue = resource.queues[session_id]
+                queue.remove(waiter)
+                if not queue:
+                    del resource.queues[session_id]
+                self._publish(resource)
+        _rejected.inc(resource=name, reason="deadline")
+        raise DeadlineExceeded("Your question waited too long for a free slot. Please try again.")
+
+    def release(self, name):
+        with self._lock:
+            self._release_locked(self._resources[name])
+
+    def _release_locked(self, resource):
+        resource.active -= 1
+        while resource.queues and resource.active < resource.capacity:
+            resource.next_waiter().granted.set()
+            resource.active += 1
+        self._publish(resource)
+
+    @contextmanager
+    def slot(self, name, session_id, deadline):
+        waited = self.acquire(name, session_id, deadline)
+        tracing.annotate(queue_wait_ms=round(waited * 1000, 1))
+        claim = _claim.get()
+        if claim is not None and not claim.hold(self, name):
+            # Nobody is waiting for this call any more; do not start it.
+            self.release(name)
+            raise DeadlineExceeded("Your question waited too long for a free slot. Please try again.")
+        try:
+            yield
+        finally:
+            if claim is None or claim.drop(self, name):
+                self.release(name)
+
+    def stats(self):
+        with self._lock:
+            return {name: {"active": r.active, "capacity": r.capacity, "queued": r.depth}
+                    for name, r in self._resources.items()}
+
+
+SCHEDULER = CortexScheduler()
+
+
+class ScheduledBackend:
+    """Backend wrapper that admits each call through a ``CortexScheduler``.
+
+    ``deadline_s`` bounds how long one call may wait in the queue.
+    """
+
+    def __init__(self, backend, session_id, scheduler=SCHEDULER, deadline_s=DEFAULT_DEADLINE_S):
+        self.backend = backend
+        self.session_id = session_id
+        self.scheduler = scheduler
+        self.deadline_s = deadline_s
+
+    def complete(self, model, prompt):
+        with self.scheduler.slot(f"complete:{model}", self.session_id, time.monotonic() + self.deadline_s):
+            return self.backend.complete(model, prompt)
+
+    def search(self, service, query, columns, filter, limit):
+        with self.scheduler.slot("search", self.session_id, time.monotonic() + self.deadline_s):
+            return self.backend.search(service, query, columns, filter, limit)
@@ -1,41 +1,211 @@
+"""Capture APT fleet pages as compressed text snapshots (and optionally PDFs).
+
+Each ship in ``scraper/fleets_urls.txt`` is saved to
+``Fleet_snapshots/<ship>.json.gz`` holding the page as Markdown plus the
+ship specs parsed from it (guests, crew, suites, decks, cabin types, ship
+type and region), ready to index without re-parsing a PDF.
+
+    python scraper/fleet-data.py                 # text snapshots only
+    python scraper/fleet-data.py --pdf           # also print the A4 PDF into Fleet_pdfs/
+    python scraper/fleet-data.py --from-pdfs     # build snapshots from an existing Fleet_pdfs/
+"""
+
+import argparse
 import asyncio
+import gzip
+import json
 import os
-from pathlib import Path
-from playwright.async_api import async_playwright
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import tracing
 
 # Path to your URLs file
 FLEET_URLS_FILE = "scraper/fleets_urls.txt"
 PDF_OUTPUT_DIR = "Fleet_pdfs"
+SNAPSHOT_DIR = "Fleet_snapshots"
+SETTLE_TIMEOUT_MS = 8000
 
-# Ensure output folder exists
-os.makedirs(PDF_OUTPUT_DIR, exist_ok=True)
+NUMBER_WORDS = {w: n for n, w in enumerate(
+    "zero one two three four five six seven eight nine ten eleven twelve".split())}
+NUMBER = r"(\d[\d,]*|" + "|".join(NUMBER_WORDS) + ")"
+SPEC_PATTERNS = {
+    "guests": re.compile(NUMBER + r"\s+(?:guests|passengers)\b", re.I),
+    "crew": re.compile(r"crew of\s+" + NUMBER + r"|\b" + NUMBER + r"[\s-]+(?:person\s+)?crew\b(?!-)", re.I),
+    "suites": re.compile(NUMBER + r"\s+(?:suites|staterooms|cabins)\b", re.I),
+    "decks": re.compile(NUMBER + r"\s+(?:passenger\s+)?decks\b", re.I),
+}
+CABINS_START_RE = re.compile(r"^Our (Suites?|Cabins?|Staterooms?|Rooms?|Accommodation)$", re.I)
+CABINS_END_RE = re.compile(r"^(Deck Plan|Ship Overview|Lodge Overview)$", re.I)
+SHIP_TYPE_RE = re.compile(r"^((?:[A-Z0-9]+ )*(?:SHIP|CRUISE|LODGE|YACHT|TRAIN|VEHICLES?))(?:\s*\|\s*([A-Z0-9 ,&'-]+))?$")
+# Site chrome that follows the ship content on every fleet page.
+FOOTER_RE = re.compile(r"^(Why Choose APT|Subscribe to a world of travel)$")
 
-async def save_fleet_pages_as_pdf():
-    # Read all fleet URLs
-    with open(FLEET_URLS_FILE, "r") as f:
-        fleet_urls = [line.strip() for line in f if line.strip()]
+# Headings, paragraphs and list items of the page body as Markdown lines.
+MARKDOWN_JS = """
+() => {
+  const out = [];
+  const root = document.querySelector('main') || document.body;
+  for (const el of root.querySelectorAll('h1, h2, h3, h4, p, li')) {
+    if (el.closest('header, footer, nav, form, [aria-hidden="true"]') || !el.offsetParent) continue;
+    const text = el.innerText.replace(/\\s+/g, ' ').trim();
+    if (!text) continue;
+    const tag = el.tagName;
+    out.push(tag[0] === 'H' ? '#'.repeat(+tag[1]) + ' ' + text : tag === 'LI' ? '- ' + text : text);
+  }
+  return out;
+}
+"""
+
+
+def _number(value):
+    value = value.lower().replace(",", "")
+    return NUMBER_WORDS.get(value, int(value) if value.isdigit() else None)
+
+
+def parse_specs(text):
+    """Ship specs found in a fleet page's visible text."""
+    specs = {}
+    for key, pattern in SPEC_PATTERNS.items():
+        m = pattern.search(text)
+        if m:
+            specs[key] = _number(next(g for g in m.groups() if g))
+    lines = [line.strip() for line in text.splitlines() if line.strip()]
+    cabins, in_cabins = [], False
+    for line in lines:
+        if CABINS_START_RE.match(line):
+            in_cabins = True
+        elif in_cabins and CABINS_END_RE.match(line):
+            break
+        elif (in_cabins and len(line) <= 60 and line not in cabins
+              and not CABINS_START_RE.match(line) and not line.isupper()):
+            cabins.append(line)
+    if cabins:
+        specs["cabin_types"] = cabins
+    for line in lines:
+        m = SHIP_TYPE_RE.match(line)
+        if m:
+            specs["ship_type"] = m.group(1).title()
+            if m.group(2):
+                specs["region"] = m.group(2).title()
+            break
+    return specs
+
+
+def clean_lines(lines):
+    """Drop site chrome after the ship content and consecutive repeats."""
+    out = []
+    for line in lines:
+        if FOOTER_RE.match(line.lstrip("# ")):
+            break
+        if not out or out[-1] != line:
+            out.append(line)
+    return out
+
+
+def snapshot(ship_id, url, markdown_lines, text):
+    return {
+        "ship": ship_id,
+        "url": url,
+        "captured_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "specs": parse_specs(text),
+        "markdown": "\n".join(clean_lines(markdown_lines)),
+    }
+
+
+def write_snapshot(record, output_dir=SNAPSHOT_DIR):
+    os.makedirs(output_dir, exist_ok=True)
+    path = os.path.join(output_dir, f"{record['ship']}.json.gz")
+    with gzip.open(path, "wt", encoding="utf-8") as f:
+        json.dump(record, f, ensure_ascii=False, indent=1)
+    return path
+
+
+def read_snapshot(path):
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        return json.load(f)
+
+
+async def capture_fleet(urls, output_dir=SNAPSHOT_DIR, save_pdf=False, settle_ms=SETTLE_TIMEOUT_MS):
+    from playwright.async_api import TimeoutError as PlaywrightTimeout, async_playwright
+
+    if save_pdf:
+        os.makedirs(PDF_OUTPUT_DIR, exist_ok=True)
 
     async with async_playwright() as p:
         browser = await p.chromium.launch(headless=True)
         page = await browser.new_page()
 
-        for url in fleet_urls:
+        for url in urls:
             ship_id = url.strip().split("/")[-1]
-            print(f"📄 Saving PDF for: {ship_id}")
+            print(f"📄 Capturing: {ship_id}")
 
             try:
-                await page.goto(url, timeout=60000)
-                await page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
-                await page.wait_for_timeout(5000)  # Let content load
+                with tracing.trace("scrape_fleet", ship=ship_id):
+                    with tracing.span("scrape_fleet.load"):
+                        await page.goto(url, timeout=60000)
+                        await page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
+                        # Wait for lazy content to settle instead of a fixed sleep.
+                        try:
+                            await page.wait_for_load_state("networkidle", timeout=settle_ms)
+                        except PlaywrightTimeout:
+                            pass
 
-                pdf_path = os.path.join(PDF_OUTPUT_DIR, f"{ship_id}.pdf")
-                await page.pdf(path=pdf_path, format="A4")
+                    with tracing.span("scrape_fleet.text") as s:
+                        text = await page.inner_text("body")
+                        record = snapshot(ship_id, url, await page.evaluate(MARKDOWN_JS), text)
+                        path = write_snapshot(record, output_dir)
+                        s.set(bytes=os.path.getsize(path), specs=len(record["specs"]))
+                    print(f"✅ Saved: {path}  {record['specs']}")
 
-                print(f"✅ Saved: {pdf_path}")
+                    if save_pdf:
+                        pdf_path = os.path.join(PDF_OUTPUT_DIR, f"{ship_id}.pdf")
+                        with tracing.span("scrape_fleet.pdf"):
+                            await page.pdf(path=pdf_path, format="A4")
+                        print(f"✅ Saved: {pdf_path}")
             except Exception as e:
                 print(f"❌ Failed for {url}: {e}")
 
         await browser.close()
 
-# Run the script
-asyncio.run(save_fleet_pages_as_pdf())
+
+def snapshots_from_pdfs(pdf_dir=PDF_OUTPUT_DIR, output_dir=SNAPSHOT_DIR):
+    """Convert previously printed fleet PDFs into snapshots, without a browser."""
+    import fitz
+
+    for name in sorted(os.listdir(pdf_dir)):
+        if not name.lower().endswith(".pdf"):
+            continue
+        ship_id = name[:-4]
+        with fitz.open(os.path.join(pdf_dir, name)) as doc:
+            text = "\n".join(page.get_text() for page in doc)
+        lines = [line.strip() for line in text.splitlines() if line.strip()]
+        record = snapshot(ship_id, "", lines, text)
+        path = write_snapshot(record, output_dir)
+        print(f"✅ {os.path.getsize(os.path.join(pdf_dir, name)):>10,} B -> {os.path.getsize(path):>7,} B  {path}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--urls", default=FLEET_URLS_FILE)
+    parser.add_argument("--output", default=SNAPSHOT_DIR)
+    parser.add_argument("--pdf", action="store_true", help=f"also save an A4 PDF render to {PDF_OUTPUT_DIR}/")
+    parser.add_argument("--settle-ms", type=int, default=SETTLE_TIMEOUT_MS,
+                        help="max wait for the network to go idle after scrolling")
+    parser.add_argument("--from-pdfs", action="store_true", help=f"build snapshots from {PDF_OUTPUT_DIR}/ instead")
+    args = parser.parse_args(argv)
+
+    if args.from_pdfs:
+        snapshots_from_pdfs(output_dir=args.output)
+        return
+
+    # Read all fleet URLs
+    with open(args.urls, "r") as f:
+        fleet_urls = [line.strip() for line in f if line.strip()]
+    asyncio.run(capture_fleet(fleet_urls, args.output, args.pdf, args.settle_ms))
+
+
+if __name__ == "__main__":
+    main()
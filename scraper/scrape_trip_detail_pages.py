@@ -2,10 +2,15 @@
 
 import asyncio
 import csv
+import os
+import sys
 from urllib.parse import urlparse
 from playwright.async_api import async_playwright
 from bs4 import BeautifulSoup
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import tracing
+
 with open("scraper/tour_urls.txt") as f:
     tour_detail_pages = [line.strip() for line in f if line.strip()]
 
@@ -89,7 +94,9 @@ async def run():
         extracted_data = []
         for url in tour_detail_pages:
             print(f"🌍 Visiting {url}")
-            data = await extract_tour_info(page, url)
+            with tracing.trace("scrape_trip_detail", url=url) as t:
+                data = await extract_tour_info(page, url)
+                t.attrs["ok"] = data is not None
             if data:
                 extracted_data.append(data)
 
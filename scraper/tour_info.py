@@ -1,7 +1,12 @@
 import asyncio
 import json
+import os
+import sys
 from playwright.async_api import async_playwright
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import tracing
+
 TOUR_LIST_FILE = "scraper/tour_urls.txt"
 OUTPUT_FILE = "scraper/tour_info.json"
 
@@ -108,7 +113,9 @@ async def main():
 
         for i, url in enumerate(urls):
             print(f"🔍 [{i+1}/{len(urls)}] Processing: {url}")
-            data = await extract_tour_info(url, page)
+            with tracing.trace("scrape_tour", url=url) as t:
+                data = await extract_tour_info(url, page)
+                t.attrs["fields"] = sum(1 for v in data.values() if v)
             all_results.append(data)
 
         await browser.close()
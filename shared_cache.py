@@ -0,0 +1,233 @@
+"""Cache shared by every Streamlit worker process on the host.
+
+``st.cache_data`` and the module caches live in one process, so behind a
+load balancer each worker re-extracts the same brochures and repeats the
+same searches and completions. ``SharedCache`` keeps pickled values in a
+SQLite file (WAL mode, so readers in other processes are not blocked) under
+a namespace per kind of data. Each namespace has a size limit and evicts
+least recently used entries past it, an optional TTL, and hit/miss counts
+that every process adds to.
+
+The cache is an optimisation only: a locked or broken database counts as a
+miss and the value is computed as usual.
+
+    python shared_cache.py                  # hit rate and size per namespace
+    python shared_cache.py --clear search   # drop one namespace
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+import resilience
+import singleflight
+import tracing
+
+CACHE_FILE = os.environ.get("INTELLIGUIDE_CACHE_FILE", "shared_cache.db")
+MB = 1 << 20
+# namespace -> (max bytes, TTL in seconds or None)
+NAMESPACES = {
+    "brochure_info": (32 * MB, None),
+    "brochure_ships": (4 * MB, None),  # catalog: ships named in a brochure version, per fleet
+    # Search results change when the service is rebuilt; ingest_jobs also clears them then.
+    "search": (64 * MB, 120),
+    "complete": (128 * MB, 24 * 3600),
+    "page_render": (128 * MB, None),
+    "page_text": (16 * MB, None),
+}
+DEFAULT_NAMESPACE = (16 * MB, None)
+EVICT_TO = 0.9  # evict down to this share of the limit so every set does not evict
+BUSY_TIMEOUT_S = 2
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    namespace TEXT,
+    key TEXT,
+    value BLOB,
+    size INTEGER,
+    expires_at REAL,
+    accessed_at REAL,
+    PRIMARY KEY (namespace, key)
+);
+CREATE INDEX IF NOT EXISTS idx_entries_lru ON entries (namespace, accessed_at);
+CREATE TABLE IF NOT EXISTS stats (
+    namespace TEXT PRIMARY KEY,
+    hits INTEGER DEFAULT 0,
+    misses INTEGER DEFAULT 0,
+    sets INTEGER DEFAULT 0,
+    evictions INTEGER DEFAULT 0
+);
+"""
+
+_events = tracing.METRICS.counter("intelliguide_shared_cache_total", "Shared cache lookups, writes and evictions")
+_MISSING = object()
+
+
+def cache_key(key):
+    """Short string form of a key; tuples and long strings are hashed."""
+    if isinstance(key, str) and len(key) <= 200:
+        return key
+    return hashlib.sha1(json.dumps(key, sort_keys=True, default=str).encode()).hexdigest()
+
+
+class SharedCache:
+    def __init__(self, path=CACHE_FILE, namespaces=None):
+        self.path = path
+        self.namespaces = dict(NAMESPACES if namespaces is None else namespaces)
+        self._local = threading.local()
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT_S, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    def _limits(self, namespace):
+        return self.namespaces.get(namespace, DEFAULT_NAMESPACE)
+
+    def _count(self, conn, namespace, field, n=1):
+        conn.execute(f"INSERT INTO stats (namespace, {field}) VALUES (?, ?) "
+                     f"ON CONFLICT (namespace) DO UPDATE SET {field} = {field} + excluded.{field}", (namespace, n))
+        _events.inc(n, namespace=namespace, event=field)
+
+    def get(self, namespace, key, default=None):
+        """Cached value, or ``default`` if it is missing or expired."""
+        k = cache_key(key)
+        try:
+            conn = self._conn()
+            row = conn.execute("SELECT value, expires_at FROM entries WHERE namespace = ? AND key = ?",
+                               (namespace, k)).fetchone()
+            now = time.time()
+            if row is not None and (row[1] is None or row[1] > now):
+                conn.execute("UPDATE entries SET accessed_at = ? WHERE namespace = ? AND key = ?", (now, namespace, k))
+                self._count(conn, namespace, "hits")
+                return pickle.loads(row[0])
+            self._count(conn, namespace, "misses")
+        except (sqlite3.Error, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+            _events.inc(namespace=namespace, event="error")
+        return default
+
+    def set(self, namespace, key, value, ttl_s=_MISSING):
+        """Store ``value``; ``ttl_s`` overrides the namespace TTL (None keeps it until evicted)."""
+        max_bytes, default_ttl = self._limits(namespace)
+        ttl_s = default_ttl if ttl_s is _MISSING else ttl_s
+        blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        if len(blob) > max_bytes * (1 - EVICT_TO):
+            return  # one entry this large would flush most of the namespace
+        now = time.time()
+        try:
+            conn = self._conn()
+            conn.execute("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?)",
+                         (namespace, cache_key(key), blob, len(blob), now + ttl_s if ttl_s else None, now))
+            self._count(conn, namespace, "sets")
+            self._evict(conn, namespace, max_bytes, now)
+        except sqlite3.Error:
+            _events.inc(namespace=namespace, event="error")
+
+    def _evict(self, conn, namespace, max_bytes, now):
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries WHERE namespace = ?", (namespace,)).fetchone()[0]
+        if total <= max_bytes:
+            return
+        evicted = conn.execute("DELETE FROM entries WHERE namespace = ? AND expires_at <= ?", (namespace, now)).rowcount
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries WHERE namespace = ?", (namespace,)).fetchone()[0]
+        victims = []
+        for key, size in conn.execute("SELECT key, size FROM entries WHERE namespace = ? ORDER BY accessed_at",
+                                      (namespace,)):
+            if total <= max_bytes * EVICT_TO:
+                break
+            victims.append((namespace, key))
+            total -= size
+        conn.executemany("DELETE FROM entries WHERE namespace = ? AND key = ?", victims)
+        self._count(conn, namespace, "evictions", evicted + len(victims))
+
+    def get_or_set(self, namespace, key, fn, ttl_s=_MISSING):
+        value = self.get(namespace, key, _MISSING)
+        if value is _MISSING:
+            value = fn()
+            self.set(namespace, key, value, ttl_s)
+        return value
+
+    def invalidate(self, namespace, key=None):
+        """Drop one entry, or the whole namespace when ``key`` is None."""
+        try:
+            if key is None:
+                self._conn().execute("DELETE FROM entries WHERE namespace = ?", (namespace,))
+            else:
+                self._conn().execute("DELETE FROM entries WHERE namespace = ? AND key = ?",
+                                     (namespace, cache_key(key)))
+        except sqlite3.Error:
+            _events.inc(namespace=namespace, event="error")
+
+    def stats(self):
+        """Per namespace: entries, bytes, hits, misses, hit rate, sets and evictions since the file was created."""
+        conn = self._conn()
+        sizes = {ns: (n, size) for ns, n, size in conn.execute(
+            "SELECT namespace, COUNT(*), SUM(size) FROM entries GROUP BY namespace")}
+        result = {}
+        for ns, hits, misses, sets, evictions in conn.execute(
+                "SELECT namespace, hits, misses, sets, evictions FROM stats ORDER BY namespace"):
+            n, size = sizes.get(ns, (0, 0))
+            result[ns] = {"entries": n, "bytes": size, "hits": hits, "misses": misses,
+                          "hit_rate": round(hits / (hits + misses), 3) if hits + misses else None,
+                          "sets": sets, "evictions": evictions}
+        return result
+
+
+CACHE = SharedCache()
+
+
+class CachedBackend:
+    """Backend wrapper that serves repeated searches and completions from a ``SharedCache``.
+
+    Replies the resilience layer marks as degraded (a fallback model's answer
+    or stale search results) are passed through but never stored.
+    """
+
+    def __init__(self, backend, cache=CACHE):
+        self.backend = backend
+        self.cache = cache
+
+    def _cached(self, namespace, key, fn):
+        value = self.cache.get(namespace, key, _MISSING)
+        tracing.annotate(shared_cache="hit" if value is not _MISSING else "miss")
+        if value is _MISSING:
+            value = fn()
+            if not resilience.is_degraded(value):
+                self.cache.set(namespace, key, value)
+        return value
+
+    def complete(self, model, prompt):
+        return self._cached("complete", (model, prompt), lambda: self.backend.complete(model, prompt))
+
+    def search(self, service, query, columns, filter, limit):
+        key = (service, singleflight.normalize(query), sorted(columns), filter, limit)
+        return list(self._cached("search", key, lambda: self.backend.search(service, query, columns, filter, limit)))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--path", default=CACHE_FILE)
+    parser.add_argument("--clear", metavar="NAMESPACE", help="drop every entry in NAMESPACE")
+    args = parser.parse_args(argv)
+
+    cache = SharedCache(args.path)
+    if args.clear:
+        cache.invalidate(args.clear)
+    print(f"{'namespace':>14} {'entries':>8} {'MB':>7} {'hits':>8} {'misses':>8} {'hit rate':>8} {'evictions':>9}")
+    for ns, s in cache.stats().items():
+        rate = "-" if s["hit_rate"] is None else f"{s['hit_rate']:.3f}"
+        print(f"{ns:>14} {s['entries']:>8} {(s['bytes'] or 0) / MB:>7.2f} {s['hits']:>8} {s['misses']:>8} "
+              f"{rate:>8} {s['evictions']:>9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""Process-wide coalescing of identical in-flight Cortex calls.
+
+When several sessions ask the same thing at the same moment, the first
+caller for a key runs the request and everyone else arriving before it
+finishes waits for and shares that result. Nothing is cached afterwards:
+a call that starts once the leader is done runs again.
+"""
+
+import json
+import re
+import threading
+
+import tracing
+
+_calls = tracing.METRICS.counter("intelliguide_singleflight_total", "Remote calls by op and leader/shared role")
+
+
+def normalize(text):
+    """Case- and whitespace-insensitive form of a search query or question."""
+    return re.sub(r"\s+", " ", text).strip().lower()
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn):
+        """Run ``fn`` once per concurrent ``key``; returns ``(result, shared)``."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
+
+    def in_flight(self):
+        with self._lock:
+            return len(self._calls)
+
+
+GROUP = SingleFlight()
+
+
+class SingleFlightBackend:
+    """Backend wrapper that coalesces identical concurrent completions and searches."""
+
+    def __init__(self, backend, group=GROUP):
+        self.backend = backend
+        self.group = group
+
+    def complete(self, model, prompt):
+        # The exact prompt: a model can answer differently to a change in case or spacing.
+        key = ("complete", model, prompt)
+        result, shared = self.group.do(key, lambda: self.backend.complete(model, prompt))
+        _calls.inc(op="complete", role="shared" if shared else "leader")
+        tracing.annotate(coalesced=shared)
+        return result
+
+    def search(self, service, query, columns, filter, limit):
+        key = ("search", service, normalize(query), tuple(sorted(columns)),
+               json.dumps(filter, sort_keys=True), limit)
+        results, shared = self.group.do(
+            key, lambda: self.backend.search(service, query, columns, filter, limit))
+        _calls.inc(op="search", role="shared" if shared else "leader")
+        tracing.annotate(coalesced=shared)
+        # Callers get their own list so one session cannot reorder another's results.
+        return list(results)
@@ -0,0 +1,257 @@
+"""Type-ahead suggestions over trip codes, titles, regions, countries and places.
+
+Terms come from two kinds of document:
+
+* brochures in ``pdfs/`` – code, title, tour type, regions and the places
+  ``brochure_info`` finds in the text;
+* tours in ``scraper/tour_info.json`` – code, name, region, country and the
+  day titles of the itinerary in ``tours_scraped.csv``.
+
+Every term is keyed under each of its word starts ("east africa safari",
+"africa safari", "safari") in one sorted list, so a prefix lookup is a
+``bisect`` plus a short scan. The best suggestions for one- and two-letter
+prefixes, whose ranges are long, are worked out when the index is built.
+``refresh`` re-reads only brochures whose mtime changed and the tour files
+when theirs did, and re-sorts the keys only if anything changed. The first
+build reads every brochure (a few seconds), so pages start it with
+``refresh_in_background``; until it is ready ``matches`` finds nothing and
+they fall back to substring search.
+"""
+
+import bisect
+import csv
+import heapq
+import json
+import os
+import re
+import threading
+import unicodedata
+from collections import defaultdict
+from dataclasses import dataclass
+
+import brochure_info
+import shared_cache
+import tour_facts
+
+PDF_DIR = "pdfs"
+TOP_K = 8
+MAX_SCAN = 400  # keys looked at for a prefix of three or more characters
+SHORT_PREFIX = 2
+# Lower ranks first when suggestions tie on the number of documents.
+KIND_RANK = {"code": 0, "title": 1, "region": 2, "country": 3, "type": 4, "place": 5}
+DAY_PREFIX_RE = re.compile(r"^\s*day\s*\d+(\s*-\s*\d+)?\s*[:.\-–]?\s*", re.I)
+
+
+@dataclass(frozen=True)
+class Suggestion:
+    text: str  # what goes in the search box
+    kind: str
+    count: int  # documents the term appears in
+
+
+@dataclass(frozen=True)
+class _View:
+    """One build of the index; replaced whole so lookups on other threads never see half a rebuild."""
+    keys: list = ()  # sorted normalized keys
+    term_ids: list = ()  # term id for each key
+    terms: list = ()  # term id -> (kind, display)
+    refs: list = ()  # term id -> set of doc refs
+    short: dict = None  # prefix of up to SHORT_PREFIX characters -> best term ids
+
+
+def normalize(text):
+    """Lowercase ASCII words: accents dropped, punctuation as spaces."""
+    text = unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode()
+    return " ".join(re.sub(r"[^a-z0-9]+", " ", text.lower()).split())
+
+
+def brochure_terms(info):
+    terms = [("code", info.code), ("title", info.title), ("type", info.tour_type)]
+    terms += [("region", r) for r in info.regions]
+    terms += [("place", p.title()) for p in info.places]
+    return terms
+
+
+def itinerary_places(itinerary):
+    """Day titles of a ``|``-separated itinerary, without their "Day 3:" prefixes."""
+    places = []
+    for day in (itinerary or "").split("|"):
+        title = DAY_PREFIX_RE.sub("", day).split(":")[0].strip()
+        if 2 < len(title) <= 40:
+            places.append(title)
+    return places
+
+
+def tour_terms(tour, scraped):
+    detail = scraped.get((tour.get("original_url") or "").rstrip("/"), {})
+    terms = [("code", tour.get("trip_code")), ("title", tour.get("trip_name")),
+             ("region", tour.get("region")), ("country", tour.get("country"))]
+    return terms + [("place", p) for p in itinerary_places(detail.get("Itinerary"))]
+
+
+def load_tours(path=tour_facts.TOUR_INFO_FILE):
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    return [data] if isinstance(data, dict) else data
+
+
+def load_scraped(path=tour_facts.SCRAPED_TOURS_FILE):
+    if not os.path.exists(path):
+        return {}
+    with open(path, newline="", encoding="utf-8") as f:
+        return {row["URL"].rstrip("/"): row for row in csv.DictReader(f)}
+
+
+def _mtime(path):
+    return os.path.getmtime(path) if os.path.exists(path) else None
+
+
+class SuggestIndex:
+    def __init__(self, pdf_dir=PDF_DIR, tour_info=tour_facts.TOUR_INFO_FILE, scraped=tour_facts.SCRAPED_TOURS_FILE):
+        self.pdf_dir = pdf_dir
+        self.tour_info = tour_info
+        self.scraped = scraped
+        self._lock = threading.Lock()
+        self._lock_state = threading.Lock()  # guards _refreshing only
+        self._refreshing = False
+        self._docs = {}  # ("brochure", file) | ("tour", code) -> (signature, [(kind, term)])
+        self._tours_signature = None
+        self._view = _View(short={})
+        self.ready = False  # set once the first build is done
+
+    def refresh(self):
+        """Re-read changed sources; returns True if the index changed."""
+        with self._lock:
+            changed = self._refresh_brochures() | self._refresh_tours()
+            if changed:
+                self._rebuild()
+            self.ready = True
+            return changed
+
+    def refresh_in_background(self):
+        """Start a ``refresh`` on a thread unless one is running; returns the thread, or None."""
+        with self._lock_state:
+            if self._refreshing:
+                return None
+            self._refreshing = True
+
+        def run():
+            try:
+                self.refresh()
+            finally:
+                self._refreshing = False
+
+        thread = threading.Thread(target=run, daemon=True, name="suggest-index")
+        thread.start()
+        return thread
+
+    def _refresh_brochures(self):
+        files = {f: os.path.getmtime(os.path.join(self.pdf_dir, f))
+                 for f in (os.listdir(self.pdf_dir) if os.path.isdir(self.pdf_dir) else [])
+                 if f.lower().endswith(".pdf")}
+        changed = False
+        for ref in [r for r in self._docs if r[0] == "brochure" and r[1] not in files]:
+            del self._docs[ref]
+            changed = True
+        for file, mtime in files.items():
+            ref = ("brochure", file)
+            if self._docs.get(ref, (None,))[0] == mtime:
+                continue
+            path = os.path.join(self.pdf_dir, file)
+            try:
+                # Same key as the PDF Viewer, so brochures it has already read are not extracted again.
+                info = shared_cache.CACHE.get_or_set("brochure_info", (file, mtime), lambda: brochure_info.extract(path))
+            except Exception:
+                continue
+            self._docs[ref] = (mtime, brochure_terms(info))
+            changed = True
+        return changed
+
+    def _refresh_tours(self):
+        signature = (_mtime(self.tour_info), _mtime(self.scraped))
+        if signature == self._tours_signature:
+            return False
+        scraped = load_scraped(self.scraped)
+        for ref in [r for r in self._docs if r[0] == "tour"]:
+            del self._docs[ref]
+        for tour in load_tours(self.tour_info):
+            if tour.get("trip_code"):
+                self._docs[("tour", tour["trip_code"].upper())] = (signature, tour_terms(tour, scraped))
+        self._tours_signature = signature
+        return True
+
+    def _rebuild(self):
+        # One term per normalized text; "Europe" as a region and as a place is one suggestion.
+        term_refs = defaultdict(set)
+        term_kind = {}
+        display = {}
+        for ref, (_, terms) in self._docs.items():
+            for kind, term in terms:
+                key = normalize(term or "")
+                if key:
+                    term_refs[key].add(ref)
+                    display.setdefault(key, term.strip())
+                    if key not in term_kind or KIND_RANK[kind] < KIND_RANK[term_kind[key]]:
+                        term_kind[key] = kind
+        terms, refs_by_id, pairs = [], [], []
+        for term_id, (key, refs) in enumerate(term_refs.items()):
+            terms.append((term_kind[key], display[key]))
+            refs_by_id.append(refs)
+            words = key.split()
+            pairs.extend((" ".join(words[i:]), term_id) for i in range(len(words)))
+        pairs.sort()
+        view = _View([k for k, _ in pairs], [t for _, t in pairs], terms, refs_by_id, {})
+        short = defaultdict(set)
+        for key, term_id in pairs:
+            for n in range(1, SHORT_PREFIX + 1):
+                short[key[:n]].add(term_id)
+        view.short.update((p, heapq.nsmallest(TOP_K, ids, key=lambda t: _rank(view, t))) for p, ids in short.items())
+        self._view = view
+
+    def suggest(self, prefix, k=TOP_K):
+        """Best ``k`` terms containing words that start with ``prefix``, ranked by how many documents share them."""
+        query = normalize(prefix)
+        if not query:
+            return []
+        view = self._view
+        if len(query) <= SHORT_PREFIX and k <= TOP_K:
+            ids = view.short.get(query, [])[:k]
+        else:
+            start, end = _range(view, query)
+            ids = heapq.nsmallest(k, set(view.term_ids[start:min(end, start + MAX_SCAN)]),
+                                  key=lambda t: _rank(view, t))
+        return [Suggestion(view.terms[i][1], view.terms[i][0], len(view.refs[i])) for i in ids]
+
+    def matches(self, query):
+        """Doc refs with a term matching every word of ``query`` (each word as a prefix), or None for an empty query.
+
+        Before the first build is ready nothing matches, so callers fall back to their own search.
+        """
+        words = normalize(query).split()
+        if not words:
+            return None
+        view = self._view
+        found = None
+        for word in words:
+            start, end = _range(view, word)
+            refs = set().union(*(view.refs[t] for t in set(view.term_ids[start:end])))
+            found = refs if found is None else found & refs
+            if not found:
+                break
+        return found
+
+
+def _rank(view, term_id):
+    kind, text = view.terms[term_id]
+    return (-len(view.refs[term_id]), KIND_RANK[kind], len(text), text)
+
+
+def _range(view, prefix):
+    start = bisect.bisect_left(view.keys, prefix)
+    end = bisect.bisect_right(view.keys, prefix + "\x7f", lo=start)
+    return start, end
+
+
+INDEX = SuggestIndex()
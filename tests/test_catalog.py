@@ -0,0 +1,91 @@
+import json
+import threading
+
+import pytest
+
+import brochure_info
+import catalog
+import shared_cache
+
+TEXTS = {
+    "EUCCDR14 Croatia in Depth 2026.pdf": "Sail the Dalmatian coast of Croatia aboard the MV Lady Eleganza.",
+    "AUKCK12 Kimberley Coast 2026.pdf": "Cruise the Kimberley from Broome aboard the Coral Discoverer.",
+}
+
+
+@pytest.fixture
+def sources(tmp_path, monkeypatch):
+    pdfs = tmp_path / "pdfs"
+    pdfs.mkdir()
+    for name in TEXTS:
+        (pdfs / name).write_bytes(b"%PDF")
+    fleet = tmp_path / "Fleet_snapshots"
+    fleet.mkdir()
+    for ship in ("mv-lady-eleganza", "coral-discoverer"):
+        (fleet / f"{ship}.json.gz").write_bytes(b"")
+    tour_info = tmp_path / "tour_info.json"
+    tour_info.write_text(json.dumps({"trip_code": "EUCCDR14", "trip_name": "Croatia in Depth",
+                                     "region": "Europe", "country": "Croatia"}), encoding="utf-8")
+    reads = []
+
+    def read_text(path):
+        reads.append(path)
+        return next(text for name, text in TEXTS.items() if path.endswith(name))
+
+    monkeypatch.setattr(brochure_info, "read_text", read_text)
+    monkeypatch.setattr(shared_cache, "CACHE", shared_cache.SharedCache(str(tmp_path / "cache.db")))
+    return tmp_path, reads
+
+
+def new_catalog(tmp_path, name="trip_catalog.json"):
+    return catalog.TripCatalog(str(tmp_path / name), str(tmp_path / "pdfs"), str(tmp_path / "Fleet_snapshots"),
+                               str(tmp_path / "tour_info.json"), fleet_pdf_dir=str(tmp_path / "Fleet_pdfs"))
+
+
+def test_refresh_links_brochures_ships_and_tours(sources):
+    tmp_path, _ = sources
+    cat = new_catalog(tmp_path)
+    assert cat.refresh()
+    trip = cat.get("euccdr14")
+    assert trip.brochure == "EUCCDR14 Croatia in Depth 2026.pdf"
+    assert trip.ships == ["mv-lady-eleganza"]
+    assert trip.tour["trip_name"] == "Croatia in Depth"
+    assert cat.get("AUKCK12").ships == ["coral-discoverer"]
+    assert not cat.refresh()
+
+
+def test_cached_brochures_are_not_read_again(sources):
+    tmp_path, reads = sources
+    new_catalog(tmp_path).refresh()
+    assert len(reads) == len(TEXTS)
+    # Another process with no saved catalog finds both brochures in the shared cache.
+    new_catalog(tmp_path, "other.json").refresh()
+    assert len(reads) == len(TEXTS)
+
+
+def test_lookups_do_not_wait_for_a_refresh(sources):
+    tmp_path, _ = sources
+    new_catalog(tmp_path).refresh()
+    cat = new_catalog(tmp_path)
+    cat._lock.acquire()  # a refresh in progress on another thread
+    try:
+        found = []
+        lookup = threading.Thread(target=lambda: found.append(cat.codes_in("Tell me about EUCCDR14")))
+        lookup.start()
+        lookup.join(timeout=2)
+        assert found == [[]]
+    finally:
+        cat._lock.release()
+
+
+def test_file_filter():
+    assert catalog.file_filter([]) is None
+    assert catalog.file_filter(["A B.pdf"]) == {"@eq": {"relative_path": "A_B.pdf"}}
+    assert catalog.file_filter(["A.pdf", "B.pdf"]) == {
+        "@or": [{"@eq": {"relative_path": "A.pdf"}}, {"@eq": {"relative_path": "B.pdf"}}]}
+
+
+def test_fleet_falls_back_to_pdfs(tmp_path):
+    (tmp_path / "pdfs").mkdir()
+    (tmp_path / "pdfs" / "au-co.pdf").write_bytes(b"")
+    assert catalog.fleet_ships(str(tmp_path / "missing"), str(tmp_path / "pdfs")) == ["au-co"]
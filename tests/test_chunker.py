@@ -0,0 +1,88 @@
+import fitz
+import pytest
+
+import chunker
+
+BODY = 10.0
+HEADING = 14.0
+
+
+def body(words, start=0):
+    return " ".join(f"w{n}" for n in range(start, start + words))
+
+
+PAGES = [
+    [("Croatia in Depth", HEADING, 0), ("Sail the Dalmatian coast. " + body(60), BODY, 1)],
+    [("Day 1 Dubrovnik", BODY, 0), (body(400, 100), BODY, 1)],
+    [("Day 2 Split", BODY, 0), ("Free day to explore the palace.", BODY, 1)],
+]
+
+
+def test_layout_sections_split_on_headings_and_days():
+    sections = chunker.layout_sections(PAGES)
+    assert [(heading, first, last) for heading, _, first, last in sections] == [
+        ("Croatia in Depth", 1, 1), ("Day 1 Dubrovnik", 2, 2), ("Day 2 Split", 3, 3)]
+
+
+def test_consecutive_heading_lines_form_one_heading():
+    pages = [[("DAY 3", BODY, 0), ("Arrive Hvar", HEADING, 0), (body(50), BODY, 1)]]
+    assert chunker.layout_sections(pages)[0][0] == "DAY 3 – Arrive Hvar"
+
+
+def test_layout_windows_repeat_the_day_heading():
+    chunks = chunker.layout_chunks(PAGES, max_tokens=256, overlap=32)
+    day1 = [c for c in chunks if c.section == "Day 1 Dubrovnik"]
+    assert len(day1) > 1
+    assert all(c.text.startswith("Day 1 Dubrovnik ") for c in day1)
+    assert all(c.tokens <= 256 + chunker.estimate_tokens("Day 1 Dubrovnik") for c in day1)
+    # Consecutive windows overlap.
+    assert day1[0].text.split()[-1] in day1[1].text.split()
+    # The short last day is kept on its own because day sections are never merged away.
+    assert chunks[-1].section == "Day 2 Split" and chunks[-1].page == 3
+
+
+def test_page_and_fixed_strategies():
+    pages = [[("One two three.", BODY, 0)], [], [("Four five.", BODY, 0)]]
+    assert [(c.text, c.page) for c in chunker.page_chunks(pages)] == [("One two three.", 1), ("Four five.", 3)]
+    chunks = chunker.fixed_chunks(pages, max_tokens=4, overlap=0)
+    assert [(c.text, c.page, c.page_end) for c in chunks] == [("One two three.", 1, 1), ("Four five.", 3, 3)]
+
+
+def test_strip_removes_text_before_chunking():
+    pages = [[("Keep this. Drop this.", BODY, 0)]]
+    chunks = chunker.page_chunks(pages, strip=lambda text, page: text.replace(" Drop this.", ""))
+    assert [c.text for c in chunks] == ["Keep this."]
+
+
+def test_unknown_strategy():
+    with pytest.raises(ValueError):
+        chunker.chunk_pages(PAGES, "sentences")
+
+
+class Page:
+    """What ``page_lines`` reads from a PyMuPDF page."""
+
+    def __init__(self, *lines):
+        self.lines = lines
+
+    def get_text(self, kind, flags=None):
+        return {"blocks": [{"lines": [{"spans": [{"text": text, "size": size}]}]} for text, size in self.lines]}
+
+
+def test_page_lines_drop_running_headers_and_icon_glyphs():
+    page = Page(("Croatia in Depth | Page 3", BODY), ("\uf0b7", BODY), ("1300 336 932", BODY),
+                ("\uf0b7 Welcome dinner\x07", BODY))
+    assert chunker.page_lines(page) == [("Welcome dinner", BODY, 3)]
+
+
+def test_chunk_pdf(tmp_path):
+    path = tmp_path / "brochure.pdf"
+    with fitz.open() as doc:
+        page = doc.new_page()
+        page.insert_text((72, 60), "Croatia in Depth | Page 3", fontsize=BODY)
+        page.insert_text((72, 100), "Day 1 Dubrovnik", fontsize=HEADING)
+        page.insert_text((72, 130), "Welcome dinner in the old town.", fontsize=BODY)
+        doc.save(str(path))
+    chunks = chunker.chunk_pdf(str(path))
+    assert [(c.text, c.page, c.section) for c in chunks] == [
+        ("Day 1 Dubrovnik Welcome dinner in the old town.", 1, "Day 1 Dubrovnik")]
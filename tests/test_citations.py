@@ -0,0 +1,33 @@
+import fitz
+import pytest
+
+import citations
+import shared_cache
+
+
+@pytest.fixture
+def brochure(tmp_path, monkeypatch):
+    monkeypatch.setattr(shared_cache, "CACHE", shared_cache.SharedCache(str(tmp_path / "cache.db")))
+    pdfs = tmp_path / "pdfs"
+    pdfs.mkdir()
+    path = pdfs / "AUKCK12 Kimberley Coast 2026.pdf"
+    with fitz.open() as doc:
+        doc.new_page().insert_text((72, 72), "Day 1: Broome to the Kimberley coast")
+        doc.save(str(path))
+    return pdfs, path
+
+
+def test_reads_a_cited_page(brochure):
+    pdfs, path = brochure
+    assert citations.local_pdf("AUKCK12_Kimberley_Coast_2026.pdf", str(pdfs)) == str(path)
+    assert citations.page_text(str(path), 1) == "Day 1: Broome to the Kimberley coast"
+    assert citations.page_image(str(path), 1).startswith(b"\x89PNG")
+
+
+def test_unreadable_pages_have_no_preview(brochure):
+    pdfs, path = brochure
+    assert citations.local_pdf("EUCCDR14_Croatia_in_Depth_2026.pdf", str(pdfs)) is None
+    assert citations.page_image(str(path), 2) is None
+    path.unlink()
+    assert citations.page_image(str(path), 1) is None
+    assert citations.page_text(str(path), 1) is None
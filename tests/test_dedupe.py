@@ -0,0 +1,127 @@
+import json
+import threading
+
+import chunker
+import dedupe
+import ingest
+
+SHARED = "Freedom of Choice lets every guest pick one of several included experiences in each port of call."
+OWN = {
+    "danube": "Budapest glows at night as the ship sails past the parliament building on the river.",
+    "rhine": "Castles crown the hilltops of the gorge between Koblenz and Rudesheim each afternoon.",
+    "douro": "Terraced vineyards climb steep valley walls where port wine has been made for centuries.",
+}
+CORPUS = {f"{name}.pdf": [[(f"{SHARED} {own}",)]] for name, own in OWN.items()}
+
+
+def strip_runs(index, file="danube.pdf"):
+    strip = index.stripper(file)
+    strip(" ".join(t for t, *_ in CORPUS[file][0]), 1)
+    return strip.runs
+
+
+def chunk_for(run):
+    return f"{run.sources[0][0]}: {run.text}"
+
+
+class Cursor:
+    def __init__(self):
+        self.calls = []
+
+    def execute(self, sql):
+        self.calls.append((sql, None))
+
+    def executemany(self, sql, rows):
+        self.calls.append((sql, rows))
+
+    def close(self):
+        pass
+
+
+class Connection:
+    def __init__(self):
+        self.cs = Cursor()
+
+    def cursor(self):
+        return self.cs
+
+    def close(self):
+        pass
+
+
+def test_rebuild_keeps_runs_stored_by_earlier_processes(tmp_path):
+    path = str(tmp_path / "passage_index.json")
+    first = dedupe.PassageIndex(path)
+    first.rebuild(CORPUS, min_files=2)
+    runs = strip_runs(first)
+    assert runs and not runs[0].stored
+    assert first.claim(runs, chunk_for) == runs
+
+    # A new process, e.g. ``python dedupe.py``, rebuilds over the saved index.
+    second = dedupe.PassageIndex(path)
+    second.rebuild(CORPUS, min_files=2)
+
+    with open(path, encoding="utf-8") as f:
+        assert json.load(f)["stored"] == {runs[0].text: f"danube.pdf: {runs[0].text}"}
+    assert all(run.stored for run in strip_runs(second))
+
+
+def test_sources_update_targets_the_row_inserted_before_a_rebuild(tmp_path):
+    path = str(tmp_path / "passage_index.json")
+    index = dedupe.PassageIndex(path)
+    index.rebuild(CORPUS, min_files=2)
+    pdf = tmp_path / "danube.pdf"
+    pdf.write_bytes(b"%PDF")
+    conn = Connection()
+    ingest.stage_and_index(lambda: conn, str(pdf), "danube.pdf", [], strip_runs(index), passages=index,
+                           rebuild_service=False)
+
+    index = dedupe.PassageIndex(path)
+    index.rebuild(CORPUS, min_files=2)
+    conn = Connection()
+    ingest.stage_and_index(lambda: conn, str(pdf), "rhine.pdf", [], strip_runs(index, "rhine.pdf"),
+                           passages=index, rebuild_service=False)
+
+    inserts = [rows for sql, rows in conn.cs.calls if sql == ingest.INSERT_LOCAL_CHUNK_SQL]
+    updates = [rows for sql, rows in conn.cs.calls if sql == ingest.UPDATE_SOURCES_SQL]
+    assert inserts == [[]]
+    # Keyed on the danube row that holds the run, not on "rhine.pdf: ...".
+    assert updates == [[(json.dumps([["rhine.pdf", 1]]), f"danube.pdf: {strip_runs(index)[0].text}")]]
+
+
+def test_concurrent_claims_insert_a_run_once(tmp_path):
+    index = dedupe.PassageIndex(str(tmp_path / "passage_index.json"))
+    index.rebuild(CORPUS, min_files=2)
+    runs = {file: strip_runs(index, file) for file in CORPUS}
+    claimed = []
+    barrier = threading.Barrier(len(runs))
+
+    def claim(file):
+        barrier.wait()
+        claimed.extend(index.claim(runs[file], chunk_for))
+
+    threads = [threading.Thread(target=claim, args=(file,)) for file in runs]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(claimed) == 1
+
+
+def test_release_lets_a_failed_insert_be_retried(tmp_path):
+    index = dedupe.PassageIndex(path=None)
+    index.rebuild(CORPUS, min_files=2)
+    runs = strip_runs(index)
+    index.release(index.claim(runs, chunk_for))
+    assert not runs[0].stored
+    assert index.claim(runs, chunk_for) == runs
+
+
+def test_stage_and_index_without_a_passage_index(tmp_path):
+    pdf = tmp_path / "danube.pdf"
+    pdf.write_bytes(b"%PDF")
+    conn = Connection()
+    chunks = [chunker.Chunk("Budapest glows at night.", 1, 1)]
+    ingest.stage_and_index(lambda: conn, str(pdf), "danube.pdf", chunks, [], passages=None, rebuild_service=False)
+    inserts = [rows for sql, rows in conn.cs.calls if sql == ingest.INSERT_LOCAL_CHUNK_SQL]
+    assert inserts == [[("danube.pdf", "danube.pdf: Budapest glows at night.", '[["danube.pdf", 1]]')]]
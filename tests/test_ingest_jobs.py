@@ -0,0 +1,61 @@
+import io
+import os
+import threading
+import time
+
+import pytest
+
+import ingest
+import ingest_jobs
+
+
+@pytest.fixture
+def pipeline(tmp_path, monkeypatch):
+    """Ingest steps that record the file each job read and wait until ``release`` is set."""
+    release = threading.Event()
+    read = []
+
+    def chunk_file(path, file_name):
+        release.wait(5)
+        with open(path, "rb") as f:
+            read.append(f.read())
+        return [], []
+
+    monkeypatch.setattr(ingest, "chunk_file", chunk_file)
+    monkeypatch.setattr(ingest, "stage_and_index", lambda *args, **kwargs: None)
+    monkeypatch.setattr(ingest, "reindex", lambda connect: None)
+    q = ingest_jobs.IngestQueue(workers=1, ingested_file=str(tmp_path / "ingested.json"),
+                                upload_dir=str(tmp_path / "uploads"))
+    return q, release, read
+
+
+def wait_finished(job):
+    for _ in range(500):
+        if job.finished:
+            return
+        time.sleep(0.01)
+    raise AssertionError(f"{job.file_name} is still {job.status}")
+
+
+def test_same_content_while_running_returns_the_running_job(pipeline):
+    q, release, read = pipeline
+    first = q.submit(io.BytesIO(b"%PDF brochure"), "Kimberley Coast.pdf", connect=None)
+    again = q.submit(io.BytesIO(b"%PDF brochure"), "Kimberley Coast copy.pdf", connect=None)
+    assert again is first
+    assert os.listdir(q.upload_dir) == [first.id]  # nothing left over from the duplicate
+
+    release.set()
+    wait_finished(first)
+    assert first.status == "done" and read == [b"%PDF brochure"]
+    assert os.listdir(q.upload_dir) == []
+
+
+def test_indexed_content_is_a_duplicate(pipeline):
+    q, release, _ = pipeline
+    release.set()
+    wait_finished(q.submit(io.BytesIO(b"%PDF brochure"), "Kimberley Coast.pdf", connect=None))
+
+    q = ingest_jobs.IngestQueue(workers=1, ingested_file=q.ingested_file, upload_dir=q.upload_dir)
+    job = q.submit(io.BytesIO(b"%PDF brochure"), "Kimberley Coast.pdf", connect=None)
+    assert job.status == "duplicate"
+    assert os.listdir(q.upload_dir) == []
@@ -0,0 +1,105 @@
+import random
+import time
+
+import pytest
+
+import resilience
+import scheduler
+from benchmarks.fakes import FakeBackend, FaultyBackend, Latency
+
+INSTANT = Latency("fixed", ms=0)
+
+
+class NoBackoff:
+    def uniform(self, low, high):
+        return 0.0
+
+
+def faulty(**params):
+    params.setdefault("error_ms", 0)
+    return FaultyBackend(FakeBackend(corpus=[], complete_latency=INSTANT, search_latency=INSTANT), **params)
+
+
+def guard(**params):
+    params.setdefault("rng", NoBackoff())
+    return resilience.CallGuard(workers=4, **params)
+
+
+class Raises:
+    def __init__(self, error):
+        self.error = error
+        self.calls = 0
+
+    def complete(self, model, prompt):
+        self.calls += 1
+        raise self.error
+
+
+def test_breaker_opens_then_lets_one_trial_through():
+    backend = faulty(down={"m"})
+    g = guard(max_attempts=1, breaker_failures=2, breaker_reset_s=0.05)
+    rb = resilience.ResilientBackend(backend, guard=g, fallback_model=None)
+    for _ in range(2):
+        with pytest.raises(resilience.Unavailable):
+            rb.complete("m", "q")
+    with pytest.raises(resilience.CircuitOpen):
+        rb.complete("m", "q")
+    assert backend.faults["down"] == 2  # the open breaker failed fast
+
+    time.sleep(0.06)
+    with pytest.raises(resilience.Unavailable):
+        rb.complete("m", "q")  # the half-open trial fails and reopens the breaker
+    assert g.breaker("complete:m").state == resilience.OPEN
+
+    time.sleep(0.06)
+    backend.down.clear()
+    assert rb.complete("m", "q") == "[m] answer to: q"
+    assert g.breaker("complete:m").state == resilience.CLOSED
+
+
+def test_retries_only_retryable_errors():
+    backend = faulty(error_rate=1.0)
+    with pytest.raises(resilience.Unavailable):
+        resilience.ResilientBackend(backend, guard=guard(), fallback_model=None).complete("m", "q")
+    assert backend.faults["error"] == resilience.MAX_ATTEMPTS
+
+    for error in (ValueError("bad prompt"), scheduler.Overloaded("busy")):
+        backend = Raises(error)
+        with pytest.raises(type(error)):
+            resilience.ResilientBackend(backend, guard=guard(), fallback_model=None).complete("m", "q")
+        assert backend.calls == 1
+
+
+def test_hedge_winner_frees_the_losers_slot():
+    # A seed whose first call stalls and whose hedge does not.
+    seed = next(s for s in range(100) if (lambda r: r.random() < 0.5 <= r.random())(random.Random(s)))
+    backend = faulty(stall_rate=0.5, stall_ms=500, seed=seed)
+    sched = scheduler.CortexScheduler(model_concurrency={"m": 2})
+    latency = resilience.LatencyTracker(min_samples=1)
+    latency.observe("complete:m", 0.01)
+    rb = resilience.ResilientBackend(scheduler.ScheduledBackend(backend, "s", scheduler=sched),
+                                     guard=guard(latency=latency), fallback_model=None)
+
+    assert rb.complete("m", "q") == "[m] answer to: q"
+    assert backend.faults["stall"] == 1
+    # The stalled call is still sleeping, but neither call holds a slot.
+    assert sched.stats()["complete:m"]["active"] == 0
+
+
+def test_falls_back_during_an_outage():
+    backend = faulty(down={"big"})
+    rb = resilience.ResilientBackend(backend, guard=guard(), fallback_model="small")
+    reply = rb.complete("big", "q")
+    assert reply == "[small] answer to: q"
+    assert resilience.is_degraded(reply) and reply.model == "small"
+
+
+def test_fallback_gets_only_what_is_left_of_the_deadline():
+    backend = FaultyBackend(FakeBackend(corpus=[], model_latency={"small": Latency("fixed", ms=400)}),
+                            down={"big"}, error_ms=300)
+    rb = resilience.ResilientBackend(backend, guard=guard(max_attempts=1), complete_deadline_s=0.5,
+                                     fallback_model="small")
+    start = time.monotonic()
+    with pytest.raises(resilience.CallTimedOut):
+        rb.complete("big", "q")
+    assert time.monotonic() - start < 0.65
@@ -0,0 +1,43 @@
+import retrieval
+
+
+def result(chunk, path="A.pdf", similarity=None):
+    r = {"chunk": chunk, "relative_path": path}
+    if similarity is not None:
+        r["@scores"] = {"cosine_similarity": similarity}
+    return r
+
+
+def test_rerank_orders_by_overlap_and_keeps_search_order_on_ties():
+    results = [result("cabin categories"), result("scenic flight over the Bungle Bungle Range"),
+               result("meals on board")]
+    ranked = retrieval.rerank(results, "Is there a scenic flight over the Bungle Bungles?", "CHUNK")
+    assert [r["chunk"] for r in ranked] == ["scenic flight over the Bungle Bungle Range", "cabin categories",
+                                            "meals on board"]
+    assert retrieval.rerank(results, "what is this", "chunk", limit=2) == results[:2]
+
+
+def test_select_stops_where_relevance_falls_off():
+    results = [result(f"Kyoto temples day {n}", f"JP{n}.pdf", 0.9) for n in range(4)]
+    results += [result(f"cabin categories {n}", similarity=0.2) for n in range(8)]
+    # The first cabin chunk scores far below the best one.
+    selected, scores = retrieval.select(results, "Kyoto temples", "chunk", max_chunks=10, cumulative=1.0)
+    assert selected == results[:4]
+    assert scores == sorted(scores, reverse=True)
+    # Three of the four equal Kyoto chunks already hold 70% of the relevance.
+    assert retrieval.select(results, "Kyoto temples", "chunk", max_chunks=10)[0] == results[:3]
+
+
+def test_select_keeps_at_least_min_chunks_and_at_most_max_chunks():
+    results = [result("Kyoto temples", similarity=0.9)] + [result(f"cabins {n}", similarity=0.1) for n in range(9)]
+    assert len(retrieval.select(results, "Kyoto temples", "chunk", max_chunks=10)[0]) == retrieval.MIN_CHUNKS
+    same = [result("Kyoto temples", f"JP{n}.pdf", 0.9) for n in range(10)]
+    assert len(retrieval.select(same, "Kyoto temples", "chunk", max_chunks=5, cumulative=1.0)[0]) == 5
+    assert retrieval.select([], "Kyoto", "chunk", max_chunks=5) == ([], [])
+
+
+def test_select_prefers_a_new_brochure_on_close_scores():
+    results = [result("Kyoto temples", "A.pdf", 0.9), result("Kyoto temples", "A.pdf", 0.89),
+               result("Kyoto temples", "B.pdf", 0.88)]
+    selected, _ = retrieval.select(results, "Kyoto temples", "chunk", max_chunks=2, min_chunks=2)
+    assert [r["relative_path"] for r in selected] == ["A.pdf", "B.pdf"]
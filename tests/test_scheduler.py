@@ -0,0 +1,83 @@
+import threading
+import time
+
+import pytest
+
+import scheduler
+
+
+def queued(sched, name, n):
+    while sched.stats()[name]["queued"] < n:
+        time.sleep(0.001)
+
+
+def test_slots_go_round_robin_across_sessions():
+    sched = scheduler.CortexScheduler(model_concurrency={"m": 1})
+    deadline = time.monotonic() + 5
+    sched.acquire("complete:m", "held", deadline)
+    order = []
+
+    def wait_turn(session, label):
+        sched.acquire("complete:m", session, deadline)
+        order.append(label)
+        sched.release("complete:m")
+
+    threads = []
+    for n, (session, label) in enumerate([("a", "a1"), ("a", "a2"), ("b", "b1")], 1):
+        threads.append(threading.Thread(target=wait_turn, args=(session, label)))
+        threads[-1].start()
+        queued(sched, "complete:m", n)
+    sched.release("complete:m")
+    for t in threads:
+        t.join()
+    assert order == ["a1", "b1", "a2"]
+    assert sched.stats()["complete:m"] == {"active": 0, "capacity": 1, "queued": 0}
+
+
+def test_sheds_past_the_queue_depth():
+    sched = scheduler.CortexScheduler(search_concurrency=1, max_queue_depth=0)
+    sched.acquire("search", "a", time.monotonic() + 5)
+    with pytest.raises(scheduler.Overloaded):
+        sched.acquire("search", "b", time.monotonic() + 5)
+
+
+def test_gives_up_at_the_deadline():
+    sched = scheduler.CortexScheduler(search_concurrency=1)
+    sched.acquire("search", "a", time.monotonic() + 5)
+    with pytest.raises(scheduler.DeadlineExceeded):
+        sched.acquire("search", "b", time.monotonic() + 0.02)
+    assert sched.stats()["search"]["queued"] == 0
+
+
+def test_abandoned_claim_releases_its_slot_once():
+    sched = scheduler.CortexScheduler(search_concurrency=1)
+    claim = scheduler.Claim()
+    started, finish = threading.Event(), threading.Event()
+
+    def call():
+        with sched.slot("search", "a", time.monotonic() + 5):
+            started.set()
+            finish.wait()
+
+    worker = threading.Thread(target=claim.run, args=(call,))
+    worker.start()
+    started.wait()
+    claim.abandon()
+    assert sched.stats()["search"]["active"] == 0
+    finish.set()
+    worker.join()
+    assert sched.stats()["search"]["active"] == 0
+
+
+def test_abandoned_claim_does_not_start_its_call():
+    sched = scheduler.CortexScheduler(search_concurrency=1)
+    claim = scheduler.Claim()
+    claim.abandon()
+
+    def call():
+        with sched.slot("search", "a", time.monotonic() + 5):
+            pytest.fail("the call ran after its claim was abandoned")
+
+    with pytest.raises(scheduler.DeadlineExceeded):
+        claim.run(call)
+    assert sched.stats()["search"]["active"] == 0
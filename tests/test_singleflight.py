@@ -0,0 +1,61 @@
+import threading
+import time
+
+import singleflight
+
+
+class SlowBackend:
+    """Counts calls; each one waits until ``release`` is set."""
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.calls = []
+
+    def complete(self, model, prompt):
+        self.calls.append(prompt)
+        self.release.wait(5)
+        return f"[{model}] {prompt}"
+
+    def search(self, service, query, columns, filter, limit):
+        self.calls.append(query)
+        self.release.wait(5)
+        return [{"chunk": query}]
+
+
+def run_together(backend, calls, leaders):
+    """Start every call, let them all reach the group while ``leaders`` calls are running, then finish them."""
+    sf = singleflight.SingleFlightBackend(backend, singleflight.SingleFlight())
+    results = [None] * len(calls)
+
+    def run(n, call):
+        results[n] = call(sf)
+
+    threads = [threading.Thread(target=run, args=(n, call)) for n, call in enumerate(calls)]
+    for t in threads:
+        t.start()
+    for _ in range(1000):
+        if len(backend.calls) >= leaders:
+            break
+        time.sleep(0.001)
+    time.sleep(0.05)
+    backend.release.set()
+    for t in threads:
+        t.join()
+    return results
+
+
+def test_completions_coalesce_only_on_the_exact_prompt():
+    backend = SlowBackend()
+    results = run_together(backend, [lambda sf: sf.complete("m", "Write it in CAPS"),
+                                     lambda sf: sf.complete("m", "Write it in CAPS"),
+                                     lambda sf: sf.complete("m", "write it in caps")], leaders=2)
+    assert sorted(backend.calls) == ["Write it in CAPS", "write it in caps"]
+    assert results == ["[m] Write it in CAPS", "[m] Write it in CAPS", "[m] write it in caps"]
+
+
+def test_searches_coalesce_on_the_normalized_query():
+    backend = SlowBackend()
+    results = run_together(backend, [lambda sf: sf.search("svc", "Broome  cruises", ["chunk"], None, 3),
+                                     lambda sf: sf.search("svc", "broome cruises", ["chunk"], None, 3)], leaders=1)
+    assert len(backend.calls) == 1
+    assert results[0] == results[1] and results[0] is not results[1]
@@ -0,0 +1,69 @@
+import csv
+import json
+
+import pytest
+
+import suggest
+
+TOURS = [
+    {"trip_code": "EUCCDR14", "trip_name": "Croatia in Depth", "region": "Europe", "country": "Croatia",
+     "original_url": "https://example.com/croatia-in-depth/"},
+    {"trip_code": "EUCIDR14", "trip_name": "Croatian Island Discovery", "region": "Europe", "country": "Croatia",
+     "original_url": ""},
+    {"trip_code": "AUKCK12", "trip_name": "Kimberley Coast", "region": "Australia", "country": "Australia",
+     "original_url": ""},
+]
+
+
+@pytest.fixture
+def index(tmp_path):
+    (tmp_path / "tour_info.json").write_text(json.dumps(TOURS), encoding="utf-8")
+    with open(tmp_path / "tours.csv", "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, ["URL", "Itinerary"])
+        writer.writeheader()
+        writer.writerow({"URL": "https://example.com/croatia-in-depth",
+                         "Itinerary": "Day 1: Dubrovnik|Day 2-3: Split: free day|Day 4 - Hvar"})
+    return suggest.SuggestIndex(str(tmp_path / "pdfs"), tour_info=str(tmp_path / "tour_info.json"),
+                                scraped=str(tmp_path / "tours.csv"))
+
+
+def test_itinerary_places():
+    assert suggest.itinerary_places("Day 1: Dubrovnik|Day 2-3: Split: free day|Day 4 - Hvar|Day 5: At sea, "
+                                    "cruising the coast towards the islands") == ["Dubrovnik", "Split", "Hvar"]
+
+
+def test_suggests_by_word_start_and_document_count(index):
+    assert index.refresh()
+    assert not index.refresh()
+    assert [(s.text, s.kind, s.count) for s in index.suggest("cro")] == [
+        ("Croatia", "country", 2), ("Croatia in Depth", "title", 1), ("Croatian Island Discovery", "title", 1)]
+    assert [s.text for s in index.suggest("is")] == ["Croatian Island Discovery"]
+    assert [s.text for s in index.suggest("euc", k=1)] == ["EUCCDR14"]
+    assert index.suggest("  ") == []
+
+
+def test_matches_every_word_as_a_prefix(index):
+    index.refresh()
+    assert index.matches("croatia") == {("tour", "EUCCDR14"), ("tour", "EUCIDR14")}
+    assert index.matches("split cro") == {("tour", "EUCCDR14")}
+    assert index.matches("zanzibar") == set()
+    assert index.matches("") is None
+
+
+def test_nothing_matches_until_the_first_build(index):
+    assert not index.ready
+    assert index.matches("croatia") == set()
+    assert index.suggest("cro") == []
+    index.refresh_in_background().join()
+    assert index.ready
+    assert index.matches("kimberley") == {("tour", "AUKCK12")}
+
+
+def test_one_background_refresh_at_a_time(index):
+    with index._lock:  # a refresh in progress
+        thread = index.refresh_in_background()
+        assert index.refresh_in_background() is None
+    thread.join()
+    thread = index.refresh_in_background()
+    assert thread is not None
+    thread.join()
@@ -0,0 +1,52 @@
+import json
+
+import pytest
+
+import tour_facts
+
+TOUR = {
+    "trip_name": "Croatia in Depth", "trip_code": "EUCCDR14", "region": "Europe", "country": "Croatia",
+    "description": "", "trip_inclusions": ["13 nights on a luxury yacht", "All breakfasts"],
+    "booking_url": "", "original_url": "", "start_date": "10 Jul", "end_date": "23 Jul",
+    "price_aud": "$11,995", "limited_availability": "True",
+}
+
+
+@pytest.mark.parametrize("question, intent", [
+    ("What is the trip code for Croatia in Depth?", "trip_code"),
+    ("What is the price of EUCCDR14?", "price"),
+    ("How much is EUCCDR14?", "price"),
+    ("What are the departure dates for EUCCDR14?", "dates"),
+    ("When does EUCCDR14 depart?", "dates"),
+    ("Is there availability on EUCCDR14?", "availability"),
+    ("What cities do we visit on the Enchanting Japan tour?", "itinerary"),
+    ("What are the highlights of EUCCDR14?", "highlights"),
+    ("What's included in EUCCDR14?", "inclusions"),
+    ("Which country is EUCCDR14 in?", "region"),
+])
+def test_classify_field_lookups(question, intent):
+    assert tour_facts.classify(question) == intent
+
+
+@pytest.mark.parametrize("question", [
+    "Can I leave my luggage at the hotel on EUCCDR14?",
+    "When do we arrive in Split on EUCCDR14?",
+    "How much luggage can I bring on EUCCDR14?",
+    "Which meals are included on day 3 of EUCCDR14?",
+    "What is the itinerary for day 3 of EUCCDR14?",
+    "Compare the price of EUCCDR14 and EUCCDR15",
+    "What is the price of EUCCDR14? When does it depart?",
+])
+def test_classify_sends_narrower_questions_to_rag(question):
+    assert tour_facts.classify(question) is None
+
+
+def test_answer_reads_the_facts_table(tmp_path):
+    tour_info = tmp_path / "tour_info.json"
+    tour_info.write_text(json.dumps(TOUR), encoding="utf-8")
+    facts = tour_facts.TourFacts(str(tmp_path / "facts.db"), tour_info=str(tour_info),
+                                 scraped=str(tmp_path / "none.csv"), pdf_dir=str(tmp_path / "pdfs"))
+
+    assert tour_facts.answer("What is the price of EUCCDR14?", facts) == \
+        "**Croatia in Depth** (EUCCDR14) is priced from **\\$11,995 AUD** for the 10 Jul – 23 Jul departure."
+    assert tour_facts.answer("Can I leave my luggage at the hotel on EUCCDR14?", facts) is None
@@ -0,0 +1,23 @@
+import json
+
+import tracing
+
+
+def finished(n):
+    with tracing.trace("chat_turn", export=False, turn=n) as t:
+        pass
+    return t
+
+
+def test_trace_file_is_rotated_by_size(tmp_path):
+    path = str(tmp_path / "traces.jsonl")
+    size = len(json.dumps(finished(0).to_dict(), default=str)) + 1
+    for n in range(7):
+        tracing.export_trace(finished(n), path, max_bytes=2 * size - 20)  # two lines, which vary by a few characters
+
+    turns = {}
+    for name in ("traces.jsonl", "traces.jsonl.1", "traces.jsonl.2"):
+        with open(tmp_path / name, encoding="utf-8") as f:
+            turns[name] = [json.loads(line)["attrs"]["turn"] for line in f]
+    assert turns == {"traces.jsonl": [6], "traces.jsonl.1": [4, 5], "traces.jsonl.2": [2, 3]}
+    assert not (tmp_path / "traces.jsonl.3").exists()
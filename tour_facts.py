@@ -0,0 +1,285 @@
+"""Structured tour facts and a router that answers simple lookups without the LLM.
+
+``build`` extracts one row per trip into a SQLite table indexed by trip code
+and name aliases, from:
+
+* ``scraper/tour_info.json`` – trip name, code, region, country, dates,
+  price, inclusions and booking links;
+* ``tours_scraped.csv`` (``scrape_trip_detail_pages.py``) – itinerary and
+  highlights, joined on the tour URL;
+* brochure file names in ``pdfs/`` – trip code, title and season.
+
+``answer`` classifies a question; a price, date, inclusion, itinerary,
+highlight, region or trip-code lookup about a single known trip is answered
+straight from the table, anything else returns None and goes through RAG.
+
+    python tour_facts.py      # rebuild tour_facts.db
+"""
+
+import csv
+import json
+import os
+import re
+import sqlite3
+import threading
+
+import pipeline
+
+TOUR_INFO_FILE = "scraper/tour_info.json"
+SCRAPED_TOURS_FILE = "tours_scraped.csv"
+PDF_DIR = "pdfs"
+DB_FILE = "tour_facts.db"
+
+TRIP_CODE_RE = re.compile(r"\b([A-Z]{2,}\d+[A-Z]?)\b")
+BROCHURE_RE = re.compile(r"^(?P<code>[A-Z]{2,}\d+[A-Z]?)\s+(?P<title>.+?)(?:\s+(?:\d{4}|NaN))*\.pdf$", re.I)
+
+SCHEMA = """
+CREATE TABLE tours (
+    trip_code TEXT PRIMARY KEY,
+    trip_name TEXT,
+    region TEXT,
+    country TEXT,
+    description TEXT,
+    start_date TEXT,
+    end_date TEXT,
+    price_aud TEXT,
+    limited_availability INTEGER,
+    booking_url TEXT,
+    original_url TEXT,
+    itinerary TEXT,
+    highlights TEXT,
+    brochure TEXT,
+    season TEXT
+);
+CREATE TABLE inclusions (trip_code TEXT, position INTEGER, item TEXT);
+CREATE TABLE aliases (alias TEXT, trip_code TEXT);
+CREATE INDEX idx_inclusions_code ON inclusions (trip_code);
+CREATE INDEX idx_aliases_alias ON aliases (alias);
+"""
+
+# (intent, pattern) in priority order; the first match wins. Each pattern is a phrasing that asks for
+# the field itself, so a question that only mentions a word like "when" or "included" goes to RAG.
+INTENTS = [
+    ("trip_code", re.compile(r"\b(trip|tour) code\b|\bcode (for|of)\b", re.I)),
+    ("price", re.compile(r"\b(price|prices|cost|fare)s? (of|for)\b|\bhow much (is|are|does|do)\b"
+                         r"|\bwhat does .+ cost\b", re.I)),
+    ("dates", re.compile(r"\b(departure|start|end|return) dates?\b|\bdates? (of|for)\b"
+                         r"|\bwhen (does|do|is|will) .*\b(depart|start|begin|leave|run|finish|end|return)s?\b", re.I)),
+    ("availability", re.compile(r"\b(availability|available spaces|sold out|seats left|spots left)\b", re.I)),
+    ("itinerary", re.compile(r"\bitinerary (of|for)\b|\bwhat is the itinerary\b"
+                             r"|\bwhere (do|does|will) (we|it|the (tour|trip)) (go|visit|stop)\b"
+                             r"|\bwhat (cities|places|destinations) (do|does|will)\b", re.I)),
+    ("highlights", re.compile(r"\bhighlights (of|for)\b|\bwhat are the highlights\b", re.I)),
+    ("inclusions", re.compile(r"\bwhat('s| is| are)? ?(is )?included (in|on|with)\b|\bwhat does .+ include\b"
+                              r"|\binclusions (of|for)\b|\bwhat'?s in the price\b", re.I)),
+    ("region", re.compile(r"\b(which|what) (country|region|countries)\b|\bwhere is (the )?(tour|trip|[A-Z]{3,}\d)", re.I)),
+]
+# Questions that need reasoning over the facts rather than a single field.
+NEEDS_RAG = re.compile(r"\b(compare|difference|versus|vs\.?|recommend|better|best|why|explain|should)\b", re.I)
+# Qualifiers that narrow the question below what one field answers: a day, a meal, luggage, a place.
+QUALIFIERS = re.compile(r"\bday \d+\b|\b(meals?|breakfast|lunch|dinner|drinks?|luggage|baggage|bags?|suitcases?"
+                        r"|hotels?|flights?|transfers?|visas?|insurance|cabins?|suites?|rooms?|single|solo"
+                        r"|child|children|kids|arrive|arrival)\b", re.I)
+# "arrive in Split"; a capitalized word before the preposition is a trip name ("Croatia in Depth").
+PLACE_RE = re.compile(r"(\S+) (?:in|at|to|from|near) [A-Z][a-z]{2,}")
+
+
+def _normalize(text):
+    return re.sub(r"[^a-z0-9]+", " ", text.lower()).strip()
+
+
+def _load_tour_info(path):
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    return [data] if isinstance(data, dict) else data
+
+
+def _load_scraped(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path, newline="", encoding="utf-8") as f:
+        return {row["URL"].rstrip("/"): row for row in csv.DictReader(f)}
+
+
+def _brochures(pdf_dir):
+    if not os.path.isdir(pdf_dir):
+        return {}
+    brochures = {}
+    for name in sorted(os.listdir(pdf_dir)):
+        m = BROCHURE_RE.match(name)
+        if m:
+            season = " ".join(re.findall(r"\b\d{4}\b", name))
+            brochures[m.group("code").upper()] = {"title": m.group("title"), "file": name, "season": season}
+    return brochures
+
+
+def source_files(tour_info=TOUR_INFO_FILE, scraped=SCRAPED_TOURS_FILE, pdf_dir=PDF_DIR):
+    return [p for p in (tour_info, scraped, pdf_dir) if os.path.exists(p)]
+
+
+def build(db_path=DB_FILE, tour_info=TOUR_INFO_FILE, scraped=SCRAPED_TOURS_FILE, pdf_dir=PDF_DIR):
+    """(Re)build the facts database and return the number of trips in it."""
+    scraped_rows = _load_scraped(scraped)
+    brochures = _brochures(pdf_dir)
+    rows = {}
+    inclusions = []
+
+    for code, b in brochures.items():
+        rows[code] = {"trip_code": code, "trip_name": b["title"], "brochure": b["file"], "season": b["season"]}
+
+    for tour in _load_tour_info(tour_info):
+        code = (tour.get("trip_code") or "").upper()
+        if not code:
+            continue
+        detail = scraped_rows.get((tour.get("original_url") or "").rstrip("/"), {})
+        row = rows.setdefault(code, {"trip_code": code})
+        row.update({
+            "trip_name": tour.get("trip_name") or row.get("trip_name"),
+            "region": tour.get("region"),
+            "country": tour.get("country"),
+            "description": tour.get("description") or detail.get("Intro"),
+            "start_date": tour.get("start_date"),
+            "end_date": tour.get("end_date"),
+            "price_aud": tour.get("price_aud"),
+            "limited_availability": int(bool(tour.get("limited_availability"))),
+            "booking_url": tour.get("booking_url"),
+            "original_url": tour.get("original_url"),
+            "itinerary": detail.get("Itinerary"),
+            "highlights": detail.get("Highlights"),
+        })
+        # The scraper picks up a stray "Title" span after the real inclusions.
+        items = [i for i in tour.get("trip_inclusions", []) if i and i.strip().lower() != "title"]
+        inclusions.extend((code, n, item) for n, item in enumerate(items))
+
+    tmp_path = f"{db_path}.tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    conn = sqlite3.connect(tmp_path)
+    try:
+        conn.executescript(SCHEMA)
+        columns = [c[1] for c in conn.execute("PRAGMA table_info(tours)")]
+        conn.executemany(
+            f"INSERT INTO tours ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+            [[row.get(c) for c in columns] for row in rows.values()],
+        )
+        conn.executemany("INSERT INTO inclusions VALUES (?, ?, ?)", inclusions)
+        aliases = set()
+        for code, row in rows.items():
+            aliases.add((code.lower(), code))
+            for name in (row.get("trip_name"), brochures.get(code, {}).get("title")):
+                if name:
+                    aliases.add((_normalize(name), code))
+        conn.executemany("INSERT INTO aliases VALUES (?, ?)", sorted(aliases))
+        conn.commit()
+    finally:
+        conn.close()
+    os.replace(tmp_path, db_path)
+    return len(rows)
+
+
+class TourFacts:
+    """Read side of the facts table, rebuilt automatically when its sources change."""
+
+    def __init__(self, db_path=DB_FILE, **sources):
+        self.db_path = db_path
+        self.sources = sources
+        self._lock = threading.Lock()
+        self._signature = None
+        self._aliases = []
+        self._codes = set()
+
+    def _source_signature(self):
+        return tuple((p, os.path.getmtime(p)) for p in source_files(**self.sources))
+
+    def _refresh(self):
+        signature = self._source_signature()
+        with self._lock:
+            if signature == self._signature:
+                return
+            if not os.path.exists(self.db_path) or any(
+                    mtime > os.path.getmtime(self.db_path) for _, mtime in signature):
+                build(self.db_path, **self.sources)
+            with sqlite3.connect(self.db_path) as conn:
+                # Longest aliases first so "magnificent europe with paris" beats "magnificent europe".
+                self._aliases = sorted(conn.execute("SELECT alias, trip_code FROM aliases"),
+                                       key=lambda a: -len(a[0]))
+            self._codes = {code for _, code in self._aliases}
+            self._signature = signature
+
+    def resolve(self, question):
+        """Trip codes mentioned in ``question`` by code or by name."""
+        self._refresh()
+        codes = [c for c in TRIP_CODE_RE.findall(question.upper()) if c in self._codes]
+        text = f" {_normalize(question)} "
+        for alias, code in self._aliases:
+            if len(alias) > 6 and f" {alias} " in text:
+                codes.append(code)
+                text = text.replace(f" {alias} ", " ")
+        return list(dict.fromkeys(codes))
+
+    def tour(self, code):
+        self._refresh()
+        with sqlite3.connect(self.db_path) as conn:
+            conn.row_factory = sqlite3.Row
+            row = conn.execute("SELECT * FROM tours WHERE trip_code = ?", (code,)).fetchone()
+            if row is None:
+                return None
+            tour = dict(row)
+            tour["trip_inclusions"] = [r[0] for r in conn.execute(
+                "SELECT item FROM inclusions WHERE trip_code = ? ORDER BY position", (code,))]
+        return tour
+
+
+def classify(question):
+    """The single-field lookup a question asks for, or None if it needs RAG."""
+    if NEEDS_RAG.search(question) or question.count("?") > 1:
+        return None
+    if QUALIFIERS.search(question) or any(not w[0].isupper() for w in PLACE_RE.findall(question)):
+        return None
+    return next((intent for intent, pattern in INTENTS if pattern.search(question)), None)
+
+
+def format_answer(intent, t):
+    name = f"**{t['trip_name']}** ({t['trip_code']})"
+    if intent == "trip_code":
+        return f"The trip code for {t['trip_name']} is **{t['trip_code']}**."
+    if intent == "price" and t.get("price_aud"):
+        dates = f" for the {t['start_date']} – {t['end_date']} departure" if t.get("start_date") else ""
+        return f"{name} is priced from **{t['price_aud']} AUD**{dates}."
+    if intent == "dates" and t.get("start_date"):
+        return f"{name} departs **{t['start_date']}** and returns **{t['end_date']}**."
+    if intent == "availability" and t.get("limited_availability") is not None:
+        status = "has **limited availability**" if t["limited_availability"] else "currently has availability"
+        return f"{name} {status}."
+    if intent == "itinerary" and t.get("itinerary"):
+        return f"Itinerary for {name}:\n\n" + "\n".join(f"- {d.strip()}" for d in t["itinerary"].split("|"))
+    if intent == "highlights" and t.get("highlights"):
+        return f"Highlights of {name}:\n\n" + "\n".join(f"- {h.strip()}" for h in t["highlights"].split(";"))
+    if intent == "inclusions" and t.get("trip_inclusions"):
+        return f"{name} includes:\n\n" + "\n".join(f"- {i}" for i in t["trip_inclusions"])
+    if intent == "region" and t.get("country"):
+        return f"{name} is in **{t['country']}**, {t['region']}."
+    return None
+
+
+FACTS = TourFacts()
+
+
+def answer(question, facts=FACTS):
+    """Answer a single-field lookup from the facts table, or return None."""
+    intent = classify(question)
+    if intent is None:
+        return None
+    codes = facts.resolve(question)
+    if len(codes) != 1:
+        return None
+    tour = facts.tour(codes[0])
+    reply = format_answer(intent, tour) if tour else None
+    # Same escaping as model replies, so "$" in a tour record is not read as LaTeX.
+    return pipeline.escape_markdown(reply) if reply else None
+
+
+if __name__ == "__main__":
+    print(f"✅ Built {DB_FILE} with {build()} trips")
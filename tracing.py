@@ -0,0 +1,323 @@
+"""Lightweight tracing spans and Prometheus-style metrics.
+
+A *trace* covers one unit of work (a chat turn, an ingestion, a scraped
+page) and is made of nested *spans*, each with a duration and free-form
+attributes such as token counts, chunk counts or ``cache_hit``::
+
+    with tracing.trace("chat_turn") as t:
+        with tracing.span("query_cortex") as s:
+            ...
+            s.set(chunks=len(results))
+
+Spans opened outside a trace still feed the process-wide ``METRICS``
+registry, so library code can be instrumented unconditionally. Finished
+traces are appended to a JSONL file, rotated by size, and the registry
+can be served as Prometheus text for aggregation across users and
+processes.
+"""
+
+import contextvars
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+TRACE_FILE = os.environ.get("INTELLIGUIDE_TRACE_FILE", "traces.jsonl")
+TRACE_MAX_BYTES = int(float(os.environ.get("INTELLIGUIDE_TRACE_MAX_MB", 32)) * 1024 * 1024)
+TRACE_BACKUPS = 2  # rotated files kept as traces.jsonl.1 (newest) and traces.jsonl.2
+
+_current_trace = contextvars.ContextVar("current_trace", default=None)
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+
+def estimate_tokens(text):
+    """Rough token count (~4 characters per token), good enough for budgeting."""
+    return (len(text) + 3) // 4 if text else 0
+
+
+class Span:
+    def __init__(self, name, parent=None, **attrs):
+        self.name = name
+        self.span_id = uuid.uuid4().hex[:8]
+        self.parent_id = parent.span_id if parent else None
+        self.depth = parent.depth + 1 if parent else 0
+        self.attrs = dict(attrs)
+        self.start = time.perf_counter()
+        self.end = None
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    @property
+    def duration_ms(self):
+        end = self.end if self.end is not None else time.perf_counter()
+        return (end - self.start) * 1000
+
+    def to_dict(self, origin):
+        return {
+            "name": self.name,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "offset_ms": round((self.start - origin) * 1000, 3),
+            "duration_ms": round(self.duration_ms, 3),
+            "attrs": self.attrs,
+        }
+
+
+class Trace:
+    def __init__(self, name, **attrs):
+        self.name = name
+        self.trace_id = uuid.uuid4().hex
+        self.attrs = dict(attrs)
+        self.started_at = time.time()
+        self.start = time.perf_counter()
+        self.end = None
+        self.spans = []
+        self._lock = threading.Lock()
+
+    def add(self, span):
+        with self._lock:
+            self.spans.append(span)
+
+    @property
+    def duration_ms(self):
+        end = self.end if self.end is not None else time.perf_counter()
+        return (end - self.start) * 1000
+
+    def to_dict(self):
+        return {
+            "trace_id": self.trace_id,
+            "name": self.name,
+            "started_at": self.started_at,
+            "duration_ms": round(self.duration_ms, 3),
+            "attrs": self.attrs,
+            "spans": [s.to_dict(self.start) for s in self.spans],
+        }
+
+
+@contextmanager
+def trace(name, export=True, **attrs):
+    """Collect every span opened in this context into one trace."""
+    t = Trace(name, **attrs)
+    token = _current_trace.set(t)
+    try:
+        with span(name):
+            yield t
+    finally:
+        t.end = time.perf_counter()
+        _current_trace.reset(token)
+        if export:
+            export_trace(t)
+
+
+@contextmanager
+def span(name, **attrs):
+    parent = _current_span.get()
+    s = Span(name, parent, **attrs)
+    token = _current_span.set(s)
+    error = None
+    try:
+        yield s
+    except BaseException as e:
+        error = type(e).__name__
+        s.set(error=error)
+        raise
+    finally:
+        s.end = time.perf_counter()
+        _current_span.reset(token)
+        current = _current_trace.get()
+        if current is not None:
+            current.add(s)
+        record_span(s, error)
+
+
+def current_trace():
+    return _current_trace.get()
+
+
+def annotate(**attrs):
+    """Set attributes on the innermost open span, if any."""
+    s = _current_span.get()
+    if s is not None:
+        s.set(**attrs)
+
+
+_export_lock = threading.Lock()
+
+
+def _rotate(path, backups=TRACE_BACKUPS):
+    # Another process can rotate the same file at once; a file it already moved is gone.
+    for n in range(backups, 0, -1):
+        try:
+            os.replace(f"{path}.{n - 1}" if n > 1 else path, f"{path}.{n}")
+        except FileNotFoundError:
+            pass
+
+
+def export_trace(t, path=None, max_bytes=None):
+    """Append ``t`` to ``path``; once the file reaches ``max_bytes`` it is moved to ``path.1``."""
+    path = path or TRACE_FILE
+    if not path:
+        return
+    line = json.dumps(t.to_dict(), default=str)
+    with _export_lock:
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+            full = f.tell() >= (max_bytes or TRACE_MAX_BYTES)
+        if full:
+            _rotate(path)
+
+
+# --- Metrics ---------------------------------------------------------------
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(key, extra=()):
+    items = list(key) + list(extra)
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in items) + "}"
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help):
+        self.name, self.help = name, help
+        self.values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def render(self):
+        return [f"{self.name}{_format_labels(k)} {v}" for k, v in sorted(self.values.items())]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        with self._lock:
+            self.values[_label_key(labels)] = value
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, help, buckets=DEFAULT_BUCKETS):
+        self.name, self.help = name, help
+        self.buckets = buckets
+        self.values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            counts, total, n = self.values.get(key, ([0] * len(self.buckets), 0.0, 0))
+            for i, b in enumerate(self.buckets):
+                if value <= b:
+                    counts[i] += 1
+            self.values[key] = (counts, total + value, n + 1)
+
+    def render(self):
+        lines = []
+        for key, (counts, total, n) in sorted(self.values.items()):
+            for b, c in zip(self.buckets, counts):
+                lines.append(f"{self.name}_bucket{_format_labels(key, [('le', b)])} {c}")
+            lines.append(f"{self.name}_bucket{_format_labels(key, [('le', '+Inf')])} {n}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {n}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.metrics = {}
+        self._lock = threading.Lock()
+
+    def _get(self, cls, name, help, **kwargs):
+        with self._lock:
+            if name not in self.metrics:
+                self.metrics[name] = cls(name, help, **kwargs)
+            return self.metrics[name]
+
+    def counter(self, name, help=""):
+        return self._get(Counter, name, help)
+
+    def gauge(self, name, help=""):
+        return self._get(Gauge, name, help)
+
+    def histogram(self, name, help="", buckets=DEFAULT_BUCKETS):
+        return self._get(Histogram, name, help, buckets=buckets)
+
+    def render(self):
+        lines = []
+        for metric in list(self.metrics.values()):
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+METRICS = MetricsRegistry()
+
+_stage_seconds = METRICS.histogram("intelliguide_stage_seconds", "Duration of pipeline stages")
+_stage_errors = METRICS.counter("intelliguide_stage_errors_total", "Stages that raised")
+_tokens = METRICS.counter("intelliguide_tokens_total", "Estimated tokens by stage and kind")
+_chunks = METRICS.counter("intelliguide_chunks_total", "Chunks retrieved or produced by stage")
+_cache = METRICS.counter("intelliguide_cache_total", "Cache lookups by stage and result")
+
+
+def record_span(s, error=None):
+    _stage_seconds.observe(s.duration_ms / 1000, stage=s.name)
+    if error:
+        _stage_errors.inc(stage=s.name, error=error)
+    for kind in ("prompt_tokens", "context_tokens", "completion_tokens"):
+        if kind in s.attrs:
+            _tokens.inc(s.attrs[kind], stage=s.name, kind=kind.replace("_tokens", ""))
+    if "chunks" in s.attrs:
+        _chunks.inc(s.attrs["chunks"], stage=s.name)
+    if "cache_hit" in s.attrs:
+        _cache.inc(stage=s.name, result="hit" if s.attrs["cache_hit"] else "miss")
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        body = METRICS.render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+_server = None
+_server_lock = threading.Lock()
+
+
+def serve_metrics(port, host="127.0.0.1"):
+    """Serve ``METRICS`` as Prometheus text on ``/metrics``; safe to call on every rerun."""
+    global _server
+    with _server_lock:
+        if _server is None:
+            try:
+                _server = ThreadingHTTPServer((host, port), _MetricsHandler)
+            except OSError:
+                # Another worker on this host already owns the port.
+                return None
+            threading.Thread(target=_server.serve_forever, daemon=True).start()
+    return _server